@@ -58,7 +58,7 @@ resource "aws_scheduler_schedule_group" "service_quotas_manager" {
 }
 
 resource "aws_scheduler_schedule" "sqm_collect_service_quotas" {
-  for_each = { for cfg in var.quotas_manager_configuration : cfg.account_id => cfg }
+  for_each = var.collection_batching == null ? { for cfg in var.quotas_manager_configuration : cfg.account_id => cfg } : {}
 
   #checkov:skip=CKV_AWS_297:Ensure EventBridge Scheduler Schedule uses Customer Managed Key (CMK)
   name                         = "sqm-collect-service-quotas-${each.key}"
@@ -79,11 +79,49 @@ resource "aws_scheduler_schedule" "sqm_collect_service_quotas" {
 
     input = jsonencode({
       account_id    = each.key
-      config_bucket = aws_s3_object.service_quotas_manager_config.bucket
-      config_key    = aws_s3_object.service_quotas_manager_config.key
+      config_bucket = aws_s3_object.service_quotas_manager_account_config[each.key].bucket
+      config_key    = aws_s3_object.service_quotas_manager_account_config[each.key].key
       action        = "CollectServiceQuotas"
     })
   }
+
+  lifecycle {
+    precondition {
+      condition     = var.config_aggregator == null
+      error_message = "config_aggregator requires collection_batching, as every per-account invocation would otherwise run the aggregate queries for all accounts."
+    }
+  }
+}
+
+resource "aws_scheduler_schedule" "sqm_collect_service_quotas_batch" {
+  for_each = local.collection_batches
+
+  #checkov:skip=CKV_AWS_297:Ensure EventBridge Scheduler Schedule uses Customer Managed Key (CMK)
+  name                         = "sqm-collect-service-quotas-batch-${each.key}"
+  group_name                   = aws_scheduler_schedule_group.service_quotas_manager.name
+  kms_key_arn                  = var.kms_key_arn
+  schedule_expression          = "cron(0 * ? * * *)"
+  schedule_expression_timezone = var.schedule_timezone
+  region                       = var.region
+
+  flexible_time_window {
+    mode                      = "FLEXIBLE"
+    maximum_window_in_minutes = 5
+  }
+
+  target {
+    arn      = module.service_quotas_manager_lambda.arn
+    role_arn = aws_iam_role.service_quotas_manager_schedules.arn
+
+    input = jsonencode({
+      account_ids       = each.value
+      batch_workers     = var.collection_batching.workers
+      config_aggregator = local.config_aggregator
+      config_bucket     = aws_s3_object.service_quotas_manager_config.bucket
+      config_key        = aws_s3_object.service_quotas_manager_config.key
+      action            = "CollectServiceQuotasBatch"
+    })
+  }
 }
 
 resource "aws_iam_role" "service_quotas_manager_schedules" {
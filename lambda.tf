@@ -30,9 +30,10 @@ module "service_quotas_manager_lambda" {
   runtime                     = "python3.11"
   security_group_egress_rules = var.security_group_egress_rules
   subnet_ids                  = var.subnet_ids
-  timeout                     = 300
+  timeout                     = var.collection_batching == null ? 300 : 900
 
   environment = {
+    MAX_POOL_CONNECTIONS    = var.max_pool_connections
     POWERTOOLS_LOG_LEVEL    = "INFO"
     POWERTOOLS_SERVICE_NAME = "ServiceQuotasManager"
   }
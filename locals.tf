@@ -2,7 +2,23 @@ locals {
   account_id     = data.aws_caller_identity.current.account_id
   account_region = var.region != null ? var.region : data.aws_region.current.region
 
+  collection_batches = var.collection_batching == null ? {} : {
+    for index, account_ids in chunklist(var.quotas_manager_configuration[*].account_id, var.collection_batching.size) : format("%03d", index) => account_ids
+  }
+
+  config_aggregator = var.config_aggregator == null ? null : merge(var.config_aggregator, {
+    role_name = var.assume_role.name
+    role_path = var.assume_role.path
+  })
+
   has_increase_config = sum([for item in var.quotas_manager_configuration : (item.quota_increase_config == null ? 0 : length(item.quota_increase_config))]) > 0
+
+  quotas_manager_configuration = [
+    for cfg in var.quotas_manager_configuration : merge(cfg, {
+      role_name = var.assume_role.name
+      role_path = var.assume_role.path
+    })
+  ]
 }
 
 data "aws_region" "current" {}
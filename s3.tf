@@ -29,11 +29,15 @@ module "service_quotas_manager_bucket" {
 resource "aws_s3_object" "service_quotas_manager_config" {
   bucket = module.service_quotas_manager_bucket.name
   key    = "quotas_manager_config.json"
-  content = jsonencode([
-    for cfg in var.quotas_manager_configuration : merge(cfg, {
-      role_name = var.assume_role.name
-      role_path = var.assume_role.path
-    })
-  ])
-  region = var.region
+  content = jsonencode(local.quotas_manager_configuration)
+  region  = var.region
+}
+
+resource "aws_s3_object" "service_quotas_manager_account_config" {
+  for_each = { for cfg in local.quotas_manager_configuration : cfg.account_id => cfg }
+
+  bucket  = module.service_quotas_manager_bucket.name
+  key     = "accounts/${each.key}.json"
+  content = jsonencode([each.value])
+  region  = var.region
 }
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Final
+
+from service_quotas_manager.state_store import StateStore
+from service_quotas_manager.util import get_logger
+
+DIGEST_VERSION: Final[int] = 1
+"""The version of the digest format. Digests of another version are discarded."""
+
+logger = get_logger()
+
+
+class AlarmDigest:
+    """
+    The digest of the alarms of an account as desired by the last run that reconciled
+    them. Used to skip reconciling alarms that are desired exactly as before, until
+    the full reconcile interval has passed and drift is repaired.
+    """
+
+    def __init__(
+        self, state_store: StateStore, key: str, full_reconcile_interval: timedelta
+    ):
+        self.state_store = state_store
+        self.key = key
+        self.full_reconcile_interval = full_reconcile_interval
+
+        self._digest: Dict = {}
+
+    def load(self) -> None:
+        """Load the digest from S3. Start without one if none exists yet."""
+
+        digest = self.state_store.read(self.key)
+        if digest.get("version") != DIGEST_VERSION:
+            digest = {}
+
+        self._digest = digest
+
+    def save(self, digest: str) -> None:
+        """Persist the digest of alarms that were reconciled just now."""
+
+        self._digest = {
+            "version": DIGEST_VERSION,
+            "digest": digest,
+            "reconciled_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.state_store.write(self.key, self._digest)
+
+    def is_unchanged(self, digest: str) -> bool:
+        """
+        Whether the desired alarms have the same digest as when they were last
+        reconciled, within the full reconcile interval.
+        """
+
+        if not self._digest or self._digest["digest"] != digest:
+            return False
+
+        reconciled_at = datetime.fromisoformat(self._digest["reconciled_at"])
+        if datetime.now(timezone.utc) - reconciled_at >= self.full_reconcile_interval:
+            logger.info("Alarms are due for a full reconcile.")
+            return False
+
+        return True
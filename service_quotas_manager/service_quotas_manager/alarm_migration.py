@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+from typing import Final, Optional
+
+from service_quotas_manager.state_store import StateStore
+from service_quotas_manager.util import get_logger
+
+MIGRATION_VERSION: Final[int] = 1
+"""The version of the migration marker. Markers of another version are discarded."""
+
+logger = get_logger()
+
+
+class AlarmMigration:
+    """
+    Records that the alarms of an account were reconciled under their account scoped
+    names. Alarms named the way earlier versions did can only be found by looking up
+    the alarms of all accounts, which is only needed until an account is migrated.
+    The marker is read on first use, so runs that skip reconciling don't read it.
+    """
+
+    def __init__(self, state_store: StateStore, key: str):
+        self.state_store = state_store
+        self.key = key
+
+        self._done: Optional[bool] = None
+
+    def is_done(self) -> bool:
+        """Whether the alarms of the account have been migrated."""
+
+        if self._done is None:
+            marker = self.state_store.read(self.key)
+            self._done = marker.get("version") == MIGRATION_VERSION
+
+        return self._done
+
+    def mark_done(self) -> None:
+        """Persist that the alarms of the account have been migrated."""
+
+        if self.is_done():
+            return
+
+        self.state_store.write(
+            self.key,
+            {
+                "version": MIGRATION_VERSION,
+                "migrated_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+        self._done = True
+        logger.info("Alarms are migrated to account scoped names.")
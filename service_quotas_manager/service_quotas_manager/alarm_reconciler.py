@@ -0,0 +1,93 @@
+import hashlib
+from numbers import Number
+from typing import Any, Dict, Final, Hashable
+
+from service_quotas_manager.entities import AlarmPlan
+from service_quotas_manager.util import get_logger
+
+MAX_ALARMS_PER_DELETE: Final[int] = 100
+"""The maximum number of alarms in a single DeleteAlarms request"""
+
+logger = get_logger()
+
+
+class AlarmReconciler:
+    """
+    Plans and applies the changes that bring existing alarms in line with desired
+    alarm definitions. Both are indexed by the same key and reduced to a canonical,
+    hashable form, so the plan is made in a single pass over the alarms.
+    """
+
+    def __init__(self, cloudwatch_client):
+        self.cloudwatch_client = cloudwatch_client
+
+    def plan(
+        self, desired_alarms: Dict[str, Dict], actual_alarms: Dict[str, Dict]
+    ) -> AlarmPlan:
+        """
+        Plan which desired alarms to create or update and which actual alarms to
+        delete. Only the attributes of a desired definition are compared, so
+        attributes that are not managed here do not cause updates. An alarm that is
+        renamed is created under its new name and deleted under its old one.
+        """
+
+        plan = AlarmPlan()
+
+        for key, desired_alarm in desired_alarms.items():
+            actual_alarm = actual_alarms.get(key)
+            if actual_alarm is None:
+                plan.create.append(desired_alarm)
+            elif actual_alarm["AlarmName"] != desired_alarm["AlarmName"]:
+                plan.create.append(desired_alarm)
+                plan.delete.append(actual_alarm["AlarmName"])
+            elif canonicalize(desired_alarm) != canonicalize(
+                {attribute: actual_alarm.get(attribute) for attribute in desired_alarm}
+            ):
+                plan.update.append(desired_alarm)
+
+        plan.delete += [
+            actual_alarm["AlarmName"]
+            for key, actual_alarm in actual_alarms.items()
+            if key not in desired_alarms
+        ]
+
+        logger.info(
+            f"Planned to create {len(plan.create)}, update {len(plan.update)} and "
+            f"delete {len(plan.delete)} alarms."
+        )
+        return plan
+
+    def digest(self, desired_alarms: Dict[str, Dict]) -> str:
+        """Return a digest that changes whenever any desired alarm changes."""
+
+        return hashlib.sha256(
+            repr(canonicalize(desired_alarms)).encode("utf-8")
+        ).hexdigest()
+
+    def apply(self, plan: AlarmPlan) -> None:
+        """Create, update and delete the alarms in a plan."""
+
+        for alarm in plan.create + plan.update:
+            logger.info(f"Upserting alarm {alarm['AlarmName']}")
+            self.cloudwatch_client.put_metric_alarm(**alarm)
+
+        for i in range(0, len(plan.delete), MAX_ALARMS_PER_DELETE):
+            alarm_removal_group = plan.delete[i : i + MAX_ALARMS_PER_DELETE]
+            logger.info(f"Deleting alarms {alarm_removal_group}")
+            self.cloudwatch_client.delete_alarms(AlarmNames=alarm_removal_group)
+
+
+def canonicalize(value: Any) -> Hashable:
+    """
+    Reduce an alarm definition to a hashable form in which equal definitions are
+    equal. Numbers are compared as floats and lists, such as dimensions and alarm
+    actions, regardless of their order.
+    """
+
+    if isinstance(value, dict):
+        return tuple(sorted((key, canonicalize(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(sorted((canonicalize(item) for item in value), key=repr))
+    if isinstance(value, Number) and not isinstance(value, bool):
+        return float(value)
+    return value
@@ -0,0 +1,87 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Final, Optional
+
+from service_quotas_manager.state_store import StateStore
+from service_quotas_manager.util import get_logger
+
+SNAPSHOT_VERSION: Final[int] = 1
+"""The version of the snapshot format. Snapshots of another version are discarded."""
+
+SNAPSHOT_TTL: Final[timedelta] = timedelta(hours=24)
+"""The time after which all applied quotas of an account are retrieved again"""
+
+CHANGE_DETECTION_MARGIN: Final[timedelta] = timedelta(minutes=5)
+"""Overlap between change history checks to account for clock differences"""
+
+logger = get_logger()
+
+
+class AppliedQuotaSnapshot:
+    """
+    The applied quotas of an account as retrieved by a previous run, indexed by
+    service code and quota code. Used to only refresh the applied quotas of services
+    that have changed since the last run.
+    """
+
+    def __init__(
+        self, state_store: StateStore, key: str, ttl: timedelta = SNAPSHOT_TTL
+    ):
+        self.state_store = state_store
+        self.key = key
+        self.ttl = ttl
+
+        self._snapshot: Dict = {}
+        self._lock = threading.Lock()
+
+    @property
+    def checked_at(self) -> Optional[datetime]:
+        """The moment changes were last checked for, if there is a snapshot."""
+
+        if not self._snapshot["services"]:
+            return None
+        return datetime.fromisoformat(self._snapshot["checked_at"])
+
+    def load(self) -> None:
+        """
+        Load the snapshot from S3. Start with an empty snapshot if none exists yet
+        or if the existing one has expired or is of another version.
+        """
+
+        snapshot = self.state_store.read(self.key)
+        if not self._is_valid(snapshot):
+            logger.info("Applied quota snapshot is missing or expired.")
+            snapshot = {
+                "version": SNAPSHOT_VERSION,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "checked_at": datetime.now(timezone.utc).isoformat(),
+                "services": {},
+            }
+
+        self._snapshot = snapshot
+
+    def save(self, checked_at: datetime) -> None:
+        """Persist the snapshot, recording when changes were last checked for."""
+
+        self._snapshot["checked_at"] = (
+            checked_at - CHANGE_DETECTION_MARGIN
+        ).isoformat()
+        self.state_store.write(self.key, self._snapshot)
+
+    def get(self, service_code: str) -> Optional[Dict[str, Dict]]:
+        """Return the applied quotas of a service, if they are in the snapshot."""
+
+        return self._snapshot["services"].get(service_code)
+
+    def put(self, service_code: str, applied_service_quotas: Dict[str, Dict]) -> None:
+        """Replace the applied quotas of a service in the snapshot."""
+
+        with self._lock:
+            self._snapshot["services"][service_code] = applied_service_quotas
+
+    def _is_valid(self, snapshot: Dict) -> bool:
+        if not snapshot or snapshot.get("version") != SNAPSHOT_VERSION:
+            return False
+
+        created_at = datetime.fromisoformat(snapshot["created_at"])
+        return datetime.now(timezone.utc) - created_at < self.ttl
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Final, List, Optional
+
+from service_quotas_manager.state_store import StateStore
+from service_quotas_manager.util import get_logger
+
+CACHE_VERSION: Final[int] = 1
+"""The version of the cache format. Caches of another version are discarded."""
+
+DEFAULT_REFRESH_INTERVAL: Final[timedelta] = timedelta(hours=24)
+"""The time after which the billed services of an account are detected again"""
+
+_billed_services: Dict[str, Dict] = {}
+"""Billed services kept in memory across warm invocations, indexed by S3 location"""
+
+logger = get_logger()
+
+
+class BilledServiceCache:
+    """
+    A cache for the services Cost Explorer reports costs for in an account. Every
+    Cost Explorer request is billed, while the services used over the past 30 days
+    hardly change between runs, so they are only detected again once the refresh
+    interval has passed or when a refresh is forced. The cache is kept in memory
+    across warm invocations and persisted as a compressed object in the
+    configuration bucket.
+    """
+
+    def __init__(
+        self,
+        state_store: StateStore,
+        key: str,
+        refresh_interval: timedelta = DEFAULT_REFRESH_INTERVAL,
+        force_refresh: bool = False,
+    ):
+        self.state_store = state_store
+        self.key = key
+        self.refresh_interval = refresh_interval
+        self.force_refresh = force_refresh
+
+    def get_service_names(
+        self, detect_service_names: Callable[[], Optional[List[str]]]
+    ) -> Optional[List[str]]:
+        """
+        Return the billed service names from the cache, or detect and cache them if
+        the cache is missing, stale or being refreshed. Failed detections, which
+        yield None, are not cached.
+        """
+
+        if not self.force_refresh:
+            cache = self._load()
+            if cache:
+                return list(cache["service_names"])
+
+        logger.info("Detecting billed services through Cost Explorer.")
+        service_names = detect_service_names()
+        if service_names is not None:
+            self._save(service_names)
+
+        return service_names
+
+    def _load(self) -> Optional[Dict]:
+        """Load the cache from memory or S3, if it is valid."""
+
+        cache = _billed_services.get(f"{self.state_store.bucket}/{self.key}")
+        if not self._is_valid(cache):
+            cache = self.state_store.read(self.key)
+            if not self._is_valid(cache):
+                return None
+            _billed_services[f"{self.state_store.bucket}/{self.key}"] = cache
+
+        return cache
+
+    def _save(self, service_names: List[str]) -> None:
+        """Persist the billed service names detected just now."""
+
+        cache = {
+            "version": CACHE_VERSION,
+            "detected_at": datetime.now(timezone.utc).isoformat(),
+            "service_names": service_names,
+        }
+        _billed_services[f"{self.state_store.bucket}/{self.key}"] = cache
+        self.state_store.write(self.key, cache)
+
+    def _is_valid(self, cache: Optional[Dict]) -> bool:
+        if not cache or cache.get("version") != CACHE_VERSION:
+            return False
+
+        detected_at = datetime.fromisoformat(cache["detected_at"])
+        return datetime.now(timezone.utc) - detected_at < self.refresh_interval
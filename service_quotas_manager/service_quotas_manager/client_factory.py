@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Final, Optional, Tuple
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.loaders import create_loader
+
+from service_quotas_manager.rate_limiter import RateLimiter
+
+DEFAULT_MAX_POOL_CONNECTIONS: Final[int] = 25
+"""
+The number of connections kept per client. Sized for a batch of accounts collected
+concurrently, each discovering service quotas with multiple workers.
+"""
+
+MAX_CACHED_SESSIONS: Final[int] = 100
+"""The number of credential sets to keep sessions and clients for"""
+
+
+class ClientFactory:
+    """
+    Creates boto3 clients with rate limits attached. A session is kept per credential
+    set and a client per session, service and region, so warm invocations reuse them
+    instead of resolving endpoints and parsing service models again. All sessions
+    share a single data loader.
+    """
+
+    def __init__(
+        self,
+        rate_limiter: RateLimiter,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    ):
+        self.rate_limiter = rate_limiter
+        self.config = Config(max_pool_connections=max_pool_connections)
+
+        self._loader = create_loader()
+        self._sessions: OrderedDict[Tuple, boto3.Session] = OrderedDict()
+        self._clients: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def get_client(
+        self,
+        client_name: str,
+        credentials: Optional[Dict] = None,
+        region: Optional[str] = None,
+    ):
+        """
+        Return a client for a service, using the Lambda invocation credentials if no
+        credentials are given. The credentials are not modified.
+        """
+
+        session_key = tuple(sorted((credentials or {}).items()))
+
+        with self._lock:
+            session = self._get_session(session_key)
+            client_key = (session_key, client_name, region)
+            if client_key not in self._clients:
+                self._clients[client_key] = self.rate_limiter.attach(
+                    session.client(client_name, region_name=region, config=self.config)
+                )
+
+            return self._clients[client_key]
+
+    def _get_session(self, session_key: Tuple) -> boto3.Session:
+        if session_key in self._sessions:
+            self._sessions.move_to_end(session_key)
+            return self._sessions[session_key]
+
+        if len(self._sessions) >= MAX_CACHED_SESSIONS:
+            evicted_key, _ = self._sessions.popitem(last=False)
+            for client_key in [k for k in self._clients if k[0] == evicted_key]:
+                del self._clients[client_key]
+
+        botocore_session = botocore.session.get_session()
+        botocore_session.register_component("data_loader", self._loader)
+        self._sessions[session_key] = boto3.Session(
+            botocore_session=botocore_session, **dict(session_key)
+        )
+
+        return self._sessions[session_key]
@@ -0,0 +1,127 @@
+import functools
+import json
+import re
+from pathlib import Path
+from typing import Dict, Final, Iterator, List, Optional, Tuple
+
+import jmespath
+from jmespath.exceptions import JMESPathError
+
+from service_quotas_manager.entities import CollectionQuery
+
+COLLECTION_QUERIES_PATH: Final[Path] = (
+    Path(__file__).parent / "custom_collection_queries.json"
+)
+"""The file with the custom collection queries shipped with the package"""
+
+COLLECTION_QUERY_TYPES: Final[List[str]] = ["config"]
+"""The supported sources to collect usage from"""
+
+COUNT_EXPRESSION_PATTERN: Final[re.Pattern] = re.compile(
+    r"^\s*SELECT\s+resourceId\s+WHERE\s+(?P<filter>.+?)\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+"""Matches queries that select resource ids, which only need to be counted"""
+
+COUNT_RESOURCE_TYPE_PATTERN: Final[re.Pattern] = re.compile(
+    r"^resourceType\s*=\s*'(?P<resource_type>[A-Za-z0-9:]+)'$"
+)
+"""Matches count filters that select all resources of a single resource type"""
+
+COUNT_JMESPATH: Final[str] = "length([])"
+"""The JMESPath expression that counts the rows of a query"""
+
+RESOURCE_TYPE_PATTERN: Final[re.Pattern] = re.compile(
+    r"'(?P<resource_type>AWS::[A-Za-z0-9]+::[A-Za-z0-9]+)'"
+)
+"""Matches the resource types a query selects"""
+
+
+class CollectionQueryRegistry:
+    """
+    The custom collection queries indexed by service code and quota code, with their
+    JMESPath expressions compiled up front. Building a registry fails on the first
+    invalid entry, so a broken query is caught by the tests instead of at runtime.
+    """
+
+    def __init__(self, definitions: Dict[str, Dict[str, Dict]]):
+        self._queries: Dict[Tuple[str, str], CollectionQuery] = {}
+
+        for service_code, quota_definitions in definitions.items():
+            for quota_code, definition in quota_definitions.items():
+                self._queries[(service_code, quota_code)] = self._build(
+                    service_code, quota_code, definition
+                )
+
+    def __iter__(self) -> Iterator[CollectionQuery]:
+        return iter(self._queries.values())
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    def get(self, service_code: str, quota_code: str) -> Optional[CollectionQuery]:
+        """Return the collection query of a quota, if there is one."""
+
+        return self._queries.get((service_code, quota_code))
+
+    def _build(
+        self, service_code: str, quota_code: str, definition: Dict
+    ) -> CollectionQuery:
+        if definition.get("type") not in COLLECTION_QUERY_TYPES:
+            raise ValueError(
+                f"Collection query {service_code} / {quota_code} has an unsupported "
+                f"type: {definition.get('type')}."
+            )
+
+        parameters = definition.get("parameters", {})
+        for parameter in ["expression", "jmespath"]:
+            if not isinstance(parameters.get(parameter), str) or not parameters.get(
+                parameter
+            ):
+                raise ValueError(
+                    f"Collection query {service_code} / {quota_code} is missing "
+                    f"parameter {parameter}."
+                )
+
+        try:
+            compiled_jmespath = jmespath.compile(parameters["jmespath"])
+        except JMESPathError as ex:
+            raise ValueError(
+                f"Collection query {service_code} / {quota_code} has an invalid "
+                f"JMESPath expression: {ex}."
+            )
+
+        count_filter = None
+        count_resource_type = None
+        count_match = COUNT_EXPRESSION_PATTERN.match(parameters["expression"])
+        if (
+            parameters["jmespath"] == COUNT_JMESPATH
+            and count_match
+            and not re.search(r"\b(GROUP|ORDER)\s+BY\b", count_match["filter"], re.I)
+        ):
+            count_filter = count_match["filter"]
+            resource_type_match = COUNT_RESOURCE_TYPE_PATTERN.match(count_filter)
+            if resource_type_match:
+                count_resource_type = resource_type_match["resource_type"]
+
+        return CollectionQuery(
+            service_code=service_code,
+            quota_code=quota_code,
+            type=definition["type"],
+            expression=parameters["expression"],
+            jmespath=parameters["jmespath"],
+            compiled_jmespath=compiled_jmespath,
+            count_filter=count_filter,
+            count_resource_type=count_resource_type,
+            resource_types=tuple(
+                sorted(set(RESOURCE_TYPE_PATTERN.findall(parameters["expression"])))
+            ),
+        )
+
+
+@functools.cache
+def get_collection_query_registry() -> CollectionQueryRegistry:
+    """Return the registry of the queries shipped with the package, built once."""
+
+    with open(COLLECTION_QUERIES_PATH) as collection_queries_file:
+        return CollectionQueryRegistry(json.load(collection_queries_file))
@@ -0,0 +1,154 @@
+import json
+import re
+import threading
+from typing import Dict, Final, List, Optional
+
+from botocore.exceptions import ClientError
+
+from service_quotas_manager.util import get_logger
+
+AGGREGATE_FIELDS: Final[List[str]] = ["accountId"]
+"""The fields added to aggregate queries to split their results per account"""
+
+MAX_ACCOUNTS_PER_QUERY: Final[int] = 100
+"""
+The number of accounts an aggregate query is limited to. Keeps the expression well
+within the 4096 characters AWS Config accepts.
+"""
+
+SELECT_PATTERN: Final[re.Pattern] = re.compile(r"^\s*SELECT\s+", re.IGNORECASE)
+"""Matches the start of the select clause of an advanced query"""
+
+WHERE_PATTERN: Final[re.Pattern] = re.compile(
+    r"\s+WHERE\s+(?P<filter>.+?)(?=\s+(?:GROUP|ORDER)\s+BY\s+|\s*$)",
+    re.IGNORECASE | re.DOTALL,
+)
+"""Matches the where clause of an advanced query"""
+
+GROUP_BY_PATTERN: Final[re.Pattern] = re.compile(r"\s+GROUP\s+BY\s+", re.IGNORECASE)
+"""Matches the start of the group by clause of an advanced query"""
+
+logger = get_logger()
+
+
+class ConfigAggregator:
+    """
+    Runs AWS Config advanced queries against an organization aggregator instead of
+    against every account. Each expression is run once for the accounts it is
+    shared by, limited to those accounts and the collected region, and its rows are
+    split per account. The rows of an account are identical to those of the same
+    query run in that account.
+
+    The rows of an account are released once the account has taken them. An
+    aggregate query that fails is not run again, every account is told to run it
+    on its own instead.
+    """
+
+    def __init__(
+        self,
+        config_client,
+        aggregator_name: str,
+        region_name: str,
+        account_ids: List[str],
+    ):
+        self.config_client = config_client
+        self.aggregator_name = aggregator_name
+        self.region_name = region_name
+        self.account_ids = account_ids
+
+        self._rows_by_expression: Dict[str, Optional[Dict[str, List[Dict]]]] = {}
+        self._expression_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_rows(self, expression: str, account_id: str) -> Optional[List[Dict]]:
+        """
+        Return the rows an expression yields for an account, or None if the aggregate
+        query failed. The aggregate query is run on first use of the expression, later
+        calls for any other account reuse it. The rows are handed out once per
+        account.
+        """
+
+        with self._lock:
+            expression_lock = self._expression_locks.setdefault(
+                expression, threading.Lock()
+            )
+
+        with expression_lock:
+            if expression not in self._rows_by_expression:
+                self._rows_by_expression[expression] = self._select(expression)
+
+            rows_by_account = self._rows_by_expression[expression]
+            if rows_by_account is None:
+                return None
+            return rows_by_account.pop(account_id, [])
+
+    def _select(self, expression: str) -> Optional[Dict[str, List[Dict]]]:
+        """
+        Run an aggregate query for the accounts and return their rows by account id,
+        or None if the query failed.
+        """
+
+        rows_by_account: Dict[str, List[Dict]] = {}
+        for i in range(0, len(self.account_ids), MAX_ACCOUNTS_PER_QUERY):
+            aggregate_expression = self._aggregate_expression(
+                expression, self.account_ids[i : i + MAX_ACCOUNTS_PER_QUERY]
+            )
+            expression_result_paginator = self.config_client.get_paginator(
+                "select_aggregate_resource_config"
+            )
+            expression_result_pages = expression_result_paginator.paginate(
+                Expression=aggregate_expression,
+                ConfigurationAggregatorName=self.aggregator_name,
+            )
+
+            try:
+                for expression_result_page in expression_result_pages:
+                    for result in expression_result_page.get("Results", []):
+                        row = json.loads(result)
+                        rows_by_account.setdefault(
+                            row.pop("accountId", None), []
+                        ).append(row)
+            except ClientError as ex:
+                logger.warning(
+                    f"The AWS config aggregate query ({aggregate_expression}) failed. "
+                    f"Error: {ex.response['Error']['Code']}. Running it in every "
+                    f"account instead."
+                )
+                return None
+
+        logger.debug(
+            f"The AWS config aggregate query ({expression}) yielded rows for "
+            f"{len(rows_by_account)} accounts."
+        )
+        return rows_by_account
+
+    def _aggregate_expression(self, expression: str, account_ids: List[str]) -> str:
+        """
+        Limit the expression to the accounts and the region, and add the account to
+        the select and group by clauses.
+        """
+
+        quoted_account_ids = ", ".join(f"'{account_id}'" for account_id in account_ids)
+        account_filter = (
+            f"accountId IN ({quoted_account_ids}) AND awsRegion = '{self.region_name}'"
+        )
+        where_match = WHERE_PATTERN.search(expression)
+        if where_match:
+            aggregate_expression = (
+                f"{expression[: where_match.start()]} WHERE {account_filter} AND "
+                f"({where_match['filter']}){expression[where_match.end() :]}"
+            )
+        else:
+            aggregate_expression = GROUP_BY_PATTERN.sub(
+                f" WHERE {account_filter} GROUP BY ", expression, count=1
+            )
+            if aggregate_expression == expression:
+                aggregate_expression = f"{expression.rstrip()} WHERE {account_filter}"
+
+        aggregate_fields = ", ".join(AGGREGATE_FIELDS)
+        aggregate_expression = SELECT_PATTERN.sub(
+            f"SELECT {aggregate_fields}, ", aggregate_expression, count=1
+        )
+        return GROUP_BY_PATTERN.sub(
+            f" GROUP BY {aggregate_fields}, ", aggregate_expression, count=1
+        )
@@ -0,0 +1,89 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Final, List, Optional
+
+from service_quotas_manager.state_store import StateStore
+from service_quotas_manager.util import get_logger
+
+CACHE_VERSION: Final[int] = 1
+"""The version of the cache format. Caches of another version are discarded."""
+
+CACHE_TTL: Final[timedelta] = timedelta(hours=24)
+"""The time after which all AWS Config queries of an account are run again"""
+
+logger = get_logger()
+
+
+class ConfigResultCache:
+    """
+    The usage AWS Config queries yielded for the quotas of an account in previous
+    runs, together with the discovered resource counts of the resource types the
+    queries select at that time. Used to skip queries whose resources have not
+    changed in number since their result was cached.
+    """
+
+    def __init__(self, state_store: StateStore, key: str, ttl: timedelta = CACHE_TTL):
+        self.state_store = state_store
+        self.key = key
+        self.ttl = ttl
+
+        self._cache: Dict = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """
+        Load the cache from S3. Start with an empty cache if none exists yet or if
+        the existing one has expired or is of another version.
+        """
+
+        cache = self.state_store.read(self.key)
+        if not self._is_valid(cache):
+            logger.info("AWS Config result cache is missing or expired.")
+            cache = {
+                "version": CACHE_VERSION,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "results": {},
+            }
+
+        self._cache = cache
+
+    def save(self) -> None:
+        """Persist the cache."""
+
+        self.state_store.write(self.key, self._cache)
+
+    def get(
+        self, service_code: str, quota_code: str, resource_counts: Dict[str, int]
+    ) -> Optional[Dict]:
+        """
+        Return the cached result of a quota if it was cached with the same resource
+        counts. The result holds the metric values, which are empty if the query
+        yielded no usage.
+        """
+
+        result = self._cache["results"].get(service_code, {}).get(quota_code)
+        if not result or result["resource_counts"] != resource_counts:
+            return None
+        return result
+
+    def put(
+        self,
+        service_code: str,
+        quota_code: str,
+        resource_counts: Dict[str, int],
+        metric_values: List[float],
+    ) -> None:
+        """Replace the cached result of a quota."""
+
+        with self._lock:
+            self._cache["results"].setdefault(service_code, {})[quota_code] = {
+                "resource_counts": resource_counts,
+                "metric_values": metric_values,
+            }
+
+    def _is_valid(self, cache: Dict) -> bool:
+        if not cache or cache.get("version") != CACHE_VERSION:
+            return False
+
+        created_at = datetime.fromisoformat(cache["created_at"])
+        return datetime.now(timezone.utc) - created_at < self.ttl
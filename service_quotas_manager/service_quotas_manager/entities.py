@@ -1,5 +1,48 @@
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+from jmespath.parser import ParsedResult
+
+
+@dataclass(frozen=True)
+class CollectionQuery:
+    """
+    Represents a non-default way of collecting the usage of a quota.
+
+    Attributes
+    ----------
+    service_code: str
+        The identifier of the service the quota belongs to.
+    quota_code: str
+        The identifier of the quota.
+    type: str
+        The source to collect usage from (i.e. config for AWS Config).
+    expression: str
+        The query to run against the source.
+    jmespath: str
+        The JMESPath expression that reduces the query result to the usage.
+    compiled_jmespath: ParsedResult
+        The compiled JMESPath expression.
+    count_filter: Optional[str] = None
+        The filter of the query if the query only counts resources, so the count
+        can be pushed down to AWS Config.
+    count_resource_type: Optional[str] = None
+        The resource type counted if the count filter only selects a resource type,
+        so the count can be combined with counts of other resource types.
+    resource_types: Tuple[str, ...] = ()
+        The resource types the query selects, used to detect whether its result
+        may have changed.
+    """
+
+    service_code: str
+    quota_code: str
+    type: str
+    expression: str
+    jmespath: str
+    compiled_jmespath: ParsedResult = field(compare=False, repr=False)
+    count_filter: Optional[str] = None
+    count_resource_type: Optional[str] = None
+    resource_types: Tuple[str, ...] = ()
 
 
 @dataclass
@@ -25,7 +68,7 @@ class ServiceQuota:
         The descriptive name of the service the quota belongs to.
     unit: str
         The unit in which the quota is applied and measures.
-    collection_query: Dict = field(default_factory=lambda: {})
+    collection_query: Optional[CollectionQuery] = None
         Specifies the query to use if a quota has a non-default way of
         collecting usage (i.e. by using AWS config).
     error_reason: Dict = field(default_factory=lambda: {})
@@ -58,7 +101,7 @@ class ServiceQuota:
     service_name: str
     unit: str
 
-    collection_query: Dict = field(default_factory=lambda: {})
+    collection_query: Optional[CollectionQuery] = None
     error_reason: Dict = field(default_factory=lambda: {})
     internal_id: str = ""
     metric_values: List[float] = field(default_factory=lambda: [])
@@ -96,3 +139,27 @@ class ServiceQuotaIncreaseRule:
     motivation: str
     factor: Optional[float] = None
     step: Optional[float] = None
+
+
+@dataclass
+class AlarmPlan:
+    """
+    Represents the changes needed to bring the alarms of an account in line with
+    the desired alarms.
+
+    Attributes
+    ----------
+    create: List[Dict] = field(default_factory=lambda: [])
+        The definitions of the alarms that do not exist yet.
+    update: List[Dict] = field(default_factory=lambda: [])
+        The definitions of the alarms that exist, but differ from their definition.
+    delete: List[str] = field(default_factory=lambda: [])
+        The names of the alarms that are no longer desired.
+    """
+
+    create: List[Dict] = field(default_factory=lambda: [])
+    update: List[Dict] = field(default_factory=lambda: [])
+    delete: List[str] = field(default_factory=lambda: [])
+
+    def __len__(self) -> int:
+        return len(self.create) + len(self.update) + len(self.delete)
@@ -0,0 +1,222 @@
+import math
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Final, List
+from urllib.parse import urlencode
+
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.metrics.provider.cloudwatch_emf.cloudwatch import (
+    AmazonCloudWatchEMFProvider,
+)
+from aws_lambda_powertools.metrics.provider.cloudwatch_emf.constants import (
+    MAX_METRICS,
+)
+
+from service_quotas_manager.util import get_logger
+
+MAX_DATUMS_PER_REQUEST: Final[int] = 1000
+"""The maximum number of metric datums in a single PutMetricData request"""
+
+MAX_REQUEST_BYTES: Final[int] = 1_000_000
+"""
+The size the body of a single PutMetricData request is kept under, as serialized by
+the protocol of the client before compression
+"""
+
+MAX_VALUES_PER_DATUM: Final[int] = 150
+"""The maximum number of distinct values in a single metric datum"""
+
+DEFAULT_PUBLISH_WORKERS: Final[int] = 4
+"""The number of PutMetricData requests to send concurrently"""
+
+METRIC_OUTPUT_API: Final[str] = "api"
+"""Publish metric data with PutMetricData requests"""
+
+METRIC_OUTPUT_EMF: Final[str] = "emf"
+"""Publish metric data as Embedded Metric Format log lines"""
+
+METRIC_OUTPUTS: Final[List[str]] = [METRIC_OUTPUT_API, METRIC_OUTPUT_EMF]
+"""The supported ways of publishing metric data"""
+
+logger = get_logger()
+
+
+class MetricDataPublisher:
+    """
+    Publishes metric data to CloudWatch for any number of metrics. Every value of a
+    metric is published, combined in `Values` and `Counts` arrays, and the datums are
+    split in requests that stay within both the datum and the size limits of
+    PutMetricData. Request sizes are measured by serializing the metric data the way
+    the client does, as the query protocol repeats the member names of every value
+    and is several times larger than the data itself. Requests are sent
+    concurrently.
+    """
+
+    def __init__(self, cloudwatch_client, workers: int = DEFAULT_PUBLISH_WORKERS):
+        self.cloudwatch_client = cloudwatch_client
+        self.workers = workers
+
+        self._operation_model = cloudwatch_client.meta.service_model.operation_model(
+            "PutMetricData"
+        )
+
+    def publish(
+        self,
+        namespace: str,
+        metrics: List[Dict],
+        values_by_metric: List[List[float]],
+        timestamp: datetime,
+    ) -> int:
+        """
+        Publish the values of each metric, given as a dict with a MetricName and
+        Dimensions. Returns the number of requests sent.
+        """
+
+        metric_data = [
+            datum
+            for metric, values in zip(metrics, values_by_metric, strict=True)
+            for datum in self._build_datums(metric, values, timestamp)
+        ]
+        batches = self._batch_metric_data(namespace, metric_data)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            requests = [
+                executor.submit(
+                    self.cloudwatch_client.put_metric_data,
+                    Namespace=namespace,
+                    MetricData=batch,
+                )
+                for batch in batches
+            ]
+            for request in requests:
+                request.result()
+
+        logger.debug(
+            f"Published {len(metric_data)} metric datums in {len(batches)} requests."
+        )
+        return len(batches)
+
+    def _build_datums(
+        self, metric: Dict, values: List[float], timestamp: datetime
+    ) -> List[Dict]:
+        """
+        Combine the values of a metric in datums of up to 150 distinct values, each
+        with the number of times it occurred.
+        """
+
+        value_counts = list(Counter(values).items())
+        return [
+            {
+                **metric,
+                "Timestamp": timestamp,
+                "Values": [value for value, _ in chunk],
+                "Counts": [float(count) for _, count in chunk],
+            }
+            for chunk in (
+                value_counts[i : i + MAX_VALUES_PER_DATUM]
+                for i in range(0, len(value_counts), MAX_VALUES_PER_DATUM)
+            )
+        ]
+
+    def _batch_metric_data(
+        self, namespace: str, metric_data: List[Dict]
+    ) -> List[List[Dict]]:
+        """
+        Split metric data in batches within the maximum number of datums and bytes
+        per request. Batches are filled by the serialized size of each datum on its
+        own, which leaves out the position of the datum in the request, so every batch
+        is measured once more and split in half while it is too large.
+        """
+
+        batches: List[List[Dict]] = []
+        batch_bytes = 0
+
+        for datum in metric_data:
+            datum_bytes = self._request_bytes(namespace, [datum])
+            if (
+                not batches
+                or len(batches[-1]) >= MAX_DATUMS_PER_REQUEST
+                or batch_bytes + datum_bytes > MAX_REQUEST_BYTES
+            ):
+                batches.append([])
+                batch_bytes = 0
+
+            batches[-1].append(datum)
+            batch_bytes += datum_bytes
+
+        return [
+            split for batch in batches for split in self._split_batch(namespace, batch)
+        ]
+
+    def _split_batch(self, namespace: str, batch: List[Dict]) -> List[List[Dict]]:
+        """Split a batch in halves until every half is within the request size."""
+
+        if (
+            len(batch) == 1
+            or self._request_bytes(namespace, batch) <= MAX_REQUEST_BYTES
+        ):
+            return [batch]
+
+        half = len(batch) // 2
+        return self._split_batch(namespace, batch[:half]) + self._split_batch(
+            namespace, batch[half:]
+        )
+
+    def _request_bytes(self, namespace: str, metric_data: List[Dict]) -> int:
+        """The size of the body of a PutMetricData request for the metric data."""
+
+        request = self.cloudwatch_client._serializer.serialize_to_request(
+            {"Namespace": namespace, "MetricData": metric_data}, self._operation_model
+        )
+        body = request["body"]
+        # The query protocol leaves url encoding the parameters to the request.
+        if isinstance(body, dict):
+            body = urlencode(body, doseq=True)
+
+        return len(body)
+
+
+class EmbeddedMetricPublisher:
+    """
+    Publishes metric data as CloudWatch Embedded Metric Format log lines, which
+    CloudWatch Logs turns into metrics without any API calls from the function.
+    Each metric is written on its own lines, as its dimensions differ from those of
+    the other metrics, with up to 100 values per line.
+    """
+
+    def publish(
+        self,
+        namespace: str,
+        metrics: List[Dict],
+        values_by_metric: List[List[float]],
+        timestamp: datetime,
+    ) -> int:
+        """
+        Publish the values of each metric, given as a dict with a MetricName and
+        Dimensions. Returns the number of log lines written.
+        """
+
+        lines = 0
+        for metric, values in zip(metrics, values_by_metric, strict=True):
+            # An empty service keeps Powertools from adding the service name as an
+            # extra dimension, so the metrics match those published by the API.
+            emf_metrics = AmazonCloudWatchEMFProvider(
+                namespace=namespace,
+                service="",
+                default_dimensions={
+                    dimension["Name"]: dimension["Value"]
+                    for dimension in metric["Dimensions"]
+                },
+            )
+            emf_metrics.set_timestamp(timestamp)
+            for value in values:
+                emf_metrics.add_metric(
+                    name=metric["MetricName"], unit=MetricUnit.NoUnit, value=value
+                )
+            if len(values) % MAX_METRICS:
+                emf_metrics.flush_metrics()
+            lines += math.ceil(len(values) / MAX_METRICS)
+
+        logger.debug(f"Published {len(metrics)} metrics in {lines} EMF log lines.")
+        return lines
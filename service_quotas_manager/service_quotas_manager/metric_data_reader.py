@@ -0,0 +1,126 @@
+import math
+from datetime import datetime
+from typing import Dict, Final, List
+
+from service_quotas_manager.util import get_logger
+
+MAX_QUERIES_PER_REQUEST: Final[int] = 500
+"""The maximum number of metric data queries in a single GetMetricData request"""
+
+MAX_DATAPOINTS_PER_REQUEST: Final[int] = 100_800
+"""The maximum number of datapoints a single GetMetricData request returns"""
+
+MAX_ATTEMPTS: Final[int] = 3
+"""The number of times to request metric data for queries that did not complete"""
+
+FINAL_STATUS_CODES: Final[List[str]] = ["Complete", "Forbidden"]
+"""Status codes of metric data results that are not improved by asking again"""
+
+logger = get_logger()
+
+
+class MetricDataReader:
+    """
+    Reads metric data from CloudWatch for any number of queries. Queries are split in
+    requests that stay within the GetMetricData limits, every page of a request is
+    read and merged by query id, and queries that did not complete are requested
+    again.
+    """
+
+    def __init__(self, cloudwatch_client):
+        self.cloudwatch_client = cloudwatch_client
+
+    def read(
+        self, queries: List[Dict], start_time: datetime, end_time: datetime
+    ) -> Dict[str, List[float]]:
+        """Return the values of each query by query id, newest first."""
+
+        values_by_id: Dict[str, List[float]] = {}
+        pending_queries = queries
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            incomplete_queries = []
+            for batch in self._batch_queries(pending_queries, start_time, end_time):
+                results_by_id = self._read_batch(batch, start_time, end_time)
+                for query in batch:
+                    result = results_by_id.get(query["Id"])
+                    if result:
+                        values_by_id[query["Id"]] = result["Values"]
+                    if not result or result["StatusCode"] not in FINAL_STATUS_CODES:
+                        incomplete_queries.append(query)
+
+            if not incomplete_queries:
+                break
+
+            logger.info(
+                f"Metric data for {len(incomplete_queries)} queries was incomplete "
+                f"after attempt {attempt} of {MAX_ATTEMPTS}."
+            )
+            pending_queries = incomplete_queries
+
+        return values_by_id
+
+    def _batch_queries(
+        self, queries: List[Dict], start_time: datetime, end_time: datetime
+    ) -> List[List[Dict]]:
+        """
+        Split queries in batches within the maximum number of queries and datapoints
+        per request.
+        """
+
+        batches: List[List[Dict]] = []
+        batch_datapoints = 0
+
+        for query in queries:
+            datapoints = math.ceil(
+                (end_time - start_time).total_seconds() / query["MetricStat"]["Period"]
+            )
+            if (
+                not batches
+                or len(batches[-1]) >= MAX_QUERIES_PER_REQUEST
+                or batch_datapoints + datapoints > MAX_DATAPOINTS_PER_REQUEST
+            ):
+                batches.append([])
+                batch_datapoints = 0
+
+            batches[-1].append(query)
+            batch_datapoints += datapoints
+
+        return batches
+
+    def _read_batch(
+        self, batch: List[Dict], start_time: datetime, end_time: datetime
+    ) -> Dict[str, Dict]:
+        """Read all pages of a request, merging the results by query id."""
+
+        results_by_id: Dict[str, Dict] = {}
+        request = {
+            "MetricDataQueries": batch,
+            "StartTime": start_time,
+            "EndTime": end_time,
+            "ScanBy": "TimestampDescending",
+        }
+
+        while True:
+            metric_data = self.cloudwatch_client.get_metric_data(**request)
+
+            for message in metric_data.get("Messages", []):
+                logger.warning(
+                    f"GetMetricData returned {message.get('Code')}: {message.get('Value')}"
+                )
+
+            for metric_data_result in metric_data["MetricDataResults"]:
+                result = results_by_id.setdefault(
+                    metric_data_result["Id"], {"Values": []}
+                )
+                result["Values"] += metric_data_result.get("Values", [])
+                result["StatusCode"] = metric_data_result.get("StatusCode", "Complete")
+                for message in metric_data_result.get("Messages", []):
+                    logger.debug(
+                        f"Metric data for query {metric_data_result['Id']} returned "
+                        f"{message.get('Code')}: {message.get('Value')}"
+                    )
+
+            if not metric_data.get("NextToken"):
+                return results_by_id
+            request["NextToken"] = metric_data["NextToken"]
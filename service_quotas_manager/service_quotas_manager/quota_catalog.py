@@ -0,0 +1,100 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Final, List
+
+from service_quotas_manager.state_store import StateStore
+from service_quotas_manager.util import get_logger
+
+CATALOG_VERSION: Final[int] = 1
+"""The version of the catalog format. Catalogs of another version are discarded."""
+
+CATALOG_TTL: Final[timedelta] = timedelta(hours=24)
+"""The time after which a catalog is considered stale and rebuilt"""
+
+_catalogs: Dict[str, Dict] = {}
+"""Catalogs kept in memory across warm invocations, indexed by their S3 location"""
+
+logger = get_logger()
+
+
+class QuotaCatalog:
+    """
+    A cache for the account independent parts of Service Quotas: the list of services
+    and the AWS default quotas per service. The catalog is kept in memory across warm
+    invocations and persisted as a compressed object in the configuration bucket.
+    """
+
+    def __init__(self, state_store: StateStore, key: str, ttl: timedelta = CATALOG_TTL):
+        self.state_store = state_store
+        self.key = key
+        self.ttl = ttl
+
+        self._catalog: Dict = {}
+        self._changed = False
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """
+        Load the catalog from memory or S3. Start with an empty catalog if none
+        exists yet or if the existing one is stale or of another version.
+        """
+
+        catalog = _catalogs.get(f"{self.state_store.bucket}/{self.key}")
+        if not self._is_valid(catalog):
+            catalog = self.state_store.read(self.key)
+
+        if not self._is_valid(catalog):
+            logger.info("Quota catalog is missing or stale, building a new one.")
+            catalog = {
+                "version": CATALOG_VERSION,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "services": None,
+                "default_service_quotas": {},
+            }
+
+        self._catalog = catalog
+        _catalogs[f"{self.state_store.bucket}/{self.key}"] = catalog
+
+    def save(self) -> None:
+        """Persist the catalog to S3 if anything was added to it."""
+
+        if not self._changed:
+            return
+
+        self.state_store.write(self.key, self._catalog)
+        self._changed = False
+        logger.info("Stored quota catalog.")
+
+    def get_services(self, loader: Callable[[], List[Dict]]) -> List[Dict]:
+        """Return the services in Service Quotas, using the loader on a cache miss."""
+
+        if self._catalog.get("services") is None:
+            services = loader()
+            with self._lock:
+                self._catalog["services"] = services
+                self._changed = True
+
+        return self._catalog["services"]
+
+    def get_default_service_quotas(
+        self, service_code: str, loader: Callable[[str], List[Dict]]
+    ) -> List[Dict]:
+        """
+        Return the AWS default quotas of a service, using the loader on a cache miss.
+        """
+
+        default_service_quotas = self._catalog["default_service_quotas"]
+        if service_code not in default_service_quotas:
+            service_quotas = loader(service_code)
+            with self._lock:
+                default_service_quotas[service_code] = service_quotas
+                self._changed = True
+
+        return default_service_quotas[service_code]
+
+    def _is_valid(self, catalog: Dict) -> bool:
+        if not catalog or catalog.get("version") != CATALOG_VERSION:
+            return False
+
+        created_at = datetime.fromisoformat(catalog["created_at"])
+        return datetime.now(timezone.utc) - created_at < self.ttl
@@ -0,0 +1,170 @@
+import threading
+import time
+from typing import Dict, Final, List, Optional
+
+from service_quotas_manager.util import get_logger
+
+DEFAULT_RATES: Final[Dict[str, Dict[str, float]]] = {
+    "service-quotas": {
+        "GetAWSDefaultServiceQuota": 5,
+        "GetServiceQuota": 5,
+        "ListAWSDefaultServiceQuotas": 5,
+        "ListRequestedServiceQuotaChangeHistory": 5,
+        "ListServiceQuotas": 5,
+        "ListServices": 5,
+    },
+    "cloudwatch": {
+        "DeleteAlarms": 3,
+        "DescribeAlarms": 9,
+        "GetMetricData": 50,
+        "PutMetricAlarm": 3,
+        "PutMetricData": 150,
+    },
+    "config-service": {
+        "GetDiscoveredResourceCounts": 1,
+        "SelectAggregateResourceConfig": 1,
+        "SelectResourceConfig": 2,
+    },
+    "cost-explorer": {
+        "GetCostAndUsage": 5,
+    },
+}
+"""Requests per second to start from per service and operation, based on the
+documented API limits. Services are keyed by their hyphenized service id, which is
+not always the client name. Operations that are not listed are not rate limited."""
+
+THROTTLING_ERROR_CODES: Final[List[str]] = [
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+]
+"""Error codes AWS uses to signal that requests are being throttled"""
+
+MINIMUM_RATE: Final[float] = 0.2
+"""The lowest rate a token bucket backs off to (requests per second)"""
+
+BACKOFF_FACTOR: Final[float] = 0.5
+"""The factor a token bucket's rate is multiplied with when throttled"""
+
+RECOVERY_STEPS: Final[int] = 10
+"""The number of successful calls needed to recover from a throttle back off"""
+
+logger = get_logger()
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket that adapts its rate to throttling. The rate is cut
+    on every throttle and recovers linearly on successful calls, up to the rate
+    the bucket started with.
+    """
+
+    def __init__(self, rate: float, minimum_rate: float = MINIMUM_RATE):
+        self.maximum_rate = float(rate)
+        self.minimum_rate = min(float(minimum_rate), self.maximum_rate)
+        self.rate = self.maximum_rate
+
+        self._capacity = max(1.0, self.maximum_rate)
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a token from the bucket, waiting until one is available. Tokens are
+        reserved before waiting, so concurrent callers are spread out evenly.
+        Returns the number of seconds waited.
+        """
+
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait_time = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait_time:
+            time.sleep(wait_time)
+        return wait_time
+
+    def throttled(self) -> None:
+        """Back off after AWS throttled a call and drop any burst capacity left."""
+
+        with self._lock:
+            self._refill()
+            self.rate = max(self.minimum_rate, self.rate * BACKOFF_FACTOR)
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self) -> None:
+        """Speed back up towards the starting rate after a successful call."""
+
+        with self._lock:
+            if self.rate < self.maximum_rate:
+                self._refill()
+                self.rate = min(
+                    self.maximum_rate,
+                    self.rate + self.maximum_rate / RECOVERY_STEPS,
+                )
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+
+class RateLimiter:
+    """
+    Paces the calls a boto3 client makes with a token bucket per (client, operation).
+
+    The limiter hooks into the botocore event system, so every HTTP attempt, including
+    the retries botocore makes itself, takes a token. Throttling responses make the
+    bucket back off, successful responses make it speed back up.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, Dict[str, float]]] = None):
+        self.rates = DEFAULT_RATES if rates is None else rates
+
+    def attach(self, client):
+        """
+        Rate limit the calls made by a client. A client should only be attached once.
+        Returns the client to allow for chaining.
+        """
+
+        service_id = client.meta.service_model.service_id.hyphenize()
+        buckets = {
+            operation_name: TokenBucket(rate)
+            for operation_name, rate in self.rates.get(service_id, {}).items()
+        }
+        if not buckets:
+            return client
+
+        def before_send(event_name: str, **kwargs) -> None:
+            operation_name = event_name.rsplit(".", 1)[-1]
+            bucket = buckets.get(operation_name)
+            if not bucket:
+                return
+
+            wait_time = bucket.acquire()
+            if wait_time:
+                logger.debug(
+                    f"Waited {wait_time:.2f}s for {service_id} / {operation_name} at {bucket.rate:.2f} TPS."
+                )
+
+        def needs_retry(operation, response=None, **kwargs) -> None:
+            bucket = buckets.get(operation.name)
+            if not bucket or response is None:
+                return
+
+            http_response, parsed_response = response
+            if parsed_response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+                bucket.throttled()
+                logger.info(
+                    f"Throttled on {service_id} / {operation.name}, backing off to {bucket.rate:.2f} TPS."
+                )
+            elif http_response.status_code < 300:
+                bucket.succeeded()
+
+        client.meta.events.register(f"before-send.{service_id}", before_send)
+        client.meta.events.register(f"needs-retry.{service_id}", needs_retry)
+
+        return client
@@ -0,0 +1,153 @@
+import functools
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Final, List, Optional, Set, Tuple
+
+from service_quotas_manager.util import get_logger
+
+COST_EXPLORER_SERVICE_CODES_PATH: Final[Path] = (
+    Path(__file__).parent / "cost_explorer_service_codes.json"
+)
+"""The file with the service codes of Cost Explorer services shipped with the package"""
+
+TOKEN_PATTERN: Final[re.Pattern] = re.compile(r"[a-z0-9]+")
+"""Matches the words of a lowercased service name"""
+
+STOPWORDS: Final[Set[str]] = {"amazon", "and", "aws", "for", "service", "the"}
+"""Words that occur in many service names and say nothing about the service"""
+
+MIN_MATCH_SCORE: Final[float] = 0.6
+"""The share of words a service name has to have in common to match"""
+
+_resolved_service_codes: Dict[str, Tuple[str, ...]] = {}
+"""Service codes by Cost Explorer service name, kept across warm invocations"""
+
+_lock = threading.Lock()
+
+logger = get_logger()
+
+
+@functools.cache
+def load_service_code_table() -> Dict[str, List[str]]:
+    """Load the service codes of Cost Explorer services shipped with the package."""
+
+    with open(COST_EXPLORER_SERVICE_CODES_PATH) as f:
+        return json.load(f)
+
+
+class ServiceCodeResolver:
+    """
+    Resolves the service names Cost Explorer reports to Service Quotas service codes.
+    Names are looked up in a curated mapping table first, then compared to the
+    service names of Service Quotas. Names that match neither are matched on the
+    words they share with a service name, using an index of the words that is only
+    built when such a name is seen. Resolved names are kept in memory, so a warm
+    invocation resolves billed services without matching any names.
+    """
+
+    def __init__(
+        self,
+        services: List[Dict],
+        service_code_table: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.services = services
+        self.service_code_table = (
+            load_service_code_table()
+            if service_code_table is None
+            else service_code_table
+        )
+
+        self._service_codes = {service["ServiceCode"] for service in services}
+        self._service_codes_by_name = {
+            service["ServiceName"]: service["ServiceCode"] for service in services
+        }
+        self._index: Optional[Dict[str, Set[str]]] = None
+        self._tokens_by_service_code: Dict[str, Set[str]] = {}
+
+    def resolve(self, service_names: List[str]) -> Dict[str, Tuple[str, ...]]:
+        """
+        Return the service codes of each Cost Explorer service name. Names without a
+        matching service resolve to no service codes.
+        """
+
+        resolved = {}
+        for service_name in service_names:
+            with _lock:
+                service_codes = _resolved_service_codes.get(service_name)
+
+            if service_codes is None:
+                service_codes = self._resolve(service_name)
+                with _lock:
+                    _resolved_service_codes[service_name] = service_codes
+
+            resolved[service_name] = tuple(
+                service_code
+                for service_code in service_codes
+                if service_code in self._service_codes
+            )
+
+        return resolved
+
+    def _resolve(self, service_name: str) -> Tuple[str, ...]:
+        """Resolve a service name by the mapping table, its name or its words."""
+
+        if service_name in self.service_code_table:
+            return tuple(self.service_code_table[service_name])
+
+        if service_name in self._service_codes_by_name:
+            return (self._service_codes_by_name[service_name],)
+
+        service_code = self._match(service_name)
+        if service_code:
+            logger.debug(
+                f"Matched Cost Explorer service {service_name} to service code "
+                f"{service_code}."
+            )
+            return (service_code,)
+
+        logger.debug(f"No service code found for Cost Explorer service {service_name}.")
+        return ()
+
+    def _match(self, service_name: str) -> Optional[str]:
+        """
+        Return the service code of the service whose name shares the largest part of
+        its words with the given name, if that part is large enough. Ties go to the
+        first service code in alphabetical order.
+        """
+
+        tokens = _tokenize(service_name)
+        if not tokens:
+            return None
+
+        index = self._build_index()
+        candidates = set().union(*(index.get(token, set()) for token in tokens))
+
+        best_match: Optional[Tuple[float, str]] = None
+        for service_code in sorted(candidates):
+            service_tokens = self._tokens_by_service_code[service_code]
+            score = len(tokens & service_tokens) / len(tokens | service_tokens)
+            if score >= MIN_MATCH_SCORE and (
+                best_match is None or score > best_match[0]
+            ):
+                best_match = (score, service_code)
+
+        return best_match[1] if best_match else None
+
+    def _build_index(self) -> Dict[str, Set[str]]:
+        """Index the service codes by the words of their service names."""
+
+        if self._index is None:
+            self._index = {}
+            for service in self.services:
+                tokens = _tokenize(service["ServiceName"])
+                self._tokens_by_service_code[service["ServiceCode"]] = tokens
+                for token in tokens:
+                    self._index.setdefault(token, set()).add(service["ServiceCode"])
+
+        return self._index
+
+
+def _tokenize(service_name: str) -> Set[str]:
+    return set(TOKEN_PATTERN.findall(service_name.lower())) - STOPWORDS
@@ -1,15 +1,33 @@
 import json
-import time
-from datetime import datetime, timedelta
-from difflib import SequenceMatcher as SM
-from typing import Dict, Final, List, Optional
-from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Callable, Dict, Final, Iterator, List, Optional, Set, Tuple
 
-import jmespath
 from botocore.exceptions import ClientError
-from jmespath.exceptions import ParseError
-
-from service_quotas_manager.entities import ServiceQuota
+from jmespath.exceptions import JMESPathError
+
+from service_quotas_manager.alarm_digest import AlarmDigest
+from service_quotas_manager.alarm_migration import AlarmMigration
+from service_quotas_manager.alarm_reconciler import AlarmReconciler
+from service_quotas_manager.applied_quota_snapshot import AppliedQuotaSnapshot
+from service_quotas_manager.billed_service_cache import BilledServiceCache
+from service_quotas_manager.collection_query_registry import (
+    get_collection_query_registry,
+)
+from service_quotas_manager.config_aggregator import ConfigAggregator
+from service_quotas_manager.config_result_cache import ConfigResultCache
+from service_quotas_manager.entities import AlarmPlan, ServiceQuota
+from service_quotas_manager.metric_data_publisher import (
+    METRIC_OUTPUT_API,
+    METRIC_OUTPUT_EMF,
+    EmbeddedMetricPublisher,
+    MetricDataPublisher,
+)
+from service_quotas_manager.metric_data_reader import MetricDataReader
+from service_quotas_manager.quota_catalog import QuotaCatalog
+from service_quotas_manager.service_code_resolver import ServiceCodeResolver
+from service_quotas_manager.streaming_reduction import StreamingReduction
 from service_quotas_manager.util import convert_dict, get_logger
 
 CE_ITEM_BLACKLIST: Final[List["str"]] = ["Tax", "EC2 - Other"]
@@ -21,9 +39,45 @@ LOCAL_METRIC_NAMESPACE: Final[str] = "ServiceQuotaManager"
 LOCAL_METRIC_NAME: Final[str] = "ServiceQuotaUsage"
 """The metric name under which to store metrics in CloudWatch"""
 
+LOCAL_UTILIZATION_METRIC_NAME: Final[str] = "ServiceQuotaUtilization"
+"""The metric name under which to store usage as a percentage of the quota"""
+
+LOCAL_METRIC_STATISTIC: Final[str] = "Maximum"
+"""
+The statistic alarms evaluate the stored metrics with. Every value of the past hour is
+stored, each already aggregated with the statistic Service Quotas recommends, so the
+alarm compares the highest of them to the threshold instead of aggregating them again.
+"""
+
+ALARM_NAME_PREFIX: Final[str] = "Service Quota:"
+"""The prefix of the names of all alarms on service quotas"""
+
+ACCOUNT_ALARM_NAME_PREFIX: Final[str] = ALARM_NAME_PREFIX + " {account_id}:"
+"""The prefix of the names of the alarms on the service quotas of an account"""
+
+THRESHOLD_MODE_ABSOLUTE: Final[str] = "absolute"
+"""Alarm on usage, with the threshold calculated from the applied quota"""
+
+THRESHOLD_MODE_PERCENTAGE: Final[str] = "percentage"
+"""Alarm on utilization, with the threshold percentage itself as threshold"""
+
 METRIC_FILTER_THRESHOLD_PERC: Final[int] = 10
 """Quota usage below this % of applied quota is ignored."""
 
+DEFAULT_DISCOVERY_WORKERS: Final[int] = 4
+"""The number of Service Quotas listings to retrieve concurrently"""
+
+DEFAULT_CONFIG_QUERY_WORKERS: Final[int] = 2
+"""The number of AWS Config queries to run concurrently"""
+
+COUNT_EXPRESSION: Final[str] = (
+    "SELECT resourceType, COUNT(*) WHERE {count_filter} GROUP BY resourceType"
+)
+"""The AWS Config query that counts the resources matching a filter by type"""
+
+MAX_RESOURCE_TYPES_PER_COUNT_REQUEST: Final[int] = 20
+"""The maximum number of resource types in a GetDiscoveredResourceCounts request"""
+
 logger = get_logger()
 
 
@@ -36,6 +90,17 @@ class ServiceQuotasCollector:
         remote_ce_client,
         local_cloudwatch_client,
         account_id: str,
+        discovery_workers: int = DEFAULT_DISCOVERY_WORKERS,
+        config_query_workers: int = DEFAULT_CONFIG_QUERY_WORKERS,
+        quota_catalog: Optional[QuotaCatalog] = None,
+        applied_quota_snapshot: Optional[AppliedQuotaSnapshot] = None,
+        config_aggregator: Optional[ConfigAggregator] = None,
+        config_result_cache: Optional[ConfigResultCache] = None,
+        metric_output: str = METRIC_OUTPUT_API,
+        publish_utilization: bool = False,
+        alarm_digest: Optional[AlarmDigest] = None,
+        billed_service_cache: Optional[BilledServiceCache] = None,
+        alarm_migration: Optional[AlarmMigration] = None,
     ):
         self.remote_service_quota_client = remote_service_quota_client
         self.remote_cloudwatch_client = remote_cloudwatch_client
@@ -43,11 +108,26 @@ class ServiceQuotasCollector:
         self.remote_ce_client = remote_ce_client
         self.local_cloudwatch_client = local_cloudwatch_client
         self.account_id = account_id
-
-        self._service_quotas: List[ServiceQuota] = []
-        self._custom_collection_queries = json.load(
-            open("service_quotas_manager/custom_collection_queries.json")
+        self.discovery_workers = discovery_workers
+        self.config_query_workers = config_query_workers
+        self.quota_catalog = quota_catalog
+        self.applied_quota_snapshot = applied_quota_snapshot
+        self.config_aggregator = config_aggregator
+        self.config_result_cache = config_result_cache
+        self.publish_utilization = publish_utilization
+        self.alarm_digest = alarm_digest
+        self.billed_service_cache = billed_service_cache
+        self.alarm_migration = alarm_migration
+
+        self._metric_data_reader = MetricDataReader(remote_cloudwatch_client)
+        self._alarm_reconciler = AlarmReconciler(local_cloudwatch_client)
+        self._metric_data_publisher = (
+            EmbeddedMetricPublisher()
+            if metric_output == METRIC_OUTPUT_EMF
+            else MetricDataPublisher(local_cloudwatch_client)
         )
+        self._service_quotas: List[ServiceQuota] = []
+        self._collection_query_registry = get_collection_query_registry()
 
         self.__sqid_cntr = 0
 
@@ -64,55 +144,132 @@ class ServiceQuotasCollector:
 
         service_quotas_with_metrics = []
 
-        for service in filtered_services:
-            service_quotas = self._find_service_quotas(service["ServiceCode"])
+        service_quotas = self._find_service_quotas(
+            [service["ServiceCode"] for service in filtered_services]
+        )
+        for service_quota in service_quotas:
+            if not service_quota.usage_metric:
+                service_quota.collection_query = self._collection_query_registry.get(
+                    service_quota.service_code, service_quota.quota_code
+                )
+            if service_quota.usage_metric or service_quota.collection_query:
+                service_quotas_with_metrics.append(service_quota)
+
+        self._collect_config_remote_metrics(
+            [
+                sq
+                for sq in service_quotas_with_metrics
+                if sq.collection_query and sq.collection_query.type == "config"
+            ]
+        )
 
-            for service_quota in service_quotas:
-                if service_quota.usage_metric:
-                    service_quotas_with_metrics.append(service_quota)
-                elif service_quota.quota_code in self._custom_collection_queries.get(
-                    service_quota.service_code, {}
-                ):
-                    service_quota.collection_query = self._custom_collection_queries[
-                        service_quota.service_code
-                    ][service_quota.quota_code]
-                    service_quotas_with_metrics.append(service_quota)
-
-        service_quota_groups = [
-            service_quotas_with_metrics[i : i + 500]
-            for i in range(0, len(service_quotas_with_metrics), 500)
-        ]
-        for service_quota_group in service_quota_groups:
-            self._collect_cloudwatch_remote_metrics(
-                [sq for sq in service_quota_group if sq.usage_metric]
-            )
-            self._collect_config_remote_metrics(
-                [
-                    sq
-                    for sq in service_quota_group
-                    if sq.collection_query.get("type", "") == "config"
-                ]
-            )
-            self._filter_metrics(service_quota_group)
-            self._put_local_metrics(service_quota_group)
-            self._service_quotas += service_quota_group
+        self._collect_cloudwatch_remote_metrics(
+            [sq for sq in service_quotas_with_metrics if sq.usage_metric]
+        )
+        self._filter_metrics(service_quotas_with_metrics)
+        self._put_local_metrics(service_quotas_with_metrics)
+        self._service_quotas += service_quotas_with_metrics
 
-    def manage_alarms(self, alerting_config: Dict) -> None:
+    def manage_alarms(self, alerting_config: Dict, dry_run: bool = False) -> AlarmPlan:
         """
         Create, update or delete alarms. Skip if there's no
         alerting config or no service quotas to monitor.
+
+        The changes are planned before they are made and the plan is returned. With
+        dry run enabled, the plan is only logged.
+
+        With an alarm digest, alarms that are desired exactly as when they were last
+        reconciled are not reconciled again until a full reconcile is due.
+
+        Alarms named the way earlier versions did are looked up among the alarms of
+        all accounts, until a run that applied all changes records the account as
+        migrated.
         """
 
         if not self._service_quotas:
-            return
+            return AlarmPlan()
 
         if not alerting_config:
-            return
+            return AlarmPlan()
+
+        desired_alarms_by_service_quota = {
+            f"{service_quota.service_code}#{service_quota.quota_code}#{self.account_id}": self._build_alarm_definition(
+                alerting_config, service_quota
+            )
+            for service_quota in self._service_quotas
+            if self.__should_alarm(alerting_config, service_quota)
+        }
+
+        digest = self._alarm_reconciler.digest(desired_alarms_by_service_quota)
+        if self.alarm_digest and not dry_run and self.alarm_digest.is_unchanged(digest):
+            logger.info(
+                f"Skipping the reconciliation of {len(desired_alarms_by_service_quota)} unchanged alarms."
+            )
+            return AlarmPlan()
+
+        alarms_by_service_quota, legacy_alarm_names = self._describe_account_alarms()
+
+        alarm_plan = self._alarm_reconciler.plan(
+            desired_alarms_by_service_quota, alarms_by_service_quota
+        )
+        alarm_plan.delete += legacy_alarm_names
+        if dry_run:
+            for alarm in alarm_plan.create:
+                logger.info(f"Dry run: would create alarm {alarm['AlarmName']}")
+            for alarm in alarm_plan.update:
+                logger.info(f"Dry run: would update alarm {alarm['AlarmName']}")
+            for alarm_name in alarm_plan.delete:
+                logger.info(f"Dry run: would delete alarm {alarm_name}")
+        else:
+            self._alarm_reconciler.apply(alarm_plan)
+            if self.alarm_migration:
+                self.alarm_migration.mark_done()
+            if self.alarm_digest:
+                self.alarm_digest.save(digest)
+
+        return alarm_plan
+
+    def _describe_account_alarms(self) -> Tuple[Dict[str, Dict], List[str]]:
+        """
+        Retrieve the alarms of this account, indexed by service code, quota code and
+        account id, and the names of legacy alarms to delete.
+
+        Alarms named before their names started with the account id can only be
+        found among the alarms of all accounts, so they are looked up until the
+        account is migrated. They are renamed once found, or deleted if a run that
+        was cut short already renamed them.
+        """
+
+        account_alarm_name_prefix = ACCOUNT_ALARM_NAME_PREFIX.format(
+            account_id=self.account_id
+        )
+        alarms_by_service_quota = self._describe_alarms(account_alarm_name_prefix)
+
+        legacy_alarm_names = []
+        if not (self.alarm_migration and self.alarm_migration.is_done()):
+            legacy_alarms_by_service_quota = self._describe_alarms(
+                ALARM_NAME_PREFIX, excluded_name_prefix=account_alarm_name_prefix
+            )
+            for key, legacy_alarm in legacy_alarms_by_service_quota.items():
+                if key in alarms_by_service_quota:
+                    legacy_alarm_names.append(legacy_alarm["AlarmName"])
+                else:
+                    alarms_by_service_quota[key] = legacy_alarm
+
+        return alarms_by_service_quota, legacy_alarm_names
+
+    def _describe_alarms(
+        self, alarm_name_prefix: str, excluded_name_prefix: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """
+        Retrieve the alarms of this account with a name prefix, indexed by service
+        code, quota code and account id. Alarms with the excluded name prefix are
+        left out.
+        """
 
-        # Retrieve all currently setup alarms for service quotas.
         alarms_paginator = self.local_cloudwatch_client.get_paginator("describe_alarms")
         alarms_pages = alarms_paginator.paginate(
-            AlarmNamePrefix="Service Quota:", AlarmTypes=["MetricAlarm"]
+            AlarmNamePrefix=alarm_name_prefix, AlarmTypes=["MetricAlarm"]
         )
 
         alarms_by_service_quota = {}
@@ -123,116 +280,77 @@ class ServiceQuotasCollector:
                     for dimension in alarm["Dimensions"]
                 }
 
-                if nd["AccountId"] != self.account_id:
+                if nd["AccountId"] != self.account_id or (
+                    excluded_name_prefix
+                    and alarm["AlarmName"].startswith(excluded_name_prefix)
+                ):
                     continue
 
                 alarms_by_service_quota[
                     f"{nd['ServiceCode']}#{nd['QuotaCode']}#{nd['AccountId']}"
                 ] = alarm
 
-        self._upsert_alarms(alerting_config, alarms_by_service_quota)
-        self._cleanup_alarms(alerting_config, alarms_by_service_quota)
-
-    def _cleanup_alarms(self, alerting_config: Dict, alarms_by_service_quota: Dict):
-        """
-        Remove alarms that are no longer required. Reasons could be that the service
-        is no longer used or configured to be monitored.
-        """
+        return alarms_by_service_quota
 
-        all_desired_alarm_codes = [
-            f"{service_quota.service_code}#{service_quota.quota_code}#{self.account_id}"
-            for service_quota in self._service_quotas
-            if self.__should_alarm(alerting_config, service_quota)
-        ]
-        alarms_to_delete = [
-            alarm["AlarmName"]
-            for key, alarm in alarms_by_service_quota.items()
-            if key not in all_desired_alarm_codes
-        ]
-        alarm_removal_groups = [
-            alarms_to_delete[i : i + 100] for i in range(0, len(alarms_to_delete), 100)
-        ]
-        for alarm_removal_group in alarm_removal_groups:
-            logger.info(f"Deleting alarms {alarm_removal_group}")
-            self.local_cloudwatch_client.delete_alarms(AlarmNames=alarm_removal_group)
-
-    def _upsert_alarms(self, alerting_config: Dict, alarms_by_service_quota: Dict):
+    def _build_alarm_definition(
+        self, alerting_config: Dict, service_quota: ServiceQuota
+    ) -> Dict:
         """
-        Manages alarms that need to be created or alarms that require an update based
-        on how they are configured.
+        Build the definition of the alarm on a service quota, based on how the alerting
+        is configured.
         """
 
-        for service_quota in self._service_quotas:
-            if not self.__should_alarm(alerting_config, service_quota):
-                continue
-
-            service_quota_key = f"{service_quota.service_code}#{service_quota.quota_code}#{self.account_id}"
-            threshold_perc = (
-                alerting_config.get("rules", {})
-                .get(service_quota.service_name, {})
-                .get(service_quota.quota_name, {})
-                .get("threshold_perc")
-            )
-            if not threshold_perc:
-                threshold_perc = alerting_config["default_threshold_perc"]
+        threshold_perc = (
+            alerting_config.get("rules", {})
+            .get(service_quota.service_name, {})
+            .get(service_quota.quota_name, {})
+            .get("threshold_perc")
+        )
+        if not threshold_perc:
+            threshold_perc = alerting_config["default_threshold_perc"]
 
+        if (
+            alerting_config.get("threshold_mode", THRESHOLD_MODE_ABSOLUTE)
+            == THRESHOLD_MODE_PERCENTAGE
+        ):
+            # Neither the threshold nor the description depend on the applied quota,
+            # so the alarm does not change when the quota does.
+            metric_name = LOCAL_UTILIZATION_METRIC_NAME
+            threshold = float(threshold_perc)
+            description = f"The usage of the service quota for {service_quota.quota_name} for service {service_quota.service_name} in account {self.account_id} is nearing {threshold_perc}% of its configured quota."
+        else:
+            metric_name = LOCAL_METRIC_NAME
             threshold = round((service_quota.value * threshold_perc) / 100, 1)
             description = f"The service quota for {service_quota.quota_name} for service {service_quota.service_name} in account {self.account_id} is nearing its configured quota ({service_quota.value})."
 
-            if service_quota.adjustable:
-                description += " This quota is adjustable."
-
-            desired_alarm_definition = {
-                "AlarmName": f"Service Quota: {service_quota.quota_name} for service {service_quota.service_name} in account {self.account_id}",
-                "AlarmDescription": description,
-                "MetricName": LOCAL_METRIC_NAME,
-                "Namespace": LOCAL_METRIC_NAMESPACE,
-                "Statistic": service_quota.usage_metric.get(
-                    "MetricStatisticRecommendation", "Maximum"
-                ),
-                "Dimensions": [
-                    {"Name": "ServiceCode", "Value": service_quota.service_code},
-                    {"Name": "QuotaCode", "Value": service_quota.quota_code},
-                    {"Name": "QuotaName", "Value": service_quota.quota_name},
-                    {"Name": "AccountId", "Value": self.account_id},
-                ],
-                "Period": 3600,
-                "EvaluationPeriods": 3,
-                "DatapointsToAlarm": 2,
-                "Threshold": threshold,
-                "ComparisonOperator": "GreaterThanThreshold",
-            }
+        if service_quota.adjustable:
+            description += " This quota is adjustable."
+
+        alarm_definition = {
+            "AlarmName": f"{ACCOUNT_ALARM_NAME_PREFIX.format(account_id=self.account_id)} {service_quota.quota_name} for service {service_quota.service_name}",
+            "AlarmDescription": description,
+            "MetricName": metric_name,
+            "Namespace": LOCAL_METRIC_NAMESPACE,
+            "Statistic": LOCAL_METRIC_STATISTIC,
+            "Dimensions": [
+                {"Name": "ServiceCode", "Value": service_quota.service_code},
+                {"Name": "QuotaCode", "Value": service_quota.quota_code},
+                {"Name": "QuotaName", "Value": service_quota.quota_name},
+                {"Name": "AccountId", "Value": self.account_id},
+            ],
+            "Period": 3600,
+            "EvaluationPeriods": 3,
+            "DatapointsToAlarm": 2,
+            "Threshold": threshold,
+            "ComparisonOperator": "GreaterThanThreshold",
+        }
 
-            if "notification_topic_arn" in alerting_config:
-                desired_alarm_definition["AlarmActions"] = [
-                    alerting_config["notification_topic_arn"]
-                ]
+        if alerting_config.get("notification_topic_arn"):
+            alarm_definition["AlarmActions"] = [
+                alerting_config["notification_topic_arn"]
+            ]
 
-            actual_alarm_definition = {}
-            if service_quota_key in alarms_by_service_quota:
-                actual_alarm_definition = {
-                    key: alarms_by_service_quota[service_quota_key][key]
-                    for key in desired_alarm_definition.keys()
-                }
-                if alerting_config["notification_topic_arn"]:
-                    actual_alarm_definition["AlarmActions"] = [
-                        alerting_config["notification_topic_arn"]
-                    ]
-
-            try:
-                TestCase().assertDictEqual(
-                    desired_alarm_definition, actual_alarm_definition
-                )
-                alarm_changed = False
-            except AssertionError:
-                alarm_changed = True
-
-            if service_quota_key not in alarms_by_service_quota or alarm_changed:
-                logger.info(f"Upserting alarm {desired_alarm_definition['AlarmName']}")
-                self.local_cloudwatch_client.put_metric_alarm(
-                    **desired_alarm_definition
-                )
-                time.sleep(0.35)  # PutMetricAlarm is rate limited at 3TPS.
+        return alarm_definition
 
     def __should_alarm(
         self, alerting_config: Dict, service_quota: ServiceQuota
@@ -244,6 +362,8 @@ class ServiceQuotasCollector:
         - A service quota without metrics is generally a service that is not used
         and requires no alarm.
         - A service quota that is set to be explicitly ignored requires no alarm.
+        - A service quota without an applied quota value has no utilization to alarm
+        on in percentage mode.
         """
 
         if not service_quota.metric_values:
@@ -263,6 +383,16 @@ class ServiceQuotasCollector:
             )
             return False
 
+        if (
+            alerting_config.get("threshold_mode", THRESHOLD_MODE_ABSOLUTE)
+            == THRESHOLD_MODE_PERCENTAGE
+            and not service_quota.value
+        ):
+            logger.debug(
+                f"Skipping alarm for {service_quota.service_name} / {service_quota.quota_name} due to a missing quota value."
+            )
+            return False
+
         return True
 
     def __auto_detect_service_codes_from_billing(self) -> Optional[List[str]]:
@@ -306,66 +436,191 @@ class ServiceQuotasCollector:
         list of services to monitor.
 
         2. Automated by giving access to billing. That way the tool will derive services to monitor
-        from your billing statement. Not as accurate as manual, but more dynamic.
+        from your billing statement. Not as accurate as manual, but more dynamic. With a billed
+        service cache, the billing statement is only queried again once the cache is stale.
         """
 
-        auto_detected_services = []
         if not selected_services:
-            auto_detected_services = self.__auto_detect_service_codes_from_billing()
-
-        services_paginator = self.remote_service_quota_client.get_paginator(
-            "list_services"
-        )
-        services_pages = services_paginator.paginate()
+            if self.billed_service_cache:
+                ce_service_names = self.billed_service_cache.get_service_names(
+                    self.__auto_detect_service_codes_from_billing
+                )
+            else:
+                ce_service_names = self.__auto_detect_service_codes_from_billing()
+            if not ce_service_names:
+                return []
+            return self._select_billed_services(ce_service_names)
 
         filtered_services = []
         matched_services = []
-        for service_page in services_pages:
-            for service in service_page["Services"]:
-                if auto_detected_services:
-                    for detected_service in auto_detected_services:
-                        diff_ratio = SM(
-                            None, detected_service, service["ServiceName"]
-                        ).ratio()
-                        if diff_ratio > 0.75:
-                            filtered_services.append(service)
-                            logger.info(
-                                f"Selected service {service['ServiceName']} based on cost and usage reports ({detected_service})."
-                            )
-                            auto_detected_services.remove(detected_service)
-                            break
-                else:
-                    if service["ServiceName"] in selected_services:
-                        filtered_services.append(service)
-                        matched_services.append(service["ServiceName"])
+        for service in self._list_services():
+            if service["ServiceName"] in selected_services:
+                filtered_services.append(service)
+                matched_services.append(service["ServiceName"])
 
-        if not auto_detected_services:
-            unmatched_services = [
-                sn for sn in selected_services if sn not in matched_services
-            ]
-            if unmatched_services:
-                logger.warning(
-                    f"The following services do not seem to exist: {', '.join(unmatched_services)}. Maybe you used the service code instead of the service name?"
-                )
+        unmatched_services = [
+            sn for sn in selected_services if sn not in matched_services
+        ]
+        if unmatched_services:
+            logger.warning(
+                f"The following services do not seem to exist: {', '.join(unmatched_services)}. Maybe you used the service code instead of the service name?"
+            )
 
         return filtered_services
 
-    def _find_service_quotas(self, service_code: str) -> List[ServiceQuota]:
+    def _select_billed_services(self, ce_service_names: List[str]) -> List[Dict]:
+        """
+        Select the services that Cost Explorer reports costs for, resolving the
+        Cost Explorer service names to service codes.
         """
-        Find the service quotas to manage based on the service they are part of.
+
+        services = self._list_services()
+        ce_service_names_by_code: Dict[str, str] = {}
+        resolved = ServiceCodeResolver(services).resolve(ce_service_names)
+        for ce_service_name, service_codes in resolved.items():
+            for service_code in service_codes:
+                ce_service_names_by_code.setdefault(service_code, ce_service_name)
+
+        filtered_services = [
+            service
+            for service in services
+            if service["ServiceCode"] in ce_service_names_by_code
+        ]
+        for service in filtered_services:
+            logger.info(
+                f"Selected service {service['ServiceName']} based on cost and usage reports ({ce_service_names_by_code[service['ServiceCode']]})."
+            )
+
+        return filtered_services
+
+    def _list_services(self) -> List[Dict]:
+        """
+        Retrieve all services known to Service Quotas, from the quota catalog
+        if one is available.
+        """
+
+        if self.quota_catalog:
+            return self.quota_catalog.get_services(self._list_remote_services)
+        return self._list_remote_services()
+
+    def _list_remote_services(self) -> List[Dict]:
+        """Retrieve all services known to Service Quotas from the remote account."""
+
+        services_paginator = self.remote_service_quota_client.get_paginator(
+            "list_services"
+        )
+        return [
+            service
+            for service_page in services_paginator.paginate()
+            for service in service_page["Services"]
+        ]
+
+    def _find_service_quotas(self, service_codes: List[str]) -> List[ServiceQuota]:
+        """
+        Find the service quotas to manage based on the services they are part of.
         Service quotas can be set to an AWS default or to an applied quota.
         Merge default quotas with applied quotas. Applied quotas overrule default
         quotas.
+
+        The applied and default listings of all services are retrieved concurrently
+        by a bounded pool of workers. Results are merged in the order of the services
+        passed in, so internal ids are assigned the same way as they would be when
+        the listings were retrieved one after the other.
         """
 
-        default_service_quota_paginator = (
-            self.remote_service_quota_client.get_paginator(
-                "list_aws_default_service_quotas"
+        checked_at = datetime.now(timezone.utc)
+        changed_service_codes = self._find_changed_service_codes()
+
+        with ThreadPoolExecutor(max_workers=self.discovery_workers) as executor:
+            listings = [
+                (
+                    executor.submit(
+                        self._get_applied_service_quotas,
+                        service_code,
+                        changed_service_codes,
+                    ),
+                    executor.submit(self._get_default_service_quotas, service_code),
+                )
+                for service_code in service_codes
+            ]
+
+            service_quotas = []
+            for applied_service_quotas, default_service_quotas in listings:
+                service_quotas += self._merge_service_quotas(
+                    applied_service_quotas.result(), default_service_quotas.result()
+                )
+
+        if self.applied_quota_snapshot:
+            self.applied_quota_snapshot.save(checked_at)
+
+        return service_quotas
+
+    def _find_changed_service_codes(self) -> Optional[Set[str]]:
+        """
+        Find the services that have quota increase requests which were updated since
+        the applied quota snapshot was last checked. Returns None if the applied
+        quotas of all services need to be retrieved.
+        """
+
+        if (
+            not self.applied_quota_snapshot
+            or not self.applied_quota_snapshot.checked_at
+        ):
+            return None
+
+        try:
+            requested_quotas_paginator = self.remote_service_quota_client.get_paginator(
+                "list_requested_service_quota_change_history"
             )
-        )
-        default_service_quota_pages = default_service_quota_paginator.paginate(
-            ServiceCode=service_code
-        )
+            changed_service_codes = {
+                requested_quota["ServiceCode"]
+                for requested_quotas_page in requested_quotas_paginator.paginate()
+                for requested_quota in requested_quotas_page["RequestedQuotas"]
+                if requested_quota["LastUpdated"]
+                > self.applied_quota_snapshot.checked_at
+            }
+        except ClientError as ex:
+            logger.warning(
+                f"Could not retrieve the quota change history, refreshing all applied quotas. Error: {ex.response['Error']['Code']}."
+            )
+            return None
+
+        if changed_service_codes:
+            logger.info(
+                f"Quota changes were requested for services {', '.join(sorted(changed_service_codes))}."
+            )
+        return changed_service_codes
+
+    def _get_applied_service_quotas(
+        self, service_code: str, changed_service_codes: Optional[Set[str]]
+    ) -> Dict[str, Dict]:
+        """
+        Retrieve the quotas that have been applied to the remote account for a
+        service. Use the applied quota snapshot instead if the service has not
+        changed since the snapshot was taken.
+        """
+
+        if not self.applied_quota_snapshot:
+            return self._list_applied_service_quotas(service_code)
+
+        if (
+            changed_service_codes is not None
+            and service_code not in changed_service_codes
+        ):
+            applied_service_quotas = self.applied_quota_snapshot.get(service_code)
+            if applied_service_quotas is not None:
+                return applied_service_quotas
+
+        applied_service_quotas = self._list_applied_service_quotas(service_code)
+        self.applied_quota_snapshot.put(service_code, applied_service_quotas)
+
+        return applied_service_quotas
+
+    def _list_applied_service_quotas(self, service_code: str) -> Dict[str, Dict]:
+        """
+        Retrieve the quotas that have been applied to the remote account for a
+        service, indexed by quota code.
+        """
 
         applied_service_quota_paginator = (
             self.remote_service_quota_client.get_paginator("list_service_quotas")
@@ -380,30 +635,67 @@ class ServiceQuotasCollector:
                 if "ErrorReason" in applied_service_quota:
                     continue
 
-                applied_service_quotas_by_id[
-                    applied_service_quota["QuotaCode"]
-                ] = applied_service_quota
-            time.sleep(1)
+                applied_service_quotas_by_id[applied_service_quota["QuotaCode"]] = (
+                    applied_service_quota
+                )
+
+        return applied_service_quotas_by_id
+
+    def _get_default_service_quotas(self, service_code: str) -> List[Dict]:
+        """
+        Retrieve the AWS default quotas for a service, from the quota catalog if one
+        is available.
+        """
+
+        if self.quota_catalog:
+            return self.quota_catalog.get_default_service_quotas(
+                service_code, self._list_default_service_quotas
+            )
+        return self._list_default_service_quotas(service_code)
+
+    def _list_default_service_quotas(self, service_code: str) -> List[Dict]:
+        """Retrieve the AWS default quotas for a service from the remote account."""
+
+        default_service_quota_paginator = (
+            self.remote_service_quota_client.get_paginator(
+                "list_aws_default_service_quotas"
+            )
+        )
+        default_service_quota_pages = default_service_quota_paginator.paginate(
+            ServiceCode=service_code
+        )
+
+        default_service_quotas = []
+        for default_service_quota_page in default_service_quota_pages:
+            default_service_quotas += default_service_quota_page["Quotas"]
+
+        return default_service_quotas
+
+    def _merge_service_quotas(
+        self,
+        applied_service_quotas_by_id: Dict[str, Dict],
+        default_service_quotas: List[Dict],
+    ) -> List[ServiceQuota]:
+        """
+        Merge the default quotas of a service with its applied quotas and assign
+        an internal id to every resulting service quota.
+        """
 
         service_quotas = []
-        for service_quota_page in default_service_quota_pages:
-            for service_quota in service_quota_page["Quotas"]:
-                if "ErrorReason" in service_quota:
-                    logger.warning(
-                        f"Can not manage quota {service_quota['ServiceName']} / {service_quota['QuotaName']}. Reason code: {service_quota['ErrorReason']['ErrorCode']}. Reason message: {service_quota['ErrorReason']['ErrorMessage']}"
-                    )
-                    continue
+        for service_quota in default_service_quotas:
+            if "ErrorReason" in service_quota:
+                logger.warning(
+                    f"Can not manage quota {service_quota['ServiceName']} / {service_quota['QuotaName']}. Reason code: {service_quota['ErrorReason']['ErrorCode']}. Reason message: {service_quota['ErrorReason']['ErrorMessage']}"
+                )
+                continue
 
-                if service_quota["QuotaCode"] in applied_service_quotas_by_id:
-                    service_quota = applied_service_quotas_by_id[
-                        service_quota["QuotaCode"]
-                    ]
+            if service_quota["QuotaCode"] in applied_service_quotas_by_id:
+                service_quota = applied_service_quotas_by_id[service_quota["QuotaCode"]]
 
-                service_quota = ServiceQuota(**convert_dict(service_quota))
-                service_quota.internal_id = f"sq{self.__sqid_cntr:05}"
-                self.__sqid_cntr += 1
-                service_quotas.append(service_quota)
-            time.sleep(1)
+            service_quota = ServiceQuota(**convert_dict(service_quota))
+            service_quota.internal_id = f"sq{self.__sqid_cntr:05}"
+            self.__sqid_cntr += 1
+            service_quotas.append(service_quota)
 
         return service_quotas
 
@@ -416,62 +708,401 @@ class ServiceQuotasCollector:
         to retrieve the value looked for.
 
         See https://jmespath.org/ for how to use.
+
+        Quotas with the same expression share its result, so every expression is only
+        run once per collection run. Expressions are run concurrently by a bounded pool
+        of workers, within the rate limits of the AWS Config client. A throttled query
+        backs off in its own worker without blocking the others.
+
+        If all quotas of an expression reduce its result with `length([])`,
+        `sum([].<projection>)` or `max([].<projection>)`, the result is reduced page
+        by page instead of being kept in memory.
+
+        With a result cache, quotas whose resource types have the same discovered
+        resource counts as when their result was cached reuse that result instead.
         """
 
-        for service_quota in service_quota_group:
-            c_params = service_quota.collection_query["parameters"]
-            expression_result_paginator = self.remote_config_client.get_paginator(
-                "select_resource_config"
+        resource_counts = self._get_discovered_resource_counts(service_quota_group)
+        queried_service_quotas = self._reuse_cached_config_results(
+            service_quota_group, resource_counts
+        )
+
+        service_quotas_by_expression: Dict[str, List[ServiceQuota]] = {}
+        counted_service_quotas: List[ServiceQuota] = []
+        for service_quota in queried_service_quotas:
+            if service_quota.collection_query.count_filter:
+                counted_service_quotas.append(service_quota)
+            else:
+                service_quotas_by_expression.setdefault(
+                    service_quota.collection_query.expression, []
+                ).append(service_quota)
+
+        service_quotas_by_count_expression = self._plan_count_expressions(
+            counted_service_quotas
+        )
+
+        evaluated_service_quotas: List[ServiceQuota] = []
+        with ThreadPoolExecutor(max_workers=self.config_query_workers) as executor:
+            evaluations = [
+                executor.submit(self._evaluate_config_expression, expression, sqs)
+                for expression, sqs in service_quotas_by_expression.items()
+            ] + [
+                executor.submit(self._evaluate_count_expression, expression, sqs)
+                for expression, sqs in service_quotas_by_count_expression.items()
+            ]
+            for evaluation in evaluations:
+                evaluated_service_quotas += evaluation.result()
+
+        if service_quota_group:
+            logger.info(
+                f"Ran {len(evaluations)} AWS Config queries for "
+                f"{len(service_quota_group)} service quotas, saving "
+                f"{len(service_quota_group) - len(evaluations)} queries."
             )
-            expression_result_pages = expression_result_paginator.paginate(
-                Expression=c_params["expression"]
+
+        if resource_counts is not None:
+            self._cache_config_results(evaluated_service_quotas, resource_counts)
+
+    def _get_discovered_resource_counts(
+        self, service_quota_group: List[ServiceQuota]
+    ) -> Optional[Dict[str, int]]:
+        """
+        Retrieve the discovered resource counts of the resource types selected by
+        the queries of the quotas. Returns None if there is no result cache to check
+        them against or if the counts could not be retrieved.
+        """
+
+        if not self.config_result_cache or self.config_aggregator:
+            return None
+
+        resource_types = sorted(
+            {
+                resource_type
+                for service_quota in service_quota_group
+                for resource_type in service_quota.collection_query.resource_types
+            }
+        )
+        resource_counts = dict.fromkeys(resource_types, 0)
+
+        try:
+            for i in range(
+                0, len(resource_types), MAX_RESOURCE_TYPES_PER_COUNT_REQUEST
+            ):
+                resource_counts.update(
+                    self._list_discovered_resource_counts(
+                        resource_types[i : i + MAX_RESOURCE_TYPES_PER_COUNT_REQUEST]
+                    )
+                )
+        except ClientError as ex:
+            logger.warning(
+                f"Could not retrieve the discovered resource counts, running all AWS Config queries. Error: {ex.response['Error']['Code']}."
             )
+            return None
+
+        return resource_counts
 
-            expression_result = []
-            for expression_result_page in expression_result_pages:
-                expression_result += [
-                    json.loads(row) for row in expression_result_page.get("Results", [])
+    def _list_discovered_resource_counts(
+        self, resource_types: List[str]
+    ) -> Dict[str, int]:
+        """
+        Retrieve the discovered resource counts of up to 20 resource types. Resource
+        types without resources are left out.
+        """
+
+        resource_counts = {}
+        request: Dict[str, Any] = {"resourceTypes": resource_types}
+        while True:
+            discovered_resource_counts = (
+                self.remote_config_client.get_discovered_resource_counts(**request)
+            )
+            for resource_count in discovered_resource_counts["resourceCounts"]:
+                resource_counts[resource_count["resourceType"]] = resource_count[
+                    "count"
                 ]
 
-            if len(expression_result) == 0:
-                logger.info(
-                    f"The AWS config query ({c_params['expression']}) yielded no results "
-                    f"({service_quota.service_code} / {service_quota.quota_code})"
-                )
-                continue
+            if not discovered_resource_counts.get("nextToken"):
+                return resource_counts
+            request["nextToken"] = discovered_resource_counts["nextToken"]
+
+    def _reuse_cached_config_results(
+        self,
+        service_quota_group: List[ServiceQuota],
+        resource_counts: Optional[Dict[str, int]],
+    ) -> List[ServiceQuota]:
+        """
+        Set the cached usage of quotas whose resource counts have not changed since
+        it was cached. Returns the quotas that still need to be queried.
+        """
+
+        if resource_counts is None:
+            return service_quota_group
 
-            try:
-                collected_values = jmespath.search(
-                    c_params["jmespath"], expression_result
+        queried_service_quotas = []
+        for service_quota in service_quota_group:
+            cached_result = None
+            if service_quota.collection_query.resource_types:
+                cached_result = self.config_result_cache.get(
+                    service_quota.service_code,
+                    service_quota.quota_code,
+                    self._get_resource_counts(service_quota, resource_counts),
                 )
-                service_quota.metric_values = [round(float(collected_values), 1)]
-                logger.debug(
-                    f"Collected metric values from AWS Config for quota "
-                    f"{service_quota.service_name} / {service_quota.quota_name}: {collected_values}"
+
+            if cached_result is None:
+                queried_service_quotas.append(service_quota)
+            else:
+                service_quota.metric_values = cached_result["metric_values"]
+
+        if len(queried_service_quotas) < len(service_quota_group):
+            logger.info(
+                f"Reused the cached AWS Config results of "
+                f"{len(service_quota_group) - len(queried_service_quotas)} service "
+                f"quotas with unchanged resource counts."
+            )
+        return queried_service_quotas
+
+    def _cache_config_results(
+        self, service_quotas: List[ServiceQuota], resource_counts: Dict[str, int]
+    ) -> None:
+        """Cache the usage of the quotas that were queried and evaluated successfully."""
+
+        for service_quota in service_quotas:
+            if service_quota.collection_query.resource_types:
+                self.config_result_cache.put(
+                    service_quota.service_code,
+                    service_quota.quota_code,
+                    self._get_resource_counts(service_quota, resource_counts),
+                    service_quota.metric_values,
                 )
-            except ParseError as p_ex:
-                logger.warning(
-                    f"A JMESPath parse error occurred ({service_quota.service_code} / "
-                    f"{service_quota.quota_code}): {p_ex.msg}."
+
+        self.config_result_cache.save()
+
+    def _get_resource_counts(
+        self, service_quota: ServiceQuota, resource_counts: Dict[str, int]
+    ) -> Dict[str, int]:
+        return {
+            resource_type: resource_counts[resource_type]
+            for resource_type in service_quota.collection_query.resource_types
+        }
+
+    def _plan_count_expressions(
+        self, service_quotas: List[ServiceQuota]
+    ) -> Dict[str, List[ServiceQuota]]:
+        """
+        Plan the queries that let AWS Config count resources for quotas that would
+        otherwise page through every resource id. Counts of quotas that select all
+        resources of a type are combined in a single query grouped by resource type.
+        """
+
+        service_quotas_by_count_expression: Dict[str, List[ServiceQuota]] = {}
+        service_quotas_by_resource_type: Dict[str, List[ServiceQuota]] = {}
+
+        for service_quota in service_quotas:
+            collection_query = service_quota.collection_query
+            if collection_query.count_resource_type:
+                service_quotas_by_resource_type.setdefault(
+                    collection_query.count_resource_type, []
+                ).append(service_quota)
+            else:
+                service_quotas_by_count_expression.setdefault(
+                    COUNT_EXPRESSION.format(count_filter=collection_query.count_filter),
+                    [],
+                ).append(service_quota)
+
+        if service_quotas_by_resource_type:
+            resource_types = ", ".join(
+                f"'{resource_type}'"
+                for resource_type in sorted(service_quotas_by_resource_type)
+            )
+            service_quotas_by_count_expression[
+                COUNT_EXPRESSION.format(
+                    count_filter=f"resourceType IN ({resource_types})"
                 )
-            except ValueError:
-                logger.warning(
-                    f"The value retrieved from the JMESPath expression could not be converted "
-                    f"to float ({service_quota.service_code} / {service_quota.quota_code})."
+            ] = [
+                service_quota
+                for service_quotas in service_quotas_by_resource_type.values()
+                for service_quota in service_quotas
+            ]
+
+        return service_quotas_by_count_expression
+
+    def _evaluate_count_expression(
+        self, expression: str, service_quotas: List[ServiceQuota]
+    ) -> List[ServiceQuota]:
+        """
+        Run an AWS Config query that counts resources by resource type and map the
+        counts back to the quotas that use them. Returns the quotas whose usage was
+        evaluated, which are none if the query failed.
+        """
+
+        expression_result = self._select_resource_config(expression)
+        if expression_result is None:
+            return []
+
+        counts_by_resource_type: Dict[str, int] = {}
+        for row in expression_result:
+            counts_by_resource_type[row["resourceType"]] = (
+                counts_by_resource_type.get(row["resourceType"], 0) + row["COUNT(*)"]
+            )
+
+        evaluated_service_quotas = []
+        for service_quota in service_quotas:
+            resource_type = service_quota.collection_query.count_resource_type
+            count = (
+                counts_by_resource_type.get(resource_type, 0)
+                if resource_type
+                else sum(counts_by_resource_type.values())
+            )
+            if self._set_config_metric_values(
+                service_quota, count, partial(int, count)
+            ):
+                evaluated_service_quotas.append(service_quota)
+
+        return evaluated_service_quotas
+
+    def _evaluate_config_expression(
+        self, expression: str, service_quotas: List[ServiceQuota]
+    ) -> List[ServiceQuota]:
+        """
+        Run an AWS Config query once and apply the JMESPath expression of every quota
+        that uses it, streaming the rows through the reductions when possible.
+        Returns the quotas whose usage was evaluated, which are none if the query
+        failed.
+        """
+
+        reductions = [
+            StreamingReduction.from_jmespath(sq.collection_query.compiled_jmespath)
+            for sq in service_quotas
+        ]
+
+        if self.config_aggregator or not all(reductions):
+            expression_result = self._select_resource_config(expression)
+            if expression_result is None:
+                return []
+
+            return [
+                service_quota
+                for service_quota in service_quotas
+                if self._set_config_metric_values(
+                    service_quota,
+                    len(expression_result),
+                    partial(
+                        service_quota.collection_query.compiled_jmespath.search,
+                        expression_result,
+                    ),
                 )
+            ]
+
+        row_count = 0
+        try:
+            for row in self._stream_resource_config(expression):
+                row_count += 1
+                for reduction in reductions:
+                    reduction.add(row)
+        except ClientError as ex:
+            logger.warning(
+                f"The AWS config query ({expression}) failed. "
+                f"Error: {ex.response['Error']['Code']}."
+            )
+            return []
+
+        return [
+            service_quota
+            for service_quota, reduction in zip(service_quotas, reductions, strict=True)
+            if self._set_config_metric_values(
+                service_quota, row_count, reduction.result
+            )
+        ]
+
+    def _set_config_metric_values(
+        self,
+        service_quota: ServiceQuota,
+        row_count: int,
+        evaluate: Callable[[], Any],
+    ) -> bool:
+        """
+        Store the usage a JMESPath expression reduces a query result to. Returns
+        whether the usage was evaluated, either to a value or to none for a query
+        without results.
+        """
+
+        if row_count == 0:
+            logger.info(
+                f"The AWS config query ({service_quota.collection_query.expression}) yielded no results "
+                f"({service_quota.service_code} / {service_quota.quota_code})"
+            )
+            return True
+
+        try:
+            collected_values = evaluate()
+            service_quota.metric_values = [round(float(collected_values), 1)]
+            logger.debug(
+                f"Collected metric values from AWS Config for quota "
+                f"{service_quota.service_name} / {service_quota.quota_name}: {collected_values}"
+            )
+            return True
+        except JMESPathError as j_ex:
+            logger.warning(
+                f"A JMESPath error occurred ({service_quota.service_code} / "
+                f"{service_quota.quota_code}): {j_ex}."
+            )
+        except (TypeError, ValueError):
+            logger.warning(
+                f"The value retrieved from the JMESPath expression could not be converted "
+                f"to float ({service_quota.service_code} / {service_quota.quota_code})."
+            )
+
+        return False
+
+    def _select_resource_config(self, expression: str) -> Optional[List[Dict]]:
+        """
+        Run an AWS Config query and return all resulting rows, or None if the query
+        failed. With an organization aggregator, the rows of this account are taken
+        from a query shared by all accounts, unless that query failed.
+        """
+
+        if self.config_aggregator:
+            rows = self.config_aggregator.get_rows(expression, self.account_id)
+            if rows is not None:
+                return rows
+
+        try:
+            return list(self._stream_resource_config(expression))
+        except ClientError as ex:
+            logger.warning(
+                f"The AWS config query ({expression}) failed. "
+                f"Error: {ex.response['Error']['Code']}."
+            )
+            return None
+
+    def _stream_resource_config(self, expression: str) -> Iterator[Dict]:
+        """Run an AWS Config query and yield its rows one page at a time."""
+
+        expression_result_paginator = self.remote_config_client.get_paginator(
+            "select_resource_config"
+        )
+        expression_result_pages = expression_result_paginator.paginate(
+            Expression=expression
+        )
+
+        for expression_result_page in expression_result_pages:
+            for row in expression_result_page.get("Results", []):
+                yield json.loads(row)
 
     def _collect_cloudwatch_remote_metrics(
         self, service_quota_group: List[ServiceQuota]
     ) -> None:
         """
         Collect the usage for various service quotas from the targeted account by using CloudWatch Metrics.
-        Combine the metrics to collect in groups of 500 metrics to make the process more time- and
-        cost efficient.
+        The metric data reader combines the metrics to collect in as few requests as possible to make
+        the process more time- and cost efficient.
         """
 
+        if not service_quota_group:
+            return
+
         current_time = datetime.now()
-        metric_data = self.remote_cloudwatch_client.get_metric_data(
-            MetricDataQueries=[
+        metric_data_by_id = self._metric_data_reader.read(
+            [
                 {
                     "Id": service_quota.internal_id,
                     "MetricStat": {
@@ -498,24 +1129,18 @@ class ServiceQuotasCollector:
                 }
                 for service_quota in service_quota_group
             ],
-            StartTime=(
+            start_time=(
                 current_time
                 - timedelta(minutes=60)
                 - (current_time - datetime.min) % timedelta(minutes=60)
             ),
-            EndTime=(
+            end_time=(
                 current_time - (current_time - datetime.min) % timedelta(minutes=60)
             ),
-            ScanBy="TimestampDescending",
         )
 
-        metric_data_by_id = {
-            metric_data_result["Id"]: metric_data_result["Values"]
-            for metric_data_result in metric_data["MetricDataResults"]
-        }
-
         for service_quota in service_quota_group:
-            values = metric_data_by_id[service_quota.internal_id]
+            values = metric_data_by_id.get(service_quota.internal_id, [])
             logger.debug(
                 f"Collected metric values from CloudWatch for quota {service_quota.service_name} / {service_quota.quota_name}: {values}"
             )
@@ -543,31 +1168,51 @@ class ServiceQuotasCollector:
     def _put_local_metrics(self, service_quota_group: List[ServiceQuota]) -> None:
         """
         Store the values collected for various service quotas as custom metrics in
-        CloudWatch. Combine the metrics of various service quotas in a single call
-        to make this process more time and cost efficient.
+        CloudWatch. All values collected for a quota are stored, combined in as few
+        calls as the PutMetricData limits allow to make this process more time and
+        cost efficient. With the EMF metric output, the metrics are written to the
+        function logs instead of being sent to CloudWatch.
+
+        When utilization is published, the values are also stored as a percentage of
+        the applied quota for quotas that have one.
         """
-        current_time = datetime.now()
-        self.local_cloudwatch_client.put_metric_data(
-            Namespace=LOCAL_METRIC_NAMESPACE,
-            MetricData=[
-                {
-                    "MetricName": LOCAL_METRIC_NAME,
-                    "Dimensions": [
-                        {"Name": "AccountId", "Value": self.account_id},
-                        {"Name": "ServiceCode", "Value": service_quota.service_code},
-                        {"Name": "QuotaName", "Value": service_quota.quota_name},
-                        {"Name": "QuotaCode", "Value": service_quota.quota_code},
-                    ],
-                    "Timestamp": current_time,
-                    "Value": service_quota.metric_values[0],
-                }
-                for service_quota in service_quota_group
-                if service_quota.metric_values
-            ],
-        )
+        service_quotas_with_values = [
+            service_quota
+            for service_quota in service_quota_group
+            if service_quota.metric_values
+        ]
 
-        for service_quota in service_quota_group:
-            if service_quota.metric_values:
-                logger.info(
-                    f"Stored metric values for quota {service_quota.service_name} / {service_quota.quota_name}: {service_quota.metric_values[0]}"
+        metrics = []
+        values_by_metric = []
+        for service_quota in service_quotas_with_values:
+            dimensions = [
+                {"Name": "AccountId", "Value": self.account_id},
+                {"Name": "ServiceCode", "Value": service_quota.service_code},
+                {"Name": "QuotaName", "Value": service_quota.quota_name},
+                {"Name": "QuotaCode", "Value": service_quota.quota_code},
+            ]
+            metrics.append({"MetricName": LOCAL_METRIC_NAME, "Dimensions": dimensions})
+            values_by_metric.append(service_quota.metric_values)
+
+            if self.publish_utilization and service_quota.value:
+                metrics.append(
+                    {
+                        "MetricName": LOCAL_UTILIZATION_METRIC_NAME,
+                        "Dimensions": dimensions,
+                    }
+                )
+                values_by_metric.append(
+                    [
+                        round(value * 100 / service_quota.value, 1)
+                        for value in service_quota.metric_values
+                    ]
                 )
+
+        self._metric_data_publisher.publish(
+            LOCAL_METRIC_NAMESPACE, metrics, values_by_metric, datetime.now()
+        )
+
+        for service_quota in service_quotas_with_values:
+            logger.info(
+                f"Stored metric values for quota {service_quota.service_name} / {service_quota.quota_name}: {service_quota.metric_values}"
+            )
@@ -1,30 +1,154 @@
+import functools
 import json
-from typing import Dict, Optional
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, Final, List, Optional, Tuple
 
-import boto3
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from botocore.exceptions import ClientError
 
+from service_quotas_manager.client_factory import (
+    DEFAULT_MAX_POOL_CONNECTIONS,
+    ClientFactory,
+)
 from service_quotas_manager.entities import ServiceQuota, ServiceQuotaIncreaseRule
-from service_quotas_manager.service_quotas_collector import ServiceQuotasCollector
-from service_quotas_manager.service_quotas_increaser import ServiceQuotasIncreaser
+from service_quotas_manager.rate_limiter import RateLimiter
 from service_quotas_manager.util import convert_dict, get_logger
 
+# The modules specific to an action are imported when the action is first run, so
+# an invocation only loads the code it needs.
+if TYPE_CHECKING:
+    from service_quotas_manager.config_aggregator import ConfigAggregator
+    from service_quotas_manager.quota_catalog import QuotaCatalog
+    from service_quotas_manager.state_store import StateStore
+
+QUOTA_CATALOG_KEY: Final[str] = "quota_catalog/{region_name}.json.gz"
+"""The key of the quota catalog in the configuration bucket"""
+
+APPLIED_QUOTA_SNAPSHOT_KEY: Final[str] = (
+    "applied_quotas/{region_name}/{account_id}.json.gz"
+)
+"""The key of the applied quota snapshot of an account in the configuration bucket"""
+
+CONFIG_RESULT_CACHE_KEY: Final[str] = (
+    "config_results/{region_name}/{account_id}.json.gz"
+)
+"""The key of the AWS Config result cache of an account in the configuration bucket"""
+
+ALARM_DIGEST_KEY: Final[str] = "alarm_digests/{region_name}/{account_id}.json.gz"
+"""The key of the digest of the alarms of an account in the configuration bucket"""
+
+ALARM_MIGRATION_KEY: Final[str] = "alarm_migrations/{region_name}/{account_id}.json.gz"
+"""The key of the alarm migration marker of an account in the configuration bucket"""
+
+BILLED_SERVICES_KEY: Final[str] = "billed_services/{account_id}.json.gz"
+"""The key of the services billed to an account in the configuration bucket"""
+
+DEFAULT_BATCH_WORKERS: Final[int] = 4
+"""The number of accounts to collect service quotas for concurrently in a batch"""
+
+BATCH_TIME_MARGIN_MS: Final[int] = 90_000
+"""
+Milliseconds of invocation time left below which a batch stops starting accounts,
+so the accounts in progress can finish and the result is reported before the timeout.
+"""
+
+CREDENTIALS_EXPIRY_MARGIN: Final[int] = 300
+"""
+Seconds before expiry at which cached credentials are refreshed. Matches the Lambda
+timeout, so credentials never expire during an invocation.
+"""
+
+_configurations: Dict[str, Tuple[str, Dict]] = {}
+"""ETags and account indexed configurations kept in memory across warm invocations"""
+
+_credentials: Dict[str, Tuple[float, Dict]] = {}
+"""Expiry timestamps and credentials of assumed roles, indexed by role ARN"""
+
+_credentials_lock = threading.Lock()
+
+credential_cache_stats: Counter = Counter(hits=0, misses=0, refreshes=0)
+"""Hits, misses and refreshes of the credential cache since the Lambda started"""
+
 logger = get_logger()
 
 
-def _load_config_from_s3(s3_client, bucket: str, key: str, account_id: str) -> Dict:
-    """Read account specific configuration from S3 object."""
-    s3_obj = s3_client.get_object(Bucket=bucket, Key=key)
-    config = json.loads(s3_obj["Body"].read().decode("utf-8"))
+@functools.cache
+def _get_client_factory() -> ClientFactory:
+    """
+    Return the client factory shared by all invocations. It is built on first use,
+    so importing the handler does not set up the botocore loader.
+    """
+
+    return ClientFactory(
+        RateLimiter(),
+        int(os.environ.get("MAX_POOL_CONNECTIONS", DEFAULT_MAX_POOL_CONNECTIONS)),
+    )
+
 
+def _load_configuration_by_account(s3_client, bucket: str, key: str) -> Dict:
+    """
+    Read the configuration of all accounts from S3 object, indexed by account id.
+    The configuration is kept in memory and only read again if its ETag changed.
+    """
+    etag, configuration_by_account = _configurations.get(f"{bucket}/{key}", (None, {}))
+
+    try:
+        if etag:
+            s3_obj = s3_client.get_object(Bucket=bucket, Key=key, IfNoneMatch=etag)
+        else:
+            s3_obj = s3_client.get_object(Bucket=bucket, Key=key)
+    except ClientError as ex:
+        if etag and ex.response["Error"]["Code"] in ("304", "NotModified"):
+            logger.debug("Configuration not modified, using cached configuration.")
+            return configuration_by_account
+        raise
+
+    config = json.loads(s3_obj["Body"].read().decode("utf-8"))
     configuration_by_account = {conf["account_id"]: conf for conf in config}
+    if s3_obj.get("ETag"):
+        _configurations[f"{bucket}/{key}"] = (s3_obj["ETag"], configuration_by_account)
+
+    return configuration_by_account
+
+
+def _load_config_from_s3(s3_client, bucket: str, key: str, account_id: str) -> Dict:
+    """Read account specific configuration from S3 object."""
+    configuration_by_account = _load_configuration_by_account(s3_client, bucket, key)
 
     return configuration_by_account.get(account_id, {})
 
 
 def _assume_role(role_arn: str) -> Dict:
-    """Assume a role in a different account and return temporary credentials."""
+    """
+    Return temporary credentials for a role in a different account. Credentials are
+    kept in memory across warm invocations and refreshed ahead of their expiry.
+    """
+
+    expires_at, credentials = _credentials.get(role_arn, (0.0, {}))
+    if time.time() < expires_at - CREDENTIALS_EXPIRY_MARGIN:
+        outcome = "hits"
+    else:
+        outcome = "refreshes" if credentials else "misses"
+        credentials = _request_role_credentials(role_arn)
+
+    with _credentials_lock:
+        credential_cache_stats[outcome] += 1
+        logger.info(
+            f"Credential cache hits: {credential_cache_stats['hits']}, "
+            f"misses: {credential_cache_stats['misses']}, "
+            f"refreshes: {credential_cache_stats['refreshes']}."
+        )
+
+    return dict(credentials)
+
+
+def _request_role_credentials(role_arn: str) -> Dict:
+    """Assume a role in a different account and cache the temporary credentials."""
     sts_client = _get_local_client("sts")
 
     try:
@@ -39,11 +163,24 @@ def _assume_role(role_arn: str) -> Dict:
         )
         return {}
 
-    return {
+    credentials = {
         "aws_access_key_id": assumed_role["Credentials"]["AccessKeyId"],
         "aws_secret_access_key": assumed_role["Credentials"]["SecretAccessKey"],
         "aws_session_token": assumed_role["Credentials"]["SessionToken"],
     }
+    _credentials[role_arn] = (
+        assumed_role["Credentials"]["Expiration"].timestamp(),
+        credentials,
+    )
+    return credentials
+
+
+def _assume_account_role(account_id: str, config: Dict) -> Dict:
+    """Assume the configured role in a target account."""
+    role_name = config.get("role_name", "ServiceQuotasManagerRole")
+    role_path = config.get("role_path", "/")
+
+    return _assume_role(f"arn:aws:iam::{account_id}:role{role_path}{role_name}")
 
 
 def _get_account_id_from_alarm(alarm_details: Dict) -> Optional[str]:
@@ -68,8 +205,9 @@ def _get_increase_rule_from_config(
         .get(service_quota.quota_name)
     )
     if increase_rule_def:
-        increase_rule_def["service_quota"] = service_quota
-        return ServiceQuotaIncreaseRule(**increase_rule_def)
+        return ServiceQuotaIncreaseRule(
+            **increase_rule_def, service_quota=service_quota
+        )
     else:
         return None
 
@@ -105,34 +243,332 @@ def _get_service_quota_from_alarm(
 def _get_remote_client(
     client_name: str, credentials: Dict, region: Optional[str] = None
 ):
-    """Create a boto3 client based on credentials from an assumed role."""
+    """Get a boto3 client based on credentials from an assumed role."""
 
-    if region:
-        credentials["region_name"] = region
-    return boto3.client(client_name, **credentials)
+    return _get_client_factory().get_client(client_name, credentials, region)
 
 
 def _get_local_client(client_name: str):
-    """Create a boto3 client based on Lambda invocation credentials."""
+    """Get a boto3 client based on Lambda invocation credentials."""
+
+    return _get_client_factory().get_client(client_name)
+
+
+def _load_quota_catalog(
+    s3_client, bucket: str, region_name: str
+) -> Tuple["StateStore", "QuotaCatalog"]:
+    """Load the quota catalog of a region and the state store it is kept in."""
+    from service_quotas_manager.quota_catalog import QuotaCatalog
+    from service_quotas_manager.state_store import StateStore
+
+    state_store = StateStore(s3_client, bucket)
+    quota_catalog = QuotaCatalog(
+        state_store, QUOTA_CATALOG_KEY.format(region_name=region_name)
+    )
+    quota_catalog.load()
+
+    return state_store, quota_catalog
+
+
+def _get_config_aggregator(
+    event: Dict, region_name: str, account_ids: List[str]
+) -> Optional["ConfigAggregator"]:
+    """
+    Return the organization Config aggregator to collect usage of the accounts
+    through, if the event asks for it. The aggregator is queried from the account
+    it resides in.
+    """
+    aggregator_config = event.get("config_aggregator")
+    if not aggregator_config:
+        return None
+
+    from service_quotas_manager.config_aggregator import ConfigAggregator
+
+    if aggregator_config.get("account_id"):
+        aggregator_creds = _assume_account_role(
+            aggregator_config["account_id"], aggregator_config
+        )
+        if not aggregator_creds:
+            logger.warning(
+                "Could not access the Config aggregator, collecting usage through "
+                "every account instead."
+            )
+            return None
+        config_client = _get_remote_client("config", aggregator_creds)
+    else:
+        config_client = _get_local_client("config")
+
+    return ConfigAggregator(
+        config_client, aggregator_config["name"], region_name, account_ids
+    )
+
+
+def _collect_service_quotas(
+    account_id: str,
+    config: Dict,
+    remote_creds: Dict,
+    local_cloudwatch_client,
+    state_store: "StateStore",
+    quota_catalog: "QuotaCatalog",
+    config_aggregator: Optional["ConfigAggregator"] = None,
+    refresh_billed_services: bool = False,
+) -> None:
+    """
+    Collect the service quotas and their usage for an account and manage the
+    alarms on them.
+    """
+    from service_quotas_manager.alarm_digest import AlarmDigest
+    from service_quotas_manager.alarm_migration import AlarmMigration
+    from service_quotas_manager.applied_quota_snapshot import AppliedQuotaSnapshot
+    from service_quotas_manager.billed_service_cache import (
+        DEFAULT_REFRESH_INTERVAL,
+        BilledServiceCache,
+    )
+    from service_quotas_manager.config_result_cache import ConfigResultCache
+    from service_quotas_manager.metric_data_publisher import METRIC_OUTPUT_API
+    from service_quotas_manager.service_quotas_collector import (
+        DEFAULT_CONFIG_QUERY_WORKERS,
+        DEFAULT_DISCOVERY_WORKERS,
+        THRESHOLD_MODE_PERCENTAGE,
+        ServiceQuotasCollector,
+    )
+
+    collection_config = config.get("collection_config") or {}
+    alerting_config = config.get("alerting_config") or {}
+
+    applied_quota_snapshot = None
+    if collection_config.get("incremental_refresh"):
+        applied_quota_snapshot = AppliedQuotaSnapshot(
+            state_store,
+            APPLIED_QUOTA_SNAPSHOT_KEY.format(
+                region_name=local_cloudwatch_client.meta.region_name,
+                account_id=account_id,
+            ),
+        )
+        applied_quota_snapshot.load()
+
+    config_result_cache = None
+    if collection_config.get("config_change_detection") and not config_aggregator:
+        config_result_cache = ConfigResultCache(
+            state_store,
+            CONFIG_RESULT_CACHE_KEY.format(
+                region_name=local_cloudwatch_client.meta.region_name,
+                account_id=account_id,
+            ),
+        )
+        config_result_cache.load()
+
+    alarm_digest = None
+    if alerting_config.get("full_reconcile_interval_hours"):
+        alarm_digest = AlarmDigest(
+            state_store,
+            ALARM_DIGEST_KEY.format(
+                region_name=local_cloudwatch_client.meta.region_name,
+                account_id=account_id,
+            ),
+            timedelta(hours=alerting_config["full_reconcile_interval_hours"]),
+        )
+        alarm_digest.load()
+
+    billed_service_cache = None
+    billing_refresh_interval_hours = collection_config.get(
+        "billing_refresh_interval_hours", DEFAULT_REFRESH_INTERVAL / timedelta(hours=1)
+    )
+    if not config.get("selected_services") and billing_refresh_interval_hours:
+        billed_service_cache = BilledServiceCache(
+            state_store,
+            BILLED_SERVICES_KEY.format(account_id=account_id),
+            timedelta(hours=billing_refresh_interval_hours),
+            force_refresh=refresh_billed_services,
+        )
+
+    sqc = ServiceQuotasCollector(
+        _get_remote_client("service-quotas", remote_creds),
+        _get_remote_client("cloudwatch", remote_creds),
+        _get_remote_client("config", remote_creds),
+        _get_remote_client("ce", remote_creds, "us-east-1"),
+        local_cloudwatch_client,
+        account_id,
+        discovery_workers=collection_config.get(
+            "discovery_workers", DEFAULT_DISCOVERY_WORKERS
+        ),
+        config_query_workers=collection_config.get(
+            "config_query_workers", DEFAULT_CONFIG_QUERY_WORKERS
+        ),
+        quota_catalog=quota_catalog,
+        applied_quota_snapshot=applied_quota_snapshot,
+        config_aggregator=config_aggregator,
+        config_result_cache=config_result_cache,
+        metric_output=collection_config.get("metric_output", METRIC_OUTPUT_API),
+        publish_utilization=(
+            alerting_config.get("threshold_mode") == THRESHOLD_MODE_PERCENTAGE
+        ),
+        alarm_digest=alarm_digest,
+        billed_service_cache=billed_service_cache,
+        alarm_migration=AlarmMigration(
+            state_store,
+            ALARM_MIGRATION_KEY.format(
+                region_name=local_cloudwatch_client.meta.region_name,
+                account_id=account_id,
+            ),
+        ),
+    )
+    sqc.collect(list(set(config.get("selected_services", []))))
+    sqc.manage_alarms(alerting_config, dry_run=alerting_config.get("dry_run", False))
+
+
+def _collect_service_quotas_batch(
+    event: Dict, context: LambdaContext
+) -> Dict[str, List[str]]:
+    """
+    Collect the service quotas for multiple accounts in a single invocation. The
+    configuration, the local CloudWatch client with its rate limits and the quota
+    catalog are shared by all accounts. A failure for one account does not affect
+    the others.
+
+    Accounts are no longer started once the invocation is about to time out. They
+    are reported as unprocessed, to be collected by the next run.
+    """
+
+    s3_client = _get_local_client("s3")
+    configuration_by_account = _load_configuration_by_account(
+        s3_client, event["config_bucket"], event["config_key"]
+    )
+    account_ids = event.get("account_ids") or list(configuration_by_account)
+
+    local_cloudwatch_client = _get_local_client("cloudwatch")
+    state_store, quota_catalog = _load_quota_catalog(
+        s3_client, event["config_bucket"], local_cloudwatch_client.meta.region_name
+    )
+    config_aggregator = _get_config_aggregator(
+        event, local_cloudwatch_client.meta.region_name, account_ids
+    )
+
+    def collect_account(account_id: str) -> Optional[bool]:
+        if context.get_remaining_time_in_millis() < BATCH_TIME_MARGIN_MS:
+            return None
+
+        logger.thread_safe_append_keys(account_id=account_id)
+        try:
+            config = configuration_by_account.get(account_id)
+            if not config:
+                logger.error("No configuration found for account. Skipping...")
+                return False
+
+            remote_creds = _assume_account_role(account_id, config)
+            if not remote_creds:
+                return False
+
+            _collect_service_quotas(
+                account_id,
+                config,
+                remote_creds,
+                local_cloudwatch_client,
+                state_store,
+                quota_catalog,
+                config_aggregator,
+                event.get("refresh_billed_services", False),
+            )
+            return True
+        except Exception:
+            logger.exception("Could not collect service quotas. Skipping...")
+            return False
+        finally:
+            logger.thread_safe_remove_keys(["account_id"])
+
+    with ThreadPoolExecutor(
+        max_workers=event.get("batch_workers", DEFAULT_BATCH_WORKERS)
+    ) as executor:
+        collected_by_account = dict(
+            zip(account_ids, executor.map(collect_account, account_ids), strict=True)
+        )
+
+    quota_catalog.save()
+
+    result = {
+        "succeeded": [a for a, collected in collected_by_account.items() if collected],
+        "failed": [
+            a for a, collected in collected_by_account.items() if collected is False
+        ],
+        "unprocessed": [
+            a for a, collected in collected_by_account.items() if collected is None
+        ],
+    }
+    logger.info(
+        f"Collected service quotas for {len(result['succeeded'])} of {len(account_ids)} accounts."
+    )
+    if result["unprocessed"]:
+        logger.warning(
+            f"The invocation is about to time out, {len(result['unprocessed'])} "
+            f"accounts were not processed: {', '.join(result['unprocessed'])}."
+        )
+    return result
+
 
-    return boto3.client(client_name)
+def _collect_account_service_quotas(
+    account_id: str, config: Dict, remote_creds: Dict, s3_client, event: Dict
+) -> None:
+    """Collect the service quotas for a single account."""
+
+    local_cloudwatch_client = _get_local_client("cloudwatch")
+    state_store, quota_catalog = _load_quota_catalog(
+        s3_client, event["config_bucket"], local_cloudwatch_client.meta.region_name
+    )
+
+    _collect_service_quotas(
+        account_id,
+        config,
+        remote_creds,
+        local_cloudwatch_client,
+        state_store,
+        quota_catalog,
+        _get_config_aggregator(
+            event, local_cloudwatch_client.meta.region_name, [account_id]
+        ),
+        event.get("refresh_billed_services", False),
+    )
+    quota_catalog.save()
+
+
+def _increase_service_quota(config: Dict, remote_creds: Dict, alarm: Dict) -> None:
+    """Request a service quota increase for the quota an alarm was triggered for."""
+    from service_quotas_manager.service_quotas_increaser import (
+        ServiceQuotasIncreaser,
+    )
+
+    remote_service_quota_client = _get_remote_client("service-quotas", remote_creds)
+
+    service_quota: ServiceQuota = _get_service_quota_from_alarm(
+        alarm, remote_service_quota_client
+    )
+
+    sqi = ServiceQuotasIncreaser(
+        _get_remote_client("support", remote_creds), remote_service_quota_client
+    )
+    sqi.request_service_quota_increase(
+        _get_increase_rule_from_config(config, service_quota)
+    )
 
 
 @logger.inject_lambda_context
-def handler(event: Dict, _context: LambdaContext):
+def handler(event: Dict, context: LambdaContext):
     """
     Lambda Entrypoint
 
     This lambda can be triggered in two ways:
 
     1. Schedule based. The action is to collect metrics from remote accounts, store
-    them in local CloudWatch Metrics and to manage alarms on these metrics.
+    them in local CloudWatch Metrics and to manage alarms on these metrics. This
+    is done for a single account, or for a batch of accounts at once.
 
     2. By an alarm if one of the alarms from method 1 exceeds set thresholds.
     The action in that case is to see if there's a rule to apply for a service
     quote increase request.
     """
 
+    if event.get("action") == "CollectServiceQuotasBatch":
+        return _collect_service_quotas_batch(event, context)
+
     account_id = event.get("account_id", _get_account_id_from_alarm(event.get("alarm")))
     if not account_id:
         logger.error("No account ID could be found in event. Exiting...")
@@ -144,46 +580,24 @@ def handler(event: Dict, _context: LambdaContext):
         logger.error("No action specified in event. Exiting...")
         return
 
+    s3_client = _get_local_client("s3")
     config = _load_config_from_s3(
-        _get_local_client("s3"), event["config_bucket"], event["config_key"], account_id
+        s3_client, event["config_bucket"], event["config_key"], account_id
     )
     if not config:
         logger.error("No configuration found for account. Exiting...")
         return
 
-    role_name = config.get("role_name", "ServiceQuotasManagerRole")
-    role_path = config.get("role_path", "/")
-    assume_role_arn = f"arn:aws:iam::{account_id}:role{role_path}{role_name}"
-    remote_creds = _assume_role(assume_role_arn)
-
+    remote_creds = _assume_account_role(account_id, config)
     if not remote_creds:
         return
 
     if event["action"] == "CollectServiceQuotas":
-        sqc = ServiceQuotasCollector(
-            _get_remote_client("service-quotas", remote_creds),
-            _get_remote_client("cloudwatch", remote_creds),
-            _get_remote_client("config", remote_creds),
-            _get_remote_client("ce", remote_creds, "us-east-1"),
-            _get_local_client("cloudwatch"),
-            account_id,
+        _collect_account_service_quotas(
+            account_id, config, remote_creds, s3_client, event
         )
-        sqc.collect(list(set(config.get("selected_services", []))))
-        sqc.manage_alarms(config.get("alerting_config"))
-
     elif event["action"] == "IncreaseServiceQuota":
-        remote_service_quota_client = _get_remote_client("service-quotas", remote_creds)
-
-        service_quota: ServiceQuota = _get_service_quota_from_alarm(
-            event["alarm"], remote_service_quota_client
-        )
-
-        sqi = ServiceQuotasIncreaser(
-            _get_remote_client("support", remote_creds), remote_service_quota_client
-        )
-        sqi.request_service_quota_increase(
-            _get_increase_rule_from_config(config, service_quota)
-        )
+        _increase_service_quota(config, remote_creds, event["alarm"])
     else:
         logger.error(
             f"Action {event['action']} not recognized as valid action. Exiting..."
@@ -0,0 +1,48 @@
+import gzip
+import json
+from typing import Dict
+
+from botocore.exceptions import ClientError
+
+from service_quotas_manager.util import get_logger
+
+logger = get_logger()
+
+
+class StateStore:
+    """
+    Reads and writes state that needs to survive between invocations as compressed
+    JSON objects in the configuration bucket.
+    """
+
+    def __init__(self, s3_client, bucket: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+
+    def read(self, key: str) -> Dict:
+        """Read a state object. Returns an empty dict if it can not be read."""
+
+        try:
+            state_obj = self.s3_client.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as ex:
+            if ex.response["Error"]["Code"] != "NoSuchKey":
+                logger.warning(
+                    f"Could not read state from s3://{self.bucket}/{key}. Error: {ex.response['Error']['Code']}."
+                )
+            return {}
+
+        return json.loads(gzip.decompress(state_obj["Body"].read()).decode("utf-8"))
+
+    def write(self, key: str, state: Dict) -> None:
+        """Write a state object, replacing any previous version of it."""
+
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=gzip.compress(
+                json.dumps(state, separators=(",", ":"), default=str).encode()
+            ),
+            ContentEncoding="gzip",
+            ContentType="application/json",
+        )
+        logger.debug(f"Stored state in s3://{self.bucket}/{key}.")
@@ -0,0 +1,109 @@
+from typing import Any, Dict, Final, List, Optional
+
+from jmespath.exceptions import JMESPathError, JMESPathTypeError
+from jmespath.parser import ParsedResult
+
+STREAMING_FUNCTIONS: Final[List[str]] = ["length", "max", "sum"]
+"""The JMESPath functions that can reduce rows one at a time"""
+
+
+class StreamingReduction:
+    """
+    Evaluates a JMESPath reduction of the form `length([])`, `sum([].<projection>)`
+    or `max([].<projection>)` on the rows of a query one row at a time, so the rows
+    don't need to be kept in memory. The result is identical to searching the full
+    list of rows with the same expression.
+    """
+
+    def __init__(self, function_name: str, projection: ParsedResult):
+        self.function_name = function_name
+        self.projection = projection
+
+        self._count = 0
+        self._total: Any = 0
+        self._maximum: Any = None
+        self._error: Optional[JMESPathError] = None
+
+    @classmethod
+    def from_jmespath(cls, compiled: ParsedResult) -> Optional["StreamingReduction"]:
+        """
+        Return a streaming reduction for a compiled JMESPath expression, or None if
+        the expression is not one of the supported shapes.
+        """
+
+        node = compiled.parsed
+        if (
+            node["type"] != "function_expression"
+            or node["value"] not in STREAMING_FUNCTIONS
+            or len(node["children"]) != 1
+        ):
+            return None
+
+        projection = node["children"][0]
+        if projection["type"] != "projection" or projection["children"][0] != {
+            "type": "flatten",
+            "children": [{"type": "identity", "children": []}],
+        }:
+            return None
+
+        return cls(
+            node["value"], ParsedResult(compiled.expression, projection["children"][1])
+        )
+
+    def add(self, row: Dict) -> None:
+        """Reduce a single row. Errors are raised when the result is requested."""
+
+        if self._error:
+            return
+
+        value = self.projection.search(row)
+        if value is None:
+            return
+
+        try:
+            self._reduce(value)
+        except JMESPathError as ex:
+            self._error = ex
+
+    def result(self) -> Any:
+        """Return the reduced value of all rows added."""
+
+        if self._error:
+            raise self._error
+
+        if self.function_name == "length":
+            return self._count
+        if self.function_name == "sum":
+            return self._total
+        return self._maximum
+
+    def _reduce(self, value: Any) -> None:
+        self._count += 1
+
+        if self.function_name == "sum":
+            if not _is_number(value):
+                raise JMESPathTypeError("sum", value, _type_name(value), ["number"])
+            self._total += value
+
+        elif self.function_name == "max":
+            if not (_is_number(value) or isinstance(value, str)) or (
+                self._maximum is not None
+                and _type_name(value) != _type_name(self._maximum)
+            ):
+                raise JMESPathTypeError(
+                    "max", value, _type_name(value), ["number", "string"]
+                )
+            if self._maximum is None or value > self._maximum:
+                self._maximum = value
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _type_name(value: Any) -> str:
+    if _is_number(value):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return type(value).__name__
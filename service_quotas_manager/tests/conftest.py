@@ -6,6 +6,13 @@ from pathlib import Path
 import botocore.session
 import pytest
 
+from service_quotas_manager import (
+    billed_service_cache,
+    quota_catalog,
+    service_code_resolver,
+    service_quotas_manager,
+)
+
 FIXTURES_PATH = f"{os.path.dirname(__file__)}/fixtures"
 
 ### Boto3 Client Fixtures
@@ -46,6 +53,18 @@ def cost_explorer():
     return botocore.session.get_session().create_client("ce")
 
 
+### Module Caches
+
+
+@pytest.fixture(autouse=True)
+def reset_module_caches():
+    quota_catalog._catalogs.clear()
+    service_quotas_manager._configurations.clear()
+    service_quotas_manager._credentials.clear()
+    service_code_resolver._resolved_service_codes.clear()
+    billed_service_cache._billed_services.clear()
+
+
 ### AWS Config Expression Results
 
 
@@ -112,5 +131,9 @@ def lambda_context():
             "arn:aws:lambda:eu-west-1:123456789000:function:ServiceQuotasManager"
         )
         aws_request_id: str = "52fdfc07-2182-154f-163f-5f0f9a621d72"
+        remaining_time_in_millis: int = 300_000
+
+        def get_remaining_time_in_millis(self) -> int:
+            return self.remaining_time_in_millis
 
     return LambdaContext()
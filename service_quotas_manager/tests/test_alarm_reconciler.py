@@ -0,0 +1,76 @@
+from botocore.stub import Stubber
+
+from service_quotas_manager.alarm_reconciler import AlarmReconciler, canonicalize
+
+
+def _alarm(name: str, threshold: float = 75.0, **attributes):
+    return {
+        "AlarmName": name,
+        "MetricName": "ServiceQuotaUsage",
+        "Namespace": "ServiceQuotaManager",
+        "Dimensions": [
+            {"Name": "ServiceCode", "Value": "lambda"},
+            {"Name": "QuotaCode", "Value": name},
+        ],
+        "Threshold": threshold,
+        **attributes,
+    }
+
+
+class TestAlarmReconciler:
+    def test_canonical_form_ignores_order_and_number_types(self):
+        assert canonicalize(_alarm("L-1", 75.0)) == canonicalize(
+            {
+                **_alarm("L-1", 75),
+                "Dimensions": list(reversed(_alarm("L-1")["Dimensions"])),
+            }
+        )
+        assert canonicalize(_alarm("L-1", 75.0)) != canonicalize(_alarm("L-1", 80.0))
+
+    def test_plans_creates_updates_and_deletes(self, cloudwatch):
+        plan = AlarmReconciler(cloudwatch).plan(
+            {
+                "L-1": _alarm("L-1"),
+                "L-2": _alarm("L-2", 80.0),
+                "L-3": _alarm("L-3"),
+            },
+            {
+                "L-2": _alarm("L-2", 75.0, StateValue="OK"),
+                "L-3": _alarm("L-3", 75, StateValue="ALARM"),
+                "L-4": _alarm("L-4"),
+            },
+        )
+
+        assert plan.create == [_alarm("L-1")]
+        assert plan.update == [_alarm("L-2", 80.0)]
+        assert plan.delete == ["L-4"]
+        assert len(plan) == 3
+
+    def test_applies_plan(self, cloudwatch):
+        reconciler = AlarmReconciler(cloudwatch)
+        plan = reconciler.plan(
+            {"L-0": _alarm("L-0")},
+            {f"L-{i}": _alarm(f"L-{i}") for i in range(1, 102)},
+        )
+
+        stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.add_response("put_metric_alarm", {}, _alarm("L-0"))
+        stubbed_cloudwatch.add_response(
+            "delete_alarms", {}, {"AlarmNames": [f"L-{i}" for i in range(1, 101)]}
+        )
+        stubbed_cloudwatch.add_response("delete_alarms", {}, {"AlarmNames": ["L-101"]})
+        stubbed_cloudwatch.activate()
+
+        reconciler.apply(plan)
+
+        stubbed_cloudwatch.assert_no_pending_responses()
+
+    def test_plans_renames_as_create_and_delete(self, cloudwatch):
+        plan = AlarmReconciler(cloudwatch).plan(
+            {"L-1": _alarm("Service Quota: 123456789000: L-1")},
+            {"L-1": _alarm("Service Quota: L-1 in account 123456789000")},
+        )
+
+        assert plan.create == [_alarm("Service Quota: 123456789000: L-1")]
+        assert plan.update == []
+        assert plan.delete == ["Service Quota: L-1 in account 123456789000"]
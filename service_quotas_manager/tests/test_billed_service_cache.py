@@ -0,0 +1,89 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+from botocore.stub import ANY, Stubber
+
+from service_quotas_manager.billed_service_cache import (
+    CACHE_VERSION,
+    BilledServiceCache,
+)
+from service_quotas_manager.state_store import StateStore
+
+PUT_OBJECT_PARAMS = {
+    "Body": ANY,
+    "Bucket": "bucket_name",
+    "ContentEncoding": "gzip",
+    "ContentType": "application/json",
+    "Key": "billed_services_key",
+}
+
+
+def _cache_body(detected_at: datetime) -> BytesIO:
+    return BytesIO(
+        gzip.compress(
+            json.dumps(
+                {
+                    "version": CACHE_VERSION,
+                    "detected_at": detected_at.isoformat(),
+                    "service_names": ["AWS Lambda"],
+                }
+            ).encode()
+        )
+    )
+
+
+def _fail_detection():
+    raise AssertionError("Billed services should not be detected")
+
+
+class TestBilledServiceCache:
+    def test_can_use_billed_services_from_s3(self, s3):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response(
+            "get_object",
+            {"Body": _cache_body(datetime.now(timezone.utc) - timedelta(hours=23))},
+            {"Bucket": "bucket_name", "Key": "billed_services_key"},
+        )
+        stubbed_s3.activate()
+
+        cache = BilledServiceCache(StateStore(s3, "bucket_name"), "billed_services_key")
+        assert cache.get_service_names(_fail_detection) == ["AWS Lambda"]
+
+        # A warm invocation uses the billed services in memory instead of reading S3.
+        cache = BilledServiceCache(StateStore(s3, "bucket_name"), "billed_services_key")
+        assert cache.get_service_names(_fail_detection) == ["AWS Lambda"]
+        stubbed_s3.assert_no_pending_responses()
+
+    def test_detects_billed_services_when_stale(self, s3):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response(
+            "get_object",
+            {"Body": _cache_body(datetime.now(timezone.utc) - timedelta(hours=2))},
+            {"Bucket": "bucket_name", "Key": "billed_services_key"},
+        )
+        stubbed_s3.add_response("put_object", {}, PUT_OBJECT_PARAMS)
+        stubbed_s3.activate()
+
+        cache = BilledServiceCache(
+            StateStore(s3, "bucket_name"), "billed_services_key", timedelta(hours=1)
+        )
+        assert cache.get_service_names(lambda: ["Amazon Simple Storage Service"]) == [
+            "Amazon Simple Storage Service"
+        ]
+        stubbed_s3.assert_no_pending_responses()
+
+    def test_detects_billed_services_on_forced_refresh(self, s3):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response("put_object", {}, PUT_OBJECT_PARAMS)
+        stubbed_s3.activate()
+
+        cache = BilledServiceCache(
+            StateStore(s3, "bucket_name"), "billed_services_key", force_refresh=True
+        )
+        assert cache.get_service_names(lambda: ["AWS Lambda"]) == ["AWS Lambda"]
+
+        # A failed detection is not cached.
+        assert cache.get_service_names(lambda: None) is None
+        stubbed_s3.assert_no_pending_responses()
@@ -0,0 +1,31 @@
+from unittest.mock import Mock
+
+from service_quotas_manager.client_factory import ClientFactory
+
+
+class TestClientFactory:
+    def test_reuses_clients_per_credentials_service_and_region(self):
+        rate_limiter = Mock(attach=Mock(side_effect=lambda client: client))
+        client_factory = ClientFactory(rate_limiter, max_pool_connections=5)
+        credentials = {
+            "aws_access_key_id": "fake-access-key-id",
+            "aws_secret_access_key": "fake-secret-access-key",
+            "aws_session_token": "fake-session-token",
+        }
+
+        client = client_factory.get_client("cloudwatch", credentials)
+        assert client_factory.get_client("cloudwatch", dict(credentials)) is client
+        assert client.meta.config.max_pool_connections == 5
+
+        us_client = client_factory.get_client("config", credentials, "us-east-1")
+        assert us_client.meta.region_name == "us-east-1"
+        assert credentials == {
+            "aws_access_key_id": "fake-access-key-id",
+            "aws_secret_access_key": "fake-secret-access-key",
+            "aws_session_token": "fake-session-token",
+        }
+        client = client_factory.get_client("config", credentials)
+        assert client.meta.region_name == "eu-west-1"
+
+        assert client_factory.get_client("config") is not client
+        assert rate_limiter.attach.call_count == 4
@@ -0,0 +1,87 @@
+from botocore.stub import Stubber
+
+from service_quotas_manager.config_aggregator import ConfigAggregator
+
+
+class TestConfigAggregator:
+    def test_splits_aggregate_query_results_per_account(self, aws_config):
+        stubbed_aws_config = Stubber(aws_config)
+        stubbed_aws_config.add_response(
+            "select_aggregate_resource_config",
+            {
+                "Results": [
+                    '{"accountId":"123456789000","configuration":{"vpcId":"vpc-a"},"COUNT(*)":3}',
+                    '{"accountId":"123456789001","configuration":{"vpcId":"vpc-c"},"COUNT(*)":1}',
+                ]
+            },
+            {
+                "Expression": "SELECT accountId, configuration.vpcId, COUNT(*) WHERE accountId IN ('123456789000', '123456789001', '123456789002') AND awsRegion = 'eu-west-1' AND (resourceType = 'AWS::EC2::Subnet' OR resourceType = 'AWS::EC2::VPC') GROUP BY accountId, configuration.vpcId",
+                "ConfigurationAggregatorName": "organization",
+            },
+        )
+        stubbed_aws_config.activate()
+
+        config_aggregator = ConfigAggregator(
+            aws_config,
+            "organization",
+            "eu-west-1",
+            ["123456789000", "123456789001", "123456789002"],
+        )
+        expression = "SELECT configuration.vpcId, COUNT(*) WHERE resourceType = 'AWS::EC2::Subnet' OR resourceType = 'AWS::EC2::VPC' GROUP BY configuration.vpcId"
+
+        assert config_aggregator.get_rows(expression, "123456789000") == [
+            {"configuration": {"vpcId": "vpc-a"}, "COUNT(*)": 3}
+        ]
+        assert config_aggregator.get_rows(expression, "123456789001") == [
+            {"configuration": {"vpcId": "vpc-c"}, "COUNT(*)": 1}
+        ]
+        assert config_aggregator.get_rows(expression, "123456789002") == []
+        stubbed_aws_config.assert_no_pending_responses()
+
+        # The rows of an account are released once it has taken them.
+        assert config_aggregator._rows_by_expression[expression] == {}
+
+    def test_limits_aggregate_queries_to_the_accounts(self, aws_config, mocker):
+        mocker.patch(
+            "service_quotas_manager.config_aggregator.MAX_ACCOUNTS_PER_QUERY", 2
+        )
+        stubbed_aws_config = Stubber(aws_config)
+        for account_ids in ["'1', '2'", "'3'"]:
+            stubbed_aws_config.add_response(
+                "select_aggregate_resource_config",
+                {"Results": ['{"accountId":"3","resourceId":"a"}']},
+                {
+                    "Expression": f"SELECT accountId, resourceId WHERE accountId IN ({account_ids}) AND awsRegion = 'eu-west-1' AND (resourceType = 'AWS::EC2::Subnet')",
+                    "ConfigurationAggregatorName": "organization",
+                },
+            )
+        stubbed_aws_config.activate()
+
+        config_aggregator = ConfigAggregator(
+            aws_config, "organization", "eu-west-1", ["1", "2", "3"]
+        )
+        expression = "SELECT resourceId WHERE resourceType = 'AWS::EC2::Subnet'"
+
+        assert config_aggregator.get_rows(expression, "3") == [
+            {"resourceId": "a"},
+            {"resourceId": "a"},
+        ]
+        stubbed_aws_config.assert_no_pending_responses()
+
+    def test_reports_failed_aggregate_queries(self, aws_config):
+        stubbed_aws_config = Stubber(aws_config)
+        stubbed_aws_config.add_client_error(
+            "select_aggregate_resource_config",
+            service_error_code="NoSuchConfigurationAggregatorException",
+        )
+        stubbed_aws_config.activate()
+
+        config_aggregator = ConfigAggregator(
+            aws_config, "organization", "eu-west-1", ["123456789000", "123456789001"]
+        )
+        expression = "SELECT resourceId WHERE resourceType = 'AWS::EC2::Subnet'"
+
+        # The failure is kept, so the query is not run again for every account.
+        assert config_aggregator.get_rows(expression, "123456789000") is None
+        assert config_aggregator.get_rows(expression, "123456789001") is None
+        stubbed_aws_config.assert_no_pending_responses()
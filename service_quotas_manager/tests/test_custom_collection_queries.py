@@ -1,27 +1,79 @@
-import json
+import pytest
 
-import jmespath
+from service_quotas_manager.collection_query_registry import (
+    CollectionQueryRegistry,
+    get_collection_query_registry,
+)
 
 
 class TestCustomCollectionQueries:
     def test_custom_collection_queries(self, aws_config_expression_results):
-        all_queries = json.load(
-            open("service_quotas_manager/custom_collection_queries.json")
-        )
-        for service_code in all_queries:
-            for quota_code, defs in all_queries[service_code].items():
-                try:
-                    assert (
-                        float(
-                            jmespath.search(
-                                defs["parameters"]["jmespath"],
-                                aws_config_expression_results[service_code][quota_code],
-                            )
+        for collection_query in get_collection_query_registry():
+            try:
+                assert (
+                    float(
+                        collection_query.compiled_jmespath.search(
+                            aws_config_expression_results[
+                                collection_query.service_code
+                            ][collection_query.quota_code]
                         )
-                        == 2.0
-                    )
-                except AssertionError as ex:
-                    print(
-                        f"Failed JMESPath search of {defs['parameters']['jmespath']} for {service_code} / {quota_code}"
                     )
-                    raise ex
+                    == 2.0
+                )
+            except AssertionError as ex:
+                print(
+                    f"Failed JMESPath search of {collection_query.jmespath} for {collection_query.service_code} / {collection_query.quota_code}"
+                )
+                raise ex
+
+    @pytest.mark.parametrize(
+        "definition",
+        [
+            {"type": "cloudwatch", "parameters": {"expression": "x", "jmespath": "@"}},
+            {"type": "config", "parameters": {"jmespath": "length([])"}},
+            {"type": "config", "parameters": {"expression": "x", "jmespath": "len(["}},
+        ],
+    )
+    def test_registry_rejects_invalid_queries(self, definition):
+        with pytest.raises(ValueError, match="lambda / L-12345678"):
+            CollectionQueryRegistry({"lambda": {"L-12345678": definition}})
+
+    def test_registry_detects_counting_queries(self):
+        registry = CollectionQueryRegistry(
+            {
+                "ec2": {
+                    "L-0263D0A3": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": "SELECT resourceId WHERE resourceType = 'AWS::EC2::EIP'",
+                            "jmespath": "length([])",
+                        },
+                    },
+                    "L-1216C47A": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": "SELECT resourceId WHERE resourceType = 'AWS::EC2::Instance' AND configuration.state.name = 'running'",
+                            "jmespath": "length([])",
+                        },
+                    },
+                    "L-34B43A08": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": "SELECT configuration WHERE resourceType = 'AWS::EC2::Instance'",
+                            "jmespath": "length([])",
+                        },
+                    },
+                }
+            }
+        )
+
+        eip = registry.get("ec2", "L-0263D0A3")
+        assert eip.count_filter == "resourceType = 'AWS::EC2::EIP'"
+        assert eip.count_resource_type == "AWS::EC2::EIP"
+        assert eip.resource_types == ("AWS::EC2::EIP",)
+
+        running = registry.get("ec2", "L-1216C47A")
+        assert running.count_filter.endswith("configuration.state.name = 'running'")
+        assert running.count_resource_type is None
+
+        assert registry.get("ec2", "L-34B43A08").count_filter is None
@@ -0,0 +1,62 @@
+import subprocess
+import sys
+from typing import Dict, Final
+
+IMPORT_TIME_BUDGET_US: Final[int] = 50_000
+"""The time the handler module may take to import on top of its dependencies"""
+
+DEPENDENCIES: Final[str] = (
+    "import boto3, botocore.config, botocore.loaders, aws_lambda_powertools, "
+    "aws_lambda_powertools.utilities.typing"
+)
+
+
+def _import_times(statement: str) -> Dict[str, int]:
+    """Import modules in a fresh interpreter, returning cumulative import times."""
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{DEPENDENCIES}; {statement}"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        import_times[module.strip()] = int(cumulative)
+
+    return import_times
+
+
+class TestImportTime:
+    def test_handler_only_imports_what_every_action_needs(self):
+        import_times = _import_times(
+            "import service_quotas_manager.service_quotas_manager"
+        )
+
+        for module in [
+            "difflib",
+            "unittest",
+            "service_quotas_manager.service_quotas_collector",
+            "service_quotas_manager.service_quotas_increaser",
+        ]:
+            assert module not in import_times
+
+    def test_handler_builds_client_factory_on_first_use(self):
+        _import_times(
+            "import service_quotas_manager.service_quotas_manager as sqm; "
+            "assert sqm._get_client_factory.cache_info().currsize == 0"
+        )
+
+    def test_handler_imports_within_budget(self):
+        import_times = _import_times(
+            "import service_quotas_manager.service_quotas_manager"
+        )
+
+        assert (
+            import_times["service_quotas_manager.service_quotas_manager"]
+            < IMPORT_TIME_BUDGET_US
+        )
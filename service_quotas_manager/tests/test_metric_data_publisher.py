@@ -0,0 +1,175 @@
+import json
+from datetime import datetime
+
+import botocore.session
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+from botocore.serialize import create_serializer
+from botocore.stub import Stubber
+
+from service_quotas_manager.metric_data_publisher import (
+    MAX_REQUEST_BYTES,
+    EmbeddedMetricPublisher,
+    MetricDataPublisher,
+)
+
+TIMESTAMP = datetime(2024, 1, 1, 10)
+
+
+class _RawResponse:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def _metric(quota_code: str, quota_name: str = "Quota"):
+    return {
+        "MetricName": "ServiceQuotaUsage",
+        "Dimensions": [
+            {"Name": "QuotaName", "Value": quota_name},
+            {"Name": "QuotaCode", "Value": quota_code},
+        ],
+    }
+
+
+class TestMetricDataPublisher:
+    def test_combines_values_with_their_counts(self, cloudwatch):
+        publisher = MetricDataPublisher(cloudwatch)
+
+        datums = publisher._build_datums(
+            _metric("L-1"), [3.0, 2.0, 3.0, 3.0, 1.0], TIMESTAMP
+        )
+        assert [(d["Values"], d["Counts"]) for d in datums] == [
+            ([3.0, 2.0, 1.0], [3.0, 1.0, 1.0])
+        ]
+
+        datums = publisher._build_datums(
+            _metric("L-1"), [float(v) for v in range(160)], TIMESTAMP
+        )
+        assert [len(d["Values"]) for d in datums] == [150, 10]
+
+    def test_batches_metric_data_within_request_limits(self, cloudwatch):
+        publisher = MetricDataPublisher(cloudwatch)
+
+        batches = publisher._batch_metric_data(
+            "ServiceQuotaManager",
+            [
+                {**_metric(f"L-{i}"), "Values": [1.0], "Counts": [1.0]}
+                for i in range(2001)
+            ],
+        )
+        assert [len(batch) for batch in batches] == [1000, 1000, 1]
+
+        batches = publisher._batch_metric_data(
+            "ServiceQuotaManager",
+            [
+                {**_metric(f"L-{i}", "x" * 250_000), "Values": [1.0], "Counts": [1.0]}
+                for i in range(5)
+            ],
+        )
+        assert [len(batch) for batch in batches] == [3, 2]
+
+    def test_sizes_requests_as_serialized_by_the_protocol(self):
+        cloudwatch = botocore.session.get_session().create_client(
+            "cloudwatch",
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+            config=Config(disable_request_compression=True),
+        )
+        request_bytes = []
+
+        def send(request, **kwargs):
+            request_bytes.append(len(request.body))
+            return AWSResponse(request.url, 200, {}, _RawResponse(b"{}"))
+
+        cloudwatch.meta.events.register("before-send.cloudwatch", send)
+
+        metrics = [_metric(f"L-{i}") for i in range(150)]
+        values_by_metric = [
+            [1 / (i + v + 3) for v in range(300)] for i in range(len(metrics))
+        ]
+        requests = MetricDataPublisher(cloudwatch).publish(
+            "ServiceQuotaManager", metrics, values_by_metric, TIMESTAMP
+        )
+
+        assert requests == len(request_bytes) > 1
+        assert max(request_bytes) <= MAX_REQUEST_BYTES
+
+        # The query protocol repeats the member names of every value.
+        cloudwatch._serializer = create_serializer("query")
+        publisher = MetricDataPublisher(cloudwatch)
+        metric_data = [
+            datum
+            for metric, values in zip(metrics, values_by_metric, strict=True)
+            for datum in publisher._build_datums(metric, values, TIMESTAMP)
+        ]
+
+        batches = publisher._batch_metric_data("ServiceQuotaManager", metric_data)
+        assert sum(len(batch) for batch in batches) == len(metric_data)
+        assert len(batches) > requests
+        assert all(
+            publisher._request_bytes("ServiceQuotaManager", batch) <= MAX_REQUEST_BYTES
+            for batch in batches
+        )
+
+    def test_publishes_all_values(self, cloudwatch):
+        stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.add_response(
+            "put_metric_data",
+            {},
+            {
+                "Namespace": "ServiceQuotaManager",
+                "MetricData": [
+                    {
+                        **_metric("L-1"),
+                        "Timestamp": TIMESTAMP,
+                        "Values": [2.0, 1.0],
+                        "Counts": [2.0, 1.0],
+                    },
+                    {
+                        **_metric("L-2"),
+                        "Timestamp": TIMESTAMP,
+                        "Values": [5.0],
+                        "Counts": [1.0],
+                    },
+                ],
+            },
+        )
+        stubbed_cloudwatch.activate()
+
+        requests = MetricDataPublisher(cloudwatch).publish(
+            "ServiceQuotaManager",
+            [_metric("L-1"), _metric("L-2")],
+            [[2.0, 1.0, 2.0], [5.0]],
+            TIMESTAMP,
+        )
+
+        assert requests == 1
+        stubbed_cloudwatch.assert_no_pending_responses()
+
+    def test_writes_embedded_metric_format_lines(self, capsys, monkeypatch):
+        monkeypatch.setenv("POWERTOOLS_SERVICE_NAME", "ServiceQuotasManager")
+        timestamp = datetime.now().replace(microsecond=0)
+
+        lines = EmbeddedMetricPublisher().publish(
+            "ServiceQuotaManager",
+            [_metric("L-1"), _metric("L-2")],
+            [[2.0, 1.0], [float(v) for v in range(150)]],
+            timestamp,
+        )
+
+        output = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert lines == len(output) == 3
+        assert output[0]["_aws"]["CloudWatchMetrics"] == [
+            {
+                "Namespace": "ServiceQuotaManager",
+                "Dimensions": [["QuotaName", "QuotaCode"]],
+                "Metrics": [{"Name": "ServiceQuotaUsage", "Unit": "None"}],
+            }
+        ]
+        assert output[0]["_aws"]["Timestamp"] == int(timestamp.timestamp() * 1000)
+        assert output[0]["QuotaCode"] == "L-1"
+        assert output[0]["ServiceQuotaUsage"] == [2.0, 1.0]
+        assert [len(line["ServiceQuotaUsage"]) for line in output[1:]] == [100, 50]
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from botocore.stub import ANY, Stubber
+
+from service_quotas_manager.metric_data_reader import MetricDataReader
+
+START_TIME = datetime(2024, 1, 1, 10)
+END_TIME = START_TIME + timedelta(hours=1)
+
+
+def _query(query_id: str, period: int = 300):
+    return {
+        "Id": query_id,
+        "MetricStat": {
+            "Metric": {"Namespace": "AWS/Usage", "MetricName": "ResourceCount"},
+            "Period": period,
+            "Stat": "Maximum",
+        },
+    }
+
+
+class TestMetricDataReader:
+    def test_batches_queries_within_request_limits(self, cloudwatch):
+        reader = MetricDataReader(cloudwatch)
+
+        batches = reader._batch_queries(
+            [_query(f"q{i}") for i in range(1001)], START_TIME, END_TIME
+        )
+        assert [len(batch) for batch in batches] == [500, 500, 1]
+
+        batches = reader._batch_queries(
+            [_query(f"q{i}", period=1) for i in range(60)], START_TIME, END_TIME
+        )
+        assert [len(batch) for batch in batches] == [28, 28, 4]
+
+    def test_merges_pages_and_retries_incomplete_queries(self, cloudwatch):
+        queries = [_query("q1"), _query("q2"), _query("q3")]
+
+        stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.add_response(
+            "get_metric_data",
+            {
+                "MetricDataResults": [
+                    {"Id": "q1", "Values": [3.0], "StatusCode": "PartialData"},
+                    {"Id": "q2", "Values": [5.0], "StatusCode": "Complete"},
+                ],
+                "NextToken": "page-2",
+            },
+            {
+                "MetricDataQueries": queries,
+                "StartTime": START_TIME,
+                "EndTime": END_TIME,
+                "ScanBy": "TimestampDescending",
+            },
+        )
+        stubbed_cloudwatch.add_response(
+            "get_metric_data",
+            {
+                "MetricDataResults": [
+                    {"Id": "q1", "Values": [2.0], "StatusCode": "Complete"},
+                    {"Id": "q3", "Values": [], "StatusCode": "InternalError"},
+                ],
+                "Messages": [{"Code": "InternalError", "Value": "Try again"}],
+            },
+            {
+                "MetricDataQueries": queries,
+                "StartTime": START_TIME,
+                "EndTime": END_TIME,
+                "ScanBy": "TimestampDescending",
+                "NextToken": "page-2",
+            },
+        )
+        stubbed_cloudwatch.add_response(
+            "get_metric_data",
+            {
+                "MetricDataResults": [
+                    {"Id": "q3", "Values": [7.0], "StatusCode": "Complete"}
+                ]
+            },
+            {
+                "MetricDataQueries": [queries[2]],
+                "StartTime": ANY,
+                "EndTime": ANY,
+                "ScanBy": "TimestampDescending",
+            },
+        )
+        stubbed_cloudwatch.activate()
+
+        values_by_id = MetricDataReader(cloudwatch).read(queries, START_TIME, END_TIME)
+
+        assert values_by_id == {"q1": [3.0, 2.0], "q2": [5.0], "q3": [7.0]}
+        stubbed_cloudwatch.assert_no_pending_responses()
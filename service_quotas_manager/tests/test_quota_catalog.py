@@ -0,0 +1,103 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+from botocore.stub import ANY, Stubber
+
+from service_quotas_manager import quota_catalog
+from service_quotas_manager.quota_catalog import CATALOG_VERSION, QuotaCatalog
+from service_quotas_manager.state_store import StateStore
+
+
+def _catalog_body(created_at: datetime, version: int = CATALOG_VERSION) -> BytesIO:
+    return BytesIO(
+        gzip.compress(
+            json.dumps(
+                {
+                    "version": version,
+                    "created_at": created_at.isoformat(),
+                    "services": [
+                        {"ServiceCode": "lambda", "ServiceName": "AWS Lambda"}
+                    ],
+                    "default_service_quotas": {"lambda": [{"QuotaCode": "L-1"}]},
+                }
+            ).encode()
+        )
+    )
+
+
+class TestQuotaCatalog:
+    def test_can_use_catalog_from_s3(self, s3):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response(
+            "get_object",
+            {"Body": _catalog_body(datetime.now(timezone.utc))},
+            {"Bucket": "bucket_name", "Key": "catalog_key"},
+        )
+        stubbed_s3.activate()
+
+        catalog = QuotaCatalog(StateStore(s3, "bucket_name"), "catalog_key")
+        catalog.load()
+
+        assert catalog.get_services(lambda: []) == [
+            {"ServiceCode": "lambda", "ServiceName": "AWS Lambda"}
+        ]
+        assert catalog.get_default_service_quotas("lambda", lambda _: []) == [
+            {"QuotaCode": "L-1"}
+        ]
+
+        # Nothing was added, so nothing needs to be stored.
+        catalog.save()
+        stubbed_s3.assert_no_pending_responses()
+
+    def test_keeps_catalog_in_memory_across_invocations(self, s3):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_client_error("get_object", service_error_code="NoSuchKey")
+        stubbed_s3.add_response(
+            "put_object",
+            {},
+            {
+                "Body": ANY,
+                "Bucket": "bucket_name",
+                "ContentEncoding": "gzip",
+                "ContentType": "application/json",
+                "Key": "catalog_key",
+            },
+        )
+        stubbed_s3.activate()
+
+        catalog = QuotaCatalog(StateStore(s3, "bucket_name"), "catalog_key")
+        catalog.load()
+        catalog.get_default_service_quotas("lambda", lambda _: [{"QuotaCode": "L-1"}])
+        catalog.save()
+        stubbed_s3.assert_no_pending_responses()
+
+        # A warm invocation uses the catalog in memory instead of reading S3.
+        catalog = QuotaCatalog(StateStore(s3, "bucket_name"), "catalog_key")
+        catalog.load()
+        assert catalog.get_default_service_quotas("lambda", lambda _: []) == [
+            {"QuotaCode": "L-1"}
+        ]
+
+    def test_rebuilds_stale_catalog(self, s3):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response(
+            "get_object",
+            {"Body": _catalog_body(datetime.now(timezone.utc) - timedelta(days=2))},
+            {"Bucket": "bucket_name", "Key": "catalog_key"},
+        )
+        stubbed_s3.add_response(
+            "get_object",
+            {"Body": _catalog_body(datetime.now(timezone.utc), version=0)},
+            {"Bucket": "bucket_name", "Key": "catalog_key"},
+        )
+        stubbed_s3.activate()
+
+        for _ in range(2):
+            quota_catalog._catalogs.clear()
+            catalog = QuotaCatalog(StateStore(s3, "bucket_name"), "catalog_key")
+            catalog.load()
+            assert catalog.get_services(lambda: []) == []
+
+        stubbed_s3.assert_no_pending_responses()
@@ -0,0 +1,87 @@
+from unittest.mock import Mock, patch
+
+from service_quotas_manager.rate_limiter import RateLimiter, TokenBucket
+
+
+class TestRateLimiter:
+    @patch("service_quotas_manager.rate_limiter.time")
+    def test_token_bucket_waits_once_burst_is_used(self, mocked_time):
+        mocked_time.monotonic.return_value = 100.0
+        bucket = TokenBucket(2)
+
+        assert bucket.acquire() == 0.0
+        assert bucket.acquire() == 0.0
+        assert bucket.acquire() == 0.5
+        assert bucket.acquire() == 1.0
+        mocked_time.sleep.assert_called_with(1.0)
+
+    @patch("service_quotas_manager.rate_limiter.time")
+    def test_token_bucket_backs_off_and_recovers(self, mocked_time):
+        mocked_time.monotonic.return_value = 100.0
+        bucket = TokenBucket(4, minimum_rate=1)
+
+        bucket.throttled()
+        assert bucket.rate == 2.0
+        assert bucket.acquire() == 0.5
+
+        bucket.throttled()
+        bucket.throttled()
+        assert bucket.rate == 1.0
+
+        for _ in range(20):
+            bucket.succeeded()
+        assert bucket.rate == 4.0
+
+    def test_can_attach_to_client(self, cloudwatch):
+        rate_limiter = RateLimiter({"cloudwatch": {"PutMetricAlarm": 3}})
+        assert rate_limiter.attach(cloudwatch) is cloudwatch
+
+        with patch.object(TokenBucket, "acquire", return_value=0.0) as acquire:
+            cloudwatch.meta.events.emit(
+                "before-send.cloudwatch.PutMetricAlarm", request=Mock()
+            )
+            cloudwatch.meta.events.emit(
+                "before-send.cloudwatch.DescribeAlarms", request=Mock()
+            )
+        acquire.assert_called_once()
+
+        with (
+            patch.object(TokenBucket, "throttled") as throttled,
+            patch.object(TokenBucket, "succeeded") as succeeded,
+        ):
+            operation = cloudwatch.meta.service_model.operation_model("PutMetricAlarm")
+            cloudwatch.meta.events.emit(
+                "needs-retry.cloudwatch.PutMetricAlarm",
+                operation=operation,
+                response=(
+                    Mock(status_code=400),
+                    {"Error": {"Code": "Throttling"}},
+                ),
+                attempts=1,
+                caught_exception=None,
+                request_dict={"context": {}},
+            )
+            cloudwatch.meta.events.emit(
+                "needs-retry.cloudwatch.PutMetricAlarm",
+                operation=operation,
+                response=(Mock(status_code=200), {}),
+                attempts=1,
+                caught_exception=None,
+                request_dict={"context": {}},
+            )
+        throttled.assert_called_once()
+        succeeded.assert_called_once()
+
+    def test_default_rates_attach_to_config_client(self, aws_config):
+        RateLimiter().attach(aws_config)
+
+        with patch.object(TokenBucket, "acquire", return_value=0.0) as acquire:
+            for operation_name in [
+                "GetDiscoveredResourceCounts",
+                "SelectAggregateResourceConfig",
+                "SelectResourceConfig",
+            ]:
+                aws_config.meta.events.emit(
+                    f"before-send.config-service.{operation_name}", request=Mock()
+                )
+        assert acquire.call_count == 3
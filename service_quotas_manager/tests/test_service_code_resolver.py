@@ -0,0 +1,64 @@
+from service_quotas_manager import service_code_resolver
+from service_quotas_manager.service_code_resolver import (
+    ServiceCodeResolver,
+    load_service_code_table,
+)
+
+SERVICES = [
+    {"ServiceCode": "ec2", "ServiceName": "Amazon Elastic Compute Cloud (Amazon EC2)"},
+    {"ServiceCode": "firehose", "ServiceName": "Amazon Kinesis Data Firehose"},
+    {"ServiceCode": "kinesis", "ServiceName": "Amazon Kinesis Data Streams"},
+    {"ServiceCode": "lambda", "ServiceName": "AWS Lambda"},
+    {"ServiceCode": "logs", "ServiceName": "Amazon CloudWatch Logs"},
+    {"ServiceCode": "monitoring", "ServiceName": "Amazon CloudWatch"},
+]
+
+
+class TestServiceCodeResolver:
+    def test_resolves_service_names(self):
+        resolver = ServiceCodeResolver(
+            SERVICES,
+            {
+                "AmazonCloudWatch": ["logs", "monitoring", "unknown"],
+                "Amazon Elastic Compute Cloud - Compute": ["ec2"],
+            },
+        )
+
+        assert resolver.resolve(
+            [
+                "AmazonCloudWatch",
+                "Amazon Elastic Compute Cloud - Compute",
+                "AWS Lambda",
+                "Amazon Kinesis Firehose",
+                "Amazon Simple Storage Service",
+            ]
+        ) == {
+            "AmazonCloudWatch": ("logs", "monitoring"),
+            "Amazon Elastic Compute Cloud - Compute": ("ec2",),
+            "AWS Lambda": ("lambda",),
+            "Amazon Kinesis Firehose": ("firehose",),
+            "Amazon Simple Storage Service": (),
+        }
+
+    def test_keeps_resolved_service_names(self, mocker):
+        ServiceCodeResolver(SERVICES, {}).resolve(["Amazon Kinesis Firehose"])
+        assert service_code_resolver._resolved_service_codes == {
+            "Amazon Kinesis Firehose": ("firehose",)
+        }
+
+        resolver = ServiceCodeResolver(SERVICES, {})
+        match = mocker.spy(resolver, "_match")
+
+        assert resolver.resolve(["Amazon Kinesis Firehose"]) == {
+            "Amazon Kinesis Firehose": ("firehose",)
+        }
+        match.assert_not_called()
+        assert resolver._index is None
+
+    def test_service_code_table_is_valid(self):
+        table = load_service_code_table()
+
+        assert list(table) == sorted(table)
+        for service_codes in table.values():
+            assert service_codes
+            assert all(isinstance(code, str) for code in service_codes)
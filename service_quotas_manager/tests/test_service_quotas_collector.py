@@ -1,10 +1,38 @@
+import gzip
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+import botocore.session
+from botocore.awsrequest import AWSResponse
 from botocore.stub import ANY, Stubber
 
+from service_quotas_manager.alarm_digest import AlarmDigest
+from service_quotas_manager.alarm_migration import AlarmMigration
+from service_quotas_manager.applied_quota_snapshot import (
+    SNAPSHOT_VERSION,
+    AppliedQuotaSnapshot,
+)
+from service_quotas_manager.collection_query_registry import CollectionQueryRegistry
+from service_quotas_manager.config_aggregator import ConfigAggregator
+from service_quotas_manager.config_result_cache import CACHE_VERSION, ConfigResultCache
 from service_quotas_manager.entities import ServiceQuota
+from service_quotas_manager.quota_catalog import QuotaCatalog
+from service_quotas_manager.rate_limiter import RateLimiter, TokenBucket
 from service_quotas_manager.service_quotas_collector import ServiceQuotasCollector
+from service_quotas_manager.state_store import StateStore
 from service_quotas_manager.util import convert_dict
 
 
+class _RawResponse:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
 class TestServiceQuotasCollector:
     def test_can_manage_alarms(
         self,
@@ -31,6 +59,14 @@ class TestServiceQuotasCollector:
         collector._service_quotas = [service_quota]
 
         stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {
+                "AlarmNamePrefix": "Service Quota: 123456789000:",
+                "AlarmTypes": ["MetricAlarm"],
+            },
+        )
         stubbed_cloudwatch.add_response(
             "describe_alarms",
             {
@@ -65,7 +101,7 @@ class TestServiceQuotasCollector:
             {},
             {
                 "AlarmDescription": "The service quota for Concurrent executions for service AWS Lambda in account 123456789000 is nearing its configured quota (1000.0). This quota is adjustable.",
-                "AlarmName": "Service Quota: Concurrent executions for service AWS Lambda in account 123456789000",
+                "AlarmName": "Service Quota: 123456789000: Concurrent executions for service AWS Lambda",
                 "ComparisonOperator": "GreaterThanThreshold",
                 "DatapointsToAlarm": 2,
                 "Dimensions": [
@@ -97,6 +133,36 @@ class TestServiceQuotasCollector:
 
         stubbed_cloudwatch.assert_no_pending_responses()
 
+    def test_alarms_on_the_highest_value_of_summed_usage_metrics(
+        self,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+        )
+
+        service_quota = ServiceQuota(
+            **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+        )
+        service_quota.usage_metric["MetricStatisticRecommendation"] = "Sum"
+
+        # Every per-minute sum of the past hour is stored, so summing them again
+        # would compare the hourly total to a per-minute quota.
+        alarm_definition = collector._build_alarm_definition(
+            {"default_threshold_perc": 75}, service_quota
+        )
+        assert alarm_definition["Statistic"] == "Maximum"
+        assert alarm_definition["Threshold"] == 750.0
+
     def test_can_collect_service_quotas(
         self,
         service_quotas,
@@ -114,6 +180,7 @@ class TestServiceQuotasCollector:
             cost_explorer,
             cloudwatch,
             "123456789000",
+            discovery_workers=1,
         )
 
         stubbed_service_quotas = Stubber(service_quotas)
@@ -160,7 +227,8 @@ class TestServiceQuotasCollector:
                         ],
                         "MetricName": "ServiceQuotaUsage",
                         "Timestamp": ANY,
-                        "Value": 2.0,
+                        "Values": [2.0],
+                        "Counts": [1.0],
                     },
                 ],
                 "Namespace": "ServiceQuotaManager",
@@ -172,11 +240,15 @@ class TestServiceQuotasCollector:
         stubbed_aws_config.add_response(
             "select_resource_config",
             {
-                "Results": ['{"resourceId":"eni-a"}', '{"resourceId":"eni-b"}'],
-                "QueryInfo": {"SelectFields": [{"Name": "resourceId"}]},
+                "Results": [
+                    '{"resourceType":"AWS::EC2::NetworkInterface","COUNT(*)":2}'
+                ],
+                "QueryInfo": {
+                    "SelectFields": [{"Name": "resourceType"}, {"Name": "COUNT(*)"}]
+                },
             },
             {
-                "Expression": "SELECT resourceId WHERE resourceType = 'AWS::EC2::NetworkInterface' and configuration.interfaceType = 'lambda'"
+                "Expression": "SELECT resourceType, COUNT(*) WHERE resourceType = 'AWS::EC2::NetworkInterface' and configuration.interfaceType = 'lambda' GROUP BY resourceType"
             },
         )
         stubbed_aws_config.activate()
@@ -204,6 +276,7 @@ class TestServiceQuotasCollector:
             cost_explorer,
             cloudwatch,
             "123456789000",
+            discovery_workers=1,
         )
 
         stubbed_cost_explorer = Stubber(cost_explorer)
@@ -263,7 +336,8 @@ class TestServiceQuotasCollector:
                         ],
                         "MetricName": "ServiceQuotaUsage",
                         "Timestamp": ANY,
-                        "Value": 2.0,
+                        "Values": [2.0],
+                        "Counts": [1.0],
                     },
                 ],
                 "Namespace": "ServiceQuotaManager",
@@ -275,11 +349,15 @@ class TestServiceQuotasCollector:
         stubbed_aws_config.add_response(
             "select_resource_config",
             {
-                "Results": ['{"resourceId":"eni-a"}', '{"resourceId":"eni-b"}'],
-                "QueryInfo": {"SelectFields": [{"Name": "resourceId"}]},
+                "Results": [
+                    '{"resourceType":"AWS::EC2::NetworkInterface","COUNT(*)":2}'
+                ],
+                "QueryInfo": {
+                    "SelectFields": [{"Name": "resourceType"}, {"Name": "COUNT(*)"}]
+                },
             },
             {
-                "Expression": "SELECT resourceId WHERE resourceType = 'AWS::EC2::NetworkInterface' and configuration.interfaceType = 'lambda'"
+                "Expression": "SELECT resourceType, COUNT(*) WHERE resourceType = 'AWS::EC2::NetworkInterface' and configuration.interfaceType = 'lambda' GROUP BY resourceType"
             },
         )
         stubbed_aws_config.activate()
@@ -288,3 +366,1227 @@ class TestServiceQuotasCollector:
 
         stubbed_cloudwatch.assert_no_pending_responses()
         stubbed_service_quotas.assert_no_pending_responses()
+
+    def test_can_find_service_quotas_concurrently(
+        self,
+        mocker,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_default_quotas_ec2,
+        service_quotas_list_applied_quotas_ec2,
+        service_quotas_list_default_quotas_lambda,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        pages = {
+            ("list_service_quotas", "ec2"): service_quotas_list_applied_quotas_ec2,
+            ("list_aws_default_service_quotas", "ec2"): (
+                service_quotas_list_default_quotas_ec2
+            ),
+            ("list_service_quotas", "lambda"): (
+                service_quotas_list_applied_quotas_lambda
+            ),
+            ("list_aws_default_service_quotas", "lambda"): (
+                service_quotas_list_default_quotas_lambda
+            ),
+        }
+        service_quotas = mocker.Mock()
+        service_quotas.get_paginator.side_effect = lambda operation: mocker.Mock(
+            paginate=lambda ServiceCode: [pages[(operation, ServiceCode)]]
+        )
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            discovery_workers=4,
+        )
+
+        found_service_quotas = collector._find_service_quotas(["ec2", "lambda"])
+
+        expected_quota_codes = [
+            (quota["ServiceCode"], quota["QuotaCode"])
+            for quota in service_quotas_list_default_quotas_ec2["Quotas"]
+            + service_quotas_list_default_quotas_lambda["Quotas"]
+            if "ErrorReason" not in quota
+        ]
+        assert [
+            (service_quota.service_code, service_quota.quota_code)
+            for service_quota in found_service_quotas
+        ] == expected_quota_codes
+        assert [
+            service_quota.internal_id for service_quota in found_service_quotas
+        ] == [f"sq{i:05}" for i in range(len(expected_quota_codes))]
+
+        applied_lambda_quotas = {
+            quota["QuotaCode"]: quota["Value"]
+            for quota in service_quotas_list_applied_quotas_lambda["Quotas"]
+        }
+        for service_quota in found_service_quotas:
+            if service_quota.quota_code in applied_lambda_quotas:
+                assert (
+                    service_quota.value
+                    == applied_lambda_quotas[service_quota.quota_code]
+                )
+
+    def test_can_find_service_quotas_from_catalog(
+        self,
+        s3,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_default_quotas_lambda,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_client_error("get_object", service_error_code="NoSuchKey")
+        stubbed_s3.activate()
+
+        quota_catalog = QuotaCatalog(StateStore(s3, "bucket_name"), "catalog_key")
+        quota_catalog.load()
+        quota_catalog.get_default_service_quotas(
+            "lambda", lambda _: service_quotas_list_default_quotas_lambda["Quotas"]
+        )
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            quota_catalog=quota_catalog,
+        )
+
+        # Only the applied quotas need to be retrieved from the remote account.
+        stubbed_service_quotas = Stubber(service_quotas)
+        stubbed_service_quotas.add_response(
+            "list_service_quotas",
+            service_quotas_list_applied_quotas_lambda,
+            {"ServiceCode": "lambda"},
+        )
+        stubbed_service_quotas.activate()
+
+        found_service_quotas = collector._find_service_quotas(["lambda"])
+
+        assert len(found_service_quotas) == len(
+            service_quotas_list_default_quotas_lambda["Quotas"]
+        )
+        stubbed_service_quotas.assert_no_pending_responses()
+
+    def test_only_refreshes_applied_quotas_of_changed_services(
+        self,
+        s3,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_default_quotas_ec2,
+        service_quotas_list_default_quotas_lambda,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        checked_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response(
+            "get_object",
+            {
+                "Body": BytesIO(
+                    gzip.compress(
+                        json.dumps(
+                            {
+                                "version": SNAPSHOT_VERSION,
+                                "created_at": checked_at.isoformat(),
+                                "checked_at": checked_at.isoformat(),
+                                "services": {"ec2": {}, "lambda": {}},
+                            }
+                        ).encode()
+                    )
+                )
+            },
+            {"Bucket": "bucket_name", "Key": "snapshot_key"},
+        )
+        stubbed_s3.add_response(
+            "put_object",
+            {},
+            {
+                "Body": ANY,
+                "Bucket": "bucket_name",
+                "ContentEncoding": "gzip",
+                "ContentType": "application/json",
+                "Key": "snapshot_key",
+            },
+        )
+        stubbed_s3.activate()
+
+        applied_quota_snapshot = AppliedQuotaSnapshot(
+            StateStore(s3, "bucket_name"), "snapshot_key"
+        )
+        applied_quota_snapshot.load()
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            discovery_workers=1,
+            applied_quota_snapshot=applied_quota_snapshot,
+        )
+
+        stubbed_service_quotas = Stubber(service_quotas)
+        stubbed_service_quotas.add_response(
+            "list_requested_service_quota_change_history",
+            {
+                "RequestedQuotas": [
+                    {
+                        "ServiceCode": "lambda",
+                        "QuotaCode": "L-B99A9384",
+                        "LastUpdated": datetime.now(timezone.utc),
+                    },
+                    {
+                        "ServiceCode": "ec2",
+                        "QuotaCode": "L-C4EABC2C",
+                        "LastUpdated": checked_at - timedelta(days=1),
+                    },
+                ]
+            },
+            {},
+        )
+        stubbed_service_quotas.add_response(
+            "list_aws_default_service_quotas",
+            service_quotas_list_default_quotas_ec2,
+            {"ServiceCode": "ec2"},
+        )
+        stubbed_service_quotas.add_response(
+            "list_service_quotas",
+            service_quotas_list_applied_quotas_lambda,
+            {"ServiceCode": "lambda"},
+        )
+        stubbed_service_quotas.add_response(
+            "list_aws_default_service_quotas",
+            service_quotas_list_default_quotas_lambda,
+            {"ServiceCode": "lambda"},
+        )
+        stubbed_service_quotas.activate()
+
+        collector._find_service_quotas(["ec2", "lambda"])
+
+        stubbed_service_quotas.assert_no_pending_responses()
+        stubbed_s3.assert_no_pending_responses()
+        assert applied_quota_snapshot.get("lambda")["L-B99A9384"]["Value"] == 1000.0
+
+    def test_runs_identical_config_expressions_once(
+        self,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+        )
+
+        expression = (
+            "SELECT configuration WHERE resourceType = 'AWS::ApiGateway::RestApi'"
+        )
+        service_quota_group = []
+        for endpoint_type in ["EDGE", "REGIONAL", "PRIVATE"]:
+            service_quota = ServiceQuota(
+                **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+            )
+            service_quota.collection_query = CollectionQueryRegistry(
+                {
+                    "apigateway": {
+                        endpoint_type: {
+                            "type": "config",
+                            "parameters": {
+                                "expression": expression,
+                                "jmespath": f"length([?configuration.endpointConfiguration.types[0] == '{endpoint_type}'])",
+                            },
+                        }
+                    }
+                }
+            ).get("apigateway", endpoint_type)
+            service_quota_group.append(service_quota)
+
+        stubbed_aws_config = Stubber(aws_config)
+        stubbed_aws_config.add_response(
+            "select_resource_config",
+            {
+                "Results": [
+                    '{"configuration":{"endpointConfiguration":{"types":["EDGE"]}}}',
+                    '{"configuration":{"endpointConfiguration":{"types":["EDGE"]}}}',
+                    '{"configuration":{"endpointConfiguration":{"types":["PRIVATE"]}}}',
+                ]
+            },
+            {"Expression": expression},
+        )
+        stubbed_aws_config.activate()
+
+        collector._collect_config_remote_metrics(service_quota_group)
+
+        stubbed_aws_config.assert_no_pending_responses()
+        assert [sq.metric_values for sq in service_quota_group] == [[2.0], [0.0], [1.0]]
+
+    def test_runs_config_expressions_concurrently(
+        self,
+        mocker,
+        service_quotas,
+        cloudwatch,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        results = {
+            "SELECT resourceId WHERE resourceType = 'AWS::Lambda::Function'": [
+                '{"resourceId":"a"}',
+                '{"resourceId":"b"}',
+            ],
+            "SELECT resourceId WHERE resourceType = 'AWS::DynamoDB::Table'": [
+                '{"resourceId":"c"}'
+            ],
+        }
+        aws_config = mocker.Mock()
+        aws_config.get_paginator.return_value = mocker.Mock(
+            paginate=lambda Expression: [{"Results": results[Expression]}]
+        )
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            config_query_workers=2,
+        )
+
+        registry = CollectionQueryRegistry(
+            {
+                "lambda": {
+                    f"L-{index}": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": expression,
+                            "jmespath": "length([].resourceId)",
+                        },
+                    }
+                    for index, expression in enumerate(list(results) * 2)
+                }
+            }
+        )
+        service_quota_group = []
+        for collection_query in registry:
+            service_quota = ServiceQuota(
+                **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+            )
+            service_quota.collection_query = collection_query
+            service_quota_group.append(service_quota)
+
+        collector._collect_config_remote_metrics(service_quota_group)
+
+        assert aws_config.get_paginator.call_count == 2
+        assert [sq.metric_values for sq in service_quota_group] == [
+            [2.0],
+            [1.0],
+            [2.0],
+            [1.0],
+        ]
+
+    def test_config_query_workers_share_the_rate_limit(
+        self,
+        mocker,
+        service_quotas,
+        cloudwatch,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        aws_config = botocore.session.get_session().create_client(
+            "config", aws_access_key_id="testing", aws_secret_access_key="testing"
+        )
+        RateLimiter().attach(aws_config)
+        buckets = []
+        acquire = TokenBucket.acquire
+
+        def acquire_token(bucket):
+            buckets.append(bucket)
+            return acquire(bucket)
+
+        mocker.patch.object(TokenBucket, "acquire", acquire_token)
+
+        # Both queries have to be in flight at the same time to pass the barrier.
+        in_flight = threading.Barrier(2, timeout=5)
+
+        def send(request, **kwargs):
+            in_flight.wait()
+            return AWSResponse(
+                request.url,
+                200,
+                {},
+                _RawResponse(b'{"Results": ["{\\"resourceId\\":\\"a\\"}"]}'),
+            )
+
+        aws_config.meta.events.register("before-send.config-service", send)
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            config_query_workers=2,
+        )
+
+        registry = CollectionQueryRegistry(
+            {
+                "lambda": {
+                    f"L-{index}": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": expression,
+                            "jmespath": "length([].resourceId)",
+                        },
+                    }
+                    for index, expression in enumerate(
+                        [
+                            "SELECT resourceId WHERE resourceType = 'AWS::Lambda::Function'",
+                            "SELECT resourceId WHERE resourceType = 'AWS::DynamoDB::Table'",
+                        ]
+                    )
+                }
+            }
+        )
+        service_quota_group = []
+        for collection_query in registry:
+            service_quota = ServiceQuota(
+                **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+            )
+            service_quota.collection_query = collection_query
+            service_quota_group.append(service_quota)
+
+        collector._collect_config_remote_metrics(service_quota_group)
+
+        assert len(buckets) == 2
+        assert buckets[0] is buckets[1]
+        assert [sq.metric_values for sq in service_quota_group] == [[1.0], [1.0]]
+
+    def test_runs_failed_aggregate_queries_in_the_account(
+        self,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        aggregator_config = botocore.session.get_session().create_client("config")
+        stubbed_aggregator_config = Stubber(aggregator_config)
+        stubbed_aggregator_config.add_client_error(
+            "select_aggregate_resource_config", service_error_code="AccessDenied"
+        )
+        stubbed_aggregator_config.activate()
+
+        expression = (
+            "SELECT configuration.vpcId WHERE resourceType = 'AWS::EC2::Subnet'"
+        )
+        stubbed_aws_config = Stubber(aws_config)
+        stubbed_aws_config.add_response(
+            "select_resource_config",
+            {"Results": ['{"configuration":{"vpcId":"vpc-a"}}']},
+            {"Expression": expression},
+        )
+        stubbed_aws_config.activate()
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            config_aggregator=ConfigAggregator(
+                aggregator_config, "organization", "eu-west-1", ["123456789000"]
+            ),
+        )
+
+        registry = CollectionQueryRegistry(
+            {
+                "lambda": {
+                    "L-1": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": expression,
+                            "jmespath": "length([].configuration.vpcId)",
+                        },
+                    }
+                }
+            }
+        )
+        service_quota = ServiceQuota(
+            **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+        )
+        service_quota.collection_query = next(iter(registry))
+
+        collector._collect_config_remote_metrics([service_quota])
+
+        assert service_quota.metric_values == [1.0]
+        stubbed_aggregator_config.assert_no_pending_responses()
+        stubbed_aws_config.assert_no_pending_responses()
+
+    def test_pushes_resource_counts_down_to_aws_config(
+        self,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            config_query_workers=1,
+        )
+
+        registry = CollectionQueryRegistry(
+            {
+                "ec2": {
+                    quota_code: {
+                        "type": "config",
+                        "parameters": {
+                            "expression": f"SELECT resourceId WHERE {count_filter}",
+                            "jmespath": "length([])",
+                        },
+                    }
+                    for quota_code, count_filter in {
+                        "L-1": "resourceType = 'AWS::EC2::VPC'",
+                        "L-2": "resourceType = 'AWS::EC2::EIP'",
+                        "L-3": "resourceType = 'AWS::EC2::InternetGateway'",
+                        "L-4": "resourceType = 'AWS::EC2::Volume' AND configuration.state.value = 'in-use'",
+                    }.items()
+                }
+            }
+        )
+        service_quota_group = []
+        for collection_query in registry:
+            service_quota = ServiceQuota(
+                **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+            )
+            service_quota.collection_query = collection_query
+            service_quota_group.append(service_quota)
+
+        stubbed_aws_config = Stubber(aws_config)
+        stubbed_aws_config.add_response(
+            "select_resource_config",
+            {"Results": ['{"resourceType":"AWS::EC2::Volume","COUNT(*)":7}']},
+            {
+                "Expression": "SELECT resourceType, COUNT(*) WHERE resourceType = 'AWS::EC2::Volume' AND configuration.state.value = 'in-use' GROUP BY resourceType"
+            },
+        )
+        stubbed_aws_config.add_response(
+            "select_resource_config",
+            {
+                "Results": [
+                    '{"resourceType":"AWS::EC2::VPC","COUNT(*)":3}',
+                    '{"resourceType":"AWS::EC2::EIP","COUNT(*)":5}',
+                ]
+            },
+            {
+                "Expression": "SELECT resourceType, COUNT(*) WHERE resourceType IN ('AWS::EC2::EIP', 'AWS::EC2::InternetGateway', 'AWS::EC2::VPC') GROUP BY resourceType"
+            },
+        )
+        stubbed_aws_config.activate()
+
+        collector._collect_config_remote_metrics(service_quota_group)
+
+        stubbed_aws_config.assert_no_pending_responses()
+        assert [sq.metric_values for sq in service_quota_group] == [
+            [3.0],
+            [5.0],
+            [],
+            [7.0],
+        ]
+
+    def test_reuses_config_results_with_unchanged_resource_counts(
+        self,
+        s3,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response(
+            "get_object",
+            {
+                "Body": BytesIO(
+                    gzip.compress(
+                        json.dumps(
+                            {
+                                "version": CACHE_VERSION,
+                                "created_at": datetime.now(timezone.utc).isoformat(),
+                                "results": {
+                                    "ec2": {
+                                        "L-1": {
+                                            "resource_counts": {"AWS::EC2::VPC": 3},
+                                            "metric_values": [3.0],
+                                        }
+                                    },
+                                    "lambda": {
+                                        "L-2": {
+                                            "resource_counts": {
+                                                "AWS::Lambda::Function": 1
+                                            },
+                                            "metric_values": [10.0],
+                                        }
+                                    },
+                                },
+                            }
+                        ).encode()
+                    )
+                )
+            },
+            {"Bucket": "bucket_name", "Key": "cache_key"},
+        )
+        stubbed_s3.add_response(
+            "put_object",
+            {},
+            {
+                "Body": ANY,
+                "Bucket": "bucket_name",
+                "ContentEncoding": "gzip",
+                "ContentType": "application/json",
+                "Key": "cache_key",
+            },
+        )
+        stubbed_s3.activate()
+
+        config_result_cache = ConfigResultCache(
+            StateStore(s3, "bucket_name"), "cache_key"
+        )
+        config_result_cache.load()
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            config_query_workers=1,
+            config_result_cache=config_result_cache,
+        )
+
+        registry = CollectionQueryRegistry(
+            {
+                "ec2": {
+                    "L-1": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": "SELECT resourceId WHERE resourceType = 'AWS::EC2::VPC'",
+                            "jmespath": "length([])",
+                        },
+                    }
+                },
+                "lambda": {
+                    "L-2": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": "SELECT configuration.codeSize WHERE resourceType = 'AWS::Lambda::Function'",
+                            "jmespath": "sum([].configuration.codeSize)",
+                        },
+                    }
+                },
+            }
+        )
+        service_quota_group = []
+        for collection_query in registry:
+            service_quota = ServiceQuota(
+                **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+            )
+            service_quota.service_code = collection_query.service_code
+            service_quota.quota_code = collection_query.quota_code
+            service_quota.collection_query = collection_query
+            service_quota_group.append(service_quota)
+
+        stubbed_aws_config = Stubber(aws_config)
+        stubbed_aws_config.add_response(
+            "get_discovered_resource_counts",
+            {
+                "totalDiscoveredResources": 5,
+                "resourceCounts": [
+                    {"resourceType": "AWS::EC2::VPC", "count": 3},
+                    {"resourceType": "AWS::Lambda::Function", "count": 2},
+                ],
+            },
+            {"resourceTypes": ["AWS::EC2::VPC", "AWS::Lambda::Function"]},
+        )
+        stubbed_aws_config.add_response(
+            "select_resource_config",
+            {
+                "Results": [
+                    '{"configuration":{"codeSize":6}}',
+                    '{"configuration":{"codeSize":8}}',
+                ]
+            },
+            {
+                "Expression": "SELECT configuration.codeSize WHERE resourceType = 'AWS::Lambda::Function'"
+            },
+        )
+        stubbed_aws_config.activate()
+
+        collector._collect_config_remote_metrics(service_quota_group)
+
+        stubbed_aws_config.assert_no_pending_responses()
+        stubbed_s3.assert_no_pending_responses()
+        assert [sq.metric_values for sq in service_quota_group] == [[3.0], [14.0]]
+        assert config_result_cache.get(
+            "lambda", "L-2", {"AWS::Lambda::Function": 2}
+        ) == {"resource_counts": {"AWS::Lambda::Function": 2}, "metric_values": [14.0]}
+
+    def test_does_not_cache_config_results_that_failed_to_evaluate(
+        self,
+        s3,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_client_error("get_object", "NoSuchKey")
+        stubbed_s3.add_response(
+            "put_object",
+            {},
+            {
+                "Body": ANY,
+                "Bucket": "bucket_name",
+                "ContentEncoding": "gzip",
+                "ContentType": "application/json",
+                "Key": "cache_key",
+            },
+        )
+        stubbed_s3.activate()
+
+        config_result_cache = ConfigResultCache(
+            StateStore(s3, "bucket_name"), "cache_key"
+        )
+        config_result_cache.load()
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            config_result_cache=config_result_cache,
+        )
+
+        expression = "SELECT configuration.codeSize, configuration.runtime WHERE resourceType = 'AWS::Lambda::Function'"
+        registry = CollectionQueryRegistry(
+            {
+                "lambda": {
+                    "L-1": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": expression,
+                            "jmespath": "sum([].configuration.codeSize)",
+                        },
+                    },
+                    "L-2": {
+                        "type": "config",
+                        "parameters": {
+                            "expression": expression,
+                            "jmespath": "max([].configuration.runtime)",
+                        },
+                    },
+                },
+            }
+        )
+        service_quota_group = []
+        for collection_query in registry:
+            service_quota = ServiceQuota(
+                **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+            )
+            service_quota.quota_code = collection_query.quota_code
+            service_quota.collection_query = collection_query
+            service_quota_group.append(service_quota)
+
+        stubbed_aws_config = Stubber(aws_config)
+        stubbed_aws_config.add_response(
+            "get_discovered_resource_counts",
+            {
+                "totalDiscoveredResources": 1,
+                "resourceCounts": [
+                    {"resourceType": "AWS::Lambda::Function", "count": 1},
+                ],
+            },
+            {"resourceTypes": ["AWS::Lambda::Function"]},
+        )
+        stubbed_aws_config.add_response(
+            "select_resource_config",
+            {
+                "Results": [
+                    '{"configuration":{"codeSize":6,"runtime":"python3.12"}}',
+                ]
+            },
+            {"Expression": expression},
+        )
+        stubbed_aws_config.activate()
+
+        collector._collect_config_remote_metrics(service_quota_group)
+
+        stubbed_aws_config.assert_no_pending_responses()
+        stubbed_s3.assert_no_pending_responses()
+        assert [sq.metric_values for sq in service_quota_group] == [[6.0], []]
+        assert config_result_cache.get(
+            "lambda", "L-1", {"AWS::Lambda::Function": 1}
+        ) == {"resource_counts": {"AWS::Lambda::Function": 1}, "metric_values": [6.0]}
+        assert (
+            config_result_cache.get("lambda", "L-2", {"AWS::Lambda::Function": 1})
+            is None
+        )
+
+    def test_can_write_usage_metrics_in_embedded_metric_format(
+        self,
+        capsys,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            metric_output="emf",
+        )
+        service_quota = ServiceQuota(
+            **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+        )
+        service_quota.metric_values = [3.0, 2.0]
+
+        stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.activate()
+
+        collector._put_local_metrics([service_quota])
+
+        emf_lines = [
+            json.loads(line)
+            for line in capsys.readouterr().out.splitlines()
+            if '"_aws"' in line
+        ]
+        assert len(emf_lines) == 1
+        assert emf_lines[0]["AccountId"] == "123456789000"
+        assert emf_lines[0]["QuotaCode"] == service_quota.quota_code
+        assert emf_lines[0]["ServiceQuotaUsage"] == [3.0, 2.0]
+        stubbed_cloudwatch.assert_no_pending_responses()
+
+    def test_only_plans_alarms_in_dry_run(
+        self,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+        )
+
+        service_quota = ServiceQuota(
+            **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+        )
+        service_quota.metric_values = [1.0]
+        collector._service_quotas = [service_quota]
+
+        stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {
+                "MetricAlarms": [
+                    {
+                        "AlarmName": "Service Quota: 123456789000: Obsolete",
+                        "Dimensions": [
+                            {"Name": "ServiceCode", "Value": "ec2"},
+                            {"Name": "QuotaCode", "Value": "L-C4EABC2C"},
+                            {"Name": "AccountId", "Value": "123456789000"},
+                        ],
+                    }
+                ]
+            },
+            {
+                "AlarmNamePrefix": "Service Quota: 123456789000:",
+                "AlarmTypes": ["MetricAlarm"],
+            },
+        )
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {
+                "MetricAlarms": [
+                    {
+                        "AlarmName": "Service Quota: 123456789000: Obsolete",
+                        "Dimensions": [
+                            {"Name": "ServiceCode", "Value": "ec2"},
+                            {"Name": "QuotaCode", "Value": "L-C4EABC2C"},
+                            {"Name": "AccountId", "Value": "123456789000"},
+                        ],
+                    }
+                ]
+            },
+            {"AlarmNamePrefix": "Service Quota:", "AlarmTypes": ["MetricAlarm"]},
+        )
+        stubbed_cloudwatch.activate()
+
+        alarm_plan = collector.manage_alarms(
+            {"default_threshold_perc": 75}, dry_run=True
+        )
+
+        stubbed_cloudwatch.assert_no_pending_responses()
+        assert [alarm["Threshold"] for alarm in alarm_plan.create] == [750.0]
+        assert alarm_plan.update == []
+        assert alarm_plan.delete == ["Service Quota: 123456789000: Obsolete"]
+
+    def test_can_alarm_on_utilization(
+        self,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            publish_utilization=True,
+        )
+
+        service_quota = ServiceQuota(
+            **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+        )
+        service_quota.metric_values = [150.0, 100.0]
+        collector._service_quotas = [service_quota]
+
+        stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.add_response(
+            "put_metric_data",
+            {},
+            {
+                "Namespace": "ServiceQuotaManager",
+                "MetricData": [
+                    {
+                        "MetricName": metric_name,
+                        "Dimensions": ANY,
+                        "Timestamp": ANY,
+                        "Values": values,
+                        "Counts": [1.0, 1.0],
+                    }
+                    for metric_name, values in [
+                        ("ServiceQuotaUsage", [150.0, 100.0]),
+                        ("ServiceQuotaUtilization", [15.0, 10.0]),
+                    ]
+                ],
+            },
+        )
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {
+                "AlarmNamePrefix": "Service Quota: 123456789000:",
+                "AlarmTypes": ["MetricAlarm"],
+            },
+        )
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {"AlarmNamePrefix": "Service Quota:", "AlarmTypes": ["MetricAlarm"]},
+        )
+        stubbed_cloudwatch.activate()
+
+        collector._put_local_metrics([service_quota])
+        alarm_plan = collector.manage_alarms(
+            {"default_threshold_perc": 75, "threshold_mode": "percentage"},
+            dry_run=True,
+        )
+
+        stubbed_cloudwatch.assert_no_pending_responses()
+        assert [
+            (alarm["MetricName"], alarm["Threshold"]) for alarm in alarm_plan.create
+        ] == [("ServiceQuotaUtilization", 75.0)]
+        assert "1000" not in alarm_plan.create[0]["AlarmDescription"]
+
+    def test_completes_a_partial_alarm_migration(
+        self,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+        )
+
+        service_quotas_list = []
+        for quota_code in ["L-A", "L-B"]:
+            service_quota = ServiceQuota(
+                **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+            )
+            service_quota.quota_code = quota_code
+            service_quota.quota_name = quota_code
+            service_quota.metric_values = [1.0]
+            service_quotas_list.append(service_quota)
+        collector._service_quotas = service_quotas_list
+
+        def alarm(alarm_name: str, quota_code: str):
+            return {
+                "AlarmName": alarm_name,
+                "Dimensions": [
+                    {"Name": "ServiceCode", "Value": "lambda"},
+                    {"Name": "QuotaCode", "Value": quota_code},
+                    {"Name": "AccountId", "Value": "123456789000"},
+                ],
+            }
+
+        # A previous run renamed the alarm of L-A, but stopped before it deleted
+        # the legacy alarm of L-A and renamed the one of L-B.
+        account_alarm = alarm(
+            "Service Quota: 123456789000: L-A for service AWS Lambda", "L-A"
+        )
+        stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": [account_alarm]},
+            {
+                "AlarmNamePrefix": "Service Quota: 123456789000:",
+                "AlarmTypes": ["MetricAlarm"],
+            },
+        )
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {
+                "MetricAlarms": [
+                    alarm(
+                        "Service Quota: L-A for service AWS Lambda in account 123456789000",
+                        "L-A",
+                    ),
+                    alarm(
+                        "Service Quota: L-B for service AWS Lambda in account 123456789000",
+                        "L-B",
+                    ),
+                    account_alarm,
+                ]
+            },
+            {"AlarmNamePrefix": "Service Quota:", "AlarmTypes": ["MetricAlarm"]},
+        )
+        stubbed_cloudwatch.activate()
+
+        alarm_plan = collector.manage_alarms(
+            {"default_threshold_perc": 75}, dry_run=True
+        )
+
+        stubbed_cloudwatch.assert_no_pending_responses()
+        assert [alarm["AlarmName"] for alarm in alarm_plan.create] == [
+            "Service Quota: 123456789000: L-B for service AWS Lambda"
+        ]
+        assert sorted(alarm_plan.delete) == [
+            "Service Quota: L-A for service AWS Lambda in account 123456789000",
+            "Service Quota: L-B for service AWS Lambda in account 123456789000",
+        ]
+
+    def test_looks_up_legacy_alarms_until_migrated(
+        self,
+        s3,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_client_error("get_object", "NoSuchKey")
+        stubbed_s3.add_response(
+            "put_object",
+            {},
+            {
+                "Body": ANY,
+                "Bucket": "bucket_name",
+                "ContentEncoding": "gzip",
+                "ContentType": "application/json",
+                "Key": "migration_key",
+            },
+        )
+        stubbed_s3.activate()
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            alarm_migration=AlarmMigration(
+                StateStore(s3, "bucket_name"), "migration_key"
+            ),
+        )
+        service_quota = ServiceQuota(
+            **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+        )
+        service_quota.metric_values = [1.0]
+        collector._service_quotas = [service_quota]
+
+        stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {
+                "AlarmNamePrefix": "Service Quota: 123456789000:",
+                "AlarmTypes": ["MetricAlarm"],
+            },
+        )
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {"AlarmNamePrefix": "Service Quota:", "AlarmTypes": ["MetricAlarm"]},
+        )
+        # Once migrated, an account without alarms no longer looks up those of all
+        # other accounts.
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {
+                "AlarmNamePrefix": "Service Quota: 123456789000:",
+                "AlarmTypes": ["MetricAlarm"],
+            },
+        )
+        stubbed_cloudwatch.activate()
+
+        alerting_config = {
+            "default_threshold_perc": 75,
+            "rules": {"AWS Lambda": {"Concurrent executions": {"ignore": True}}},
+        }
+        assert len(collector.manage_alarms(alerting_config)) == 0
+        assert len(collector.manage_alarms(alerting_config)) == 0
+
+        stubbed_cloudwatch.assert_no_pending_responses()
+        stubbed_s3.assert_no_pending_responses()
+
+    def test_skips_reconciling_unchanged_alarms(
+        self,
+        s3,
+        service_quotas,
+        cloudwatch,
+        aws_config,
+        cost_explorer,
+        service_quotas_list_applied_quotas_lambda,
+    ):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_client_error("get_object", "NoSuchKey")
+        stubbed_s3.add_response(
+            "put_object",
+            {},
+            {
+                "Body": ANY,
+                "Bucket": "bucket_name",
+                "ContentEncoding": "gzip",
+                "ContentType": "application/json",
+                "Key": "digest_key",
+            },
+        )
+        stubbed_s3.activate()
+
+        alarm_digest = AlarmDigest(
+            StateStore(s3, "bucket_name"), "digest_key", timedelta(hours=24)
+        )
+        alarm_digest.load()
+
+        collector = ServiceQuotasCollector(
+            service_quotas,
+            cloudwatch,
+            aws_config,
+            cost_explorer,
+            cloudwatch,
+            "123456789000",
+            alarm_digest=alarm_digest,
+        )
+        service_quota = ServiceQuota(
+            **convert_dict(service_quotas_list_applied_quotas_lambda["Quotas"][0])
+        )
+        service_quota.metric_values = [1.0]
+        collector._service_quotas = [service_quota]
+
+        stubbed_cloudwatch = Stubber(cloudwatch)
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {
+                "AlarmNamePrefix": "Service Quota: 123456789000:",
+                "AlarmTypes": ["MetricAlarm"],
+            },
+        )
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {"AlarmNamePrefix": "Service Quota:", "AlarmTypes": ["MetricAlarm"]},
+        )
+        stubbed_cloudwatch.add_response("put_metric_alarm", {})
+        stubbed_cloudwatch.activate()
+
+        assert len(collector.manage_alarms({"default_threshold_perc": 75})) == 1
+        assert len(collector.manage_alarms({"default_threshold_perc": 75})) == 0
+
+        stubbed_cloudwatch.assert_no_pending_responses()
+        stubbed_s3.assert_no_pending_responses()
+
+        alarm_digest.full_reconcile_interval = timedelta(0)
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {
+                "AlarmNamePrefix": "Service Quota: 123456789000:",
+                "AlarmTypes": ["MetricAlarm"],
+            },
+        )
+        stubbed_cloudwatch.add_response(
+            "describe_alarms",
+            {"MetricAlarms": []},
+            {"AlarmNamePrefix": "Service Quota:", "AlarmTypes": ["MetricAlarm"]},
+        )
+        assert (
+            len(collector.manage_alarms({"default_threshold_perc": 75}, dry_run=True))
+            == 1
+        )
+        stubbed_cloudwatch.assert_no_pending_responses()
@@ -1,5 +1,5 @@
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
 from unittest.mock import patch
 
@@ -7,6 +7,7 @@ from botocore.stub import Stubber
 
 from service_quotas_manager.entities import ServiceQuota, ServiceQuotaIncreaseRule
 from service_quotas_manager.service_quotas_manager import (
+    _assume_role,
     _get_account_id_from_alarm,
     _get_increase_rule_from_config,
     _get_service_quota_from_alarm,
@@ -59,6 +60,87 @@ class TestServiceQuotasIncreaser:
         config = _load_config_from_s3(s3, "bucket_name", "bucket_key", "123456789000")
         assert config == {"account_id": "123456789000", "foo": "bar"}
 
+    def test_reuses_config_from_s3_if_not_modified(self, s3):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response(
+            "get_object",
+            {
+                "Body": BytesIO(
+                    json.dumps([{"account_id": "123456789000", "foo": "bar"}]).encode()
+                ),
+                "ETag": '"etag-1"',
+            },
+            {"Bucket": "bucket_name", "Key": "bucket_key"},
+        )
+        stubbed_s3.add_client_error(
+            "get_object",
+            service_error_code="304",
+            http_status_code=304,
+            expected_params={
+                "Bucket": "bucket_name",
+                "Key": "bucket_key",
+                "IfNoneMatch": '"etag-1"',
+            },
+        )
+        stubbed_s3.add_response(
+            "get_object",
+            {
+                "Body": BytesIO(
+                    json.dumps([{"account_id": "123456789000", "foo": "baz"}]).encode()
+                ),
+                "ETag": '"etag-2"',
+            },
+            {"Bucket": "bucket_name", "Key": "bucket_key", "IfNoneMatch": '"etag-1"'},
+        )
+        stubbed_s3.activate()
+
+        for expected in ["bar", "bar", "baz"]:
+            config = _load_config_from_s3(
+                s3, "bucket_name", "bucket_key", "123456789000"
+            )
+            assert config == {"account_id": "123456789000", "foo": expected}
+
+        stubbed_s3.assert_no_pending_responses()
+
+    @patch("service_quotas_manager.service_quotas_manager.time")
+    @patch("service_quotas_manager.service_quotas_manager._get_local_client")
+    def test_caches_assumed_role_credentials_until_expiry(
+        self, mocked_client, mocked_time, sts
+    ):
+        role_arn = "arn:aws:iam::123456789000:role/ServiceQuotaManager"
+        stubbed_sts = Stubber(sts)
+        for access_key_id in ["fake-access-key-id-1", "fake-access-key-id-2"]:
+            stubbed_sts.add_response(
+                "assume_role",
+                {
+                    "Credentials": {
+                        "AccessKeyId": access_key_id,
+                        "SecretAccessKey": "fake-secret-access-key",
+                        "SessionToken": "fake-session-token",
+                        "Expiration": datetime.fromtimestamp(1900, timezone.utc),
+                    }
+                },
+                {
+                    "DurationSeconds": 900,
+                    "RoleArn": role_arn,
+                    "RoleSessionName": "ServiceQuotaManagerRole",
+                },
+            )
+        stubbed_sts.activate()
+        mocked_client.return_value = sts
+
+        mocked_time.time.return_value = 1000
+        assert _assume_role(role_arn)["aws_access_key_id"] == "fake-access-key-id-1"
+
+        mocked_time.time.return_value = 1500
+        assert _assume_role(role_arn)["aws_access_key_id"] == "fake-access-key-id-1"
+
+        mocked_time.time.return_value = 1700
+        assert _assume_role(role_arn)["aws_access_key_id"] == "fake-access-key-id-2"
+
+        stubbed_sts.assert_no_pending_responses()
+        assert mocked_client.call_count == 2
+
     def test_can_get_increase_rule_from_config(
         self, service_quotas_list_applied_quotas_lambda
     ):
@@ -272,3 +354,117 @@ class TestServiceQuotasIncreaser:
         assert "No configuration found for account. Exiting..." in [
             r.message for r in caplog.records
         ]
+
+    @patch("service_quotas_manager.service_quotas_manager._collect_service_quotas")
+    @patch("service_quotas_manager.service_quotas_manager._assume_role")
+    @patch("service_quotas_manager.service_quotas_manager._get_local_client")
+    def test_handler_collects_batch_of_accounts(
+        self,
+        mocked_client,
+        mocked_assume_role,
+        mocked_collect,
+        s3,
+        cloudwatch,
+        lambda_context,
+    ):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response(
+            "get_object",
+            {
+                "Body": BytesIO(
+                    json.dumps(
+                        [
+                            {"account_id": "123456789000"},
+                            {"account_id": "123456789001"},
+                            {"account_id": "123456789002"},
+                        ]
+                    ).encode()
+                )
+            },
+            {"Bucket": "bucket_name", "Key": "bucket_key"},
+        )
+        stubbed_s3.add_client_error("get_object", service_error_code="NoSuchKey")
+        stubbed_s3.activate()
+
+        mocked_client.side_effect = lambda client_name: {
+            "s3": s3,
+            "cloudwatch": cloudwatch,
+        }[client_name]
+        mocked_assume_role.return_value = {"aws_access_key_id": "fake-access-key-id"}
+
+        def collect(account_id, *args):
+            if account_id == "123456789001":
+                raise RuntimeError("Collection failed")
+
+        mocked_collect.side_effect = collect
+
+        result = sqm_handler(
+            {
+                "action": "CollectServiceQuotasBatch",
+                "config_bucket": "bucket_name",
+                "config_key": "bucket_key",
+            },
+            lambda_context,
+        )
+
+        assert result == {
+            "succeeded": ["123456789000", "123456789002"],
+            "failed": ["123456789001"],
+            "unprocessed": [],
+        }
+        assert mocked_collect.call_count == 3
+        stubbed_s3.assert_no_pending_responses()
+
+    @patch("service_quotas_manager.service_quotas_manager._collect_service_quotas")
+    @patch("service_quotas_manager.service_quotas_manager._assume_role")
+    @patch("service_quotas_manager.service_quotas_manager._get_local_client")
+    def test_handler_stops_batch_before_timeout(
+        self,
+        mocked_client,
+        mocked_assume_role,
+        mocked_collect,
+        s3,
+        cloudwatch,
+        lambda_context,
+    ):
+        stubbed_s3 = Stubber(s3)
+        stubbed_s3.add_response(
+            "get_object",
+            {
+                "Body": BytesIO(
+                    json.dumps(
+                        [
+                            {"account_id": "123456789000"},
+                            {"account_id": "123456789001"},
+                        ]
+                    ).encode()
+                )
+            },
+            {"Bucket": "bucket_name", "Key": "bucket_key"},
+        )
+        stubbed_s3.add_client_error("get_object", service_error_code="NoSuchKey")
+        stubbed_s3.activate()
+
+        mocked_client.side_effect = lambda client_name: {
+            "s3": s3,
+            "cloudwatch": cloudwatch,
+        }[client_name]
+        lambda_context.remaining_time_in_millis = 60_000
+
+        result = sqm_handler(
+            {
+                "action": "CollectServiceQuotasBatch",
+                "config_bucket": "bucket_name",
+                "config_key": "bucket_key",
+            },
+            lambda_context,
+        )
+
+        assert result == {
+            "succeeded": [],
+            "failed": [],
+            "unprocessed": ["123456789000", "123456789001"],
+        }
+        mocked_assume_role.assert_not_called()
+        mocked_collect.assert_not_called()
+        stubbed_s3.assert_no_pending_responses()
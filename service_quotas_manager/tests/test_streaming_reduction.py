@@ -0,0 +1,51 @@
+import jmespath
+import pytest
+from jmespath.exceptions import JMESPathTypeError
+
+from service_quotas_manager.collection_query_registry import (
+    get_collection_query_registry,
+)
+from service_quotas_manager.streaming_reduction import StreamingReduction
+
+
+class TestStreamingReduction:
+    def test_streams_to_same_result_as_full_search(self, aws_config_expression_results):
+        streamed_queries = 0
+        for collection_query in get_collection_query_registry():
+            reduction = StreamingReduction.from_jmespath(
+                collection_query.compiled_jmespath
+            )
+            if not reduction:
+                continue
+
+            rows = aws_config_expression_results[collection_query.service_code][
+                collection_query.quota_code
+            ]
+            for row in rows:
+                reduction.add(row)
+
+            assert reduction.result() == collection_query.compiled_jmespath.search(rows)
+            streamed_queries += 1
+
+        assert streamed_queries > 0
+
+    @pytest.mark.parametrize(
+        "expression",
+        [
+            "[?starts_with(@.configuration.nodeType, 'ra3.')] | max([].configuration.numberOfNodes)",
+            "length(@)",
+            "min([].size)",
+            "max([?size > `1`].size)",
+        ],
+    )
+    def test_does_not_stream_other_expressions(self, expression):
+        assert not StreamingReduction.from_jmespath(jmespath.compile(expression))
+
+    def test_raises_type_errors_on_result(self):
+        reduction = StreamingReduction.from_jmespath(jmespath.compile("sum([].size)"))
+        reduction.add({"size": 1})
+        reduction.add({"size": "2"})
+        reduction.add({"size": 3})
+
+        with pytest.raises(JMESPathTypeError):
+            reduction.result()
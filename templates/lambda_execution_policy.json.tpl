@@ -35,10 +35,18 @@
         {
             "Effect": "Allow",
             "Action": [
-                "s3:GetObject"
+                "s3:GetObject",
+                "s3:PutObject"
             ],
             "Resource": "${service_quotas_manager_bucket_arn}/*"
         },
+        {
+            "Effect": "Allow",
+            "Action": [
+                "s3:ListBucket"
+            ],
+            "Resource": "${service_quotas_manager_bucket_arn}"
+        },
         {
             "Effect": "Allow",
             "Action": [
@@ -56,6 +64,11 @@
                 "kms:ReEncrypt*"
             ],
             "Resource": "${kms_key_arn}"
+        },
+        {
+            "Effect": "Allow",
+            "Action": "config:SelectAggregateResourceConfig",
+            "Resource": "arn:aws:config:${region_name}:${account_id}:config-aggregator/*"
         }
     ]
 }
@@ -191,6 +191,11 @@ run "multi_account" {
     error_message = "Expected 1 schedule per monitored account to be created."
   }
 
+  assert {
+    condition     = jsondecode(aws_scheduler_schedule.sqm_collect_service_quotas["123456789001"].target[0].input)["config_key"] == "accounts/123456789001.json"
+    error_message = "Expected each schedule to read the configuration of its own account."
+  }
+
   assert {
     condition     = length(aws_cloudwatch_event_rule.trigger_service_quotas_manager_on_alarm) == 0
     error_message = "Expected one event rule for alarms if no increase config was defined."
@@ -207,6 +212,46 @@ run "multi_account" {
   }
 }
 
+run "batch_collection" {
+  command = apply
+
+  variables {
+    bucket_prefix = "sqmtest-batch-collection-"
+    kms_key_arn   = "arn:aws:kms:eu-west-1:111122223333:key/1234abcd-12ab-34cd-56ef-1234567890ab"
+
+    collection_batching = {
+      size = 2
+    }
+
+    quotas_manager_configuration = [
+      {
+        account_id = "123456789000"
+      },
+      {
+        account_id = "123456789001"
+      },
+      {
+        account_id = "123456789002"
+      }
+    ]
+  }
+
+  assert {
+    condition     = length(aws_scheduler_schedule.sqm_collect_service_quotas) == 0
+    error_message = "Expected no schedules per monitored account if collection is batched."
+  }
+
+  assert {
+    condition     = length(aws_scheduler_schedule.sqm_collect_service_quotas_batch) == 2
+    error_message = "Expected 1 schedule per batch of monitored accounts to be created."
+  }
+
+  assert {
+    condition     = jsondecode(aws_scheduler_schedule.sqm_collect_service_quotas_batch["001"].target[0].input)["account_ids"] == ["123456789002"]
+    error_message = "Expected the last batch to contain the remaining account."
+  }
+}
+
 run "custom_role" {
   command = apply
 
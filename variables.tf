@@ -24,6 +24,34 @@ variable "bucket_name" {
   default     = null
 }
 
+variable "collection_batching" {
+  description = "Collect service quotas for multiple accounts per Lambda invocation. Accounts are grouped in batches of `size` accounts, each collected by a single schedule with `workers` accounts being collected concurrently. Batched invocations time out after 15 minutes, so a batch can hold at most 10 accounts per worker; accounts not started before the timeout are skipped until the next run. By default every account is collected in its own invocation."
+  type = object({
+    size    = number
+    workers = optional(number, 4)
+  })
+  default = null
+
+  validation {
+    condition     = var.collection_batching == null || try(var.collection_batching.size >= 1 && var.collection_batching.workers >= 1, false)
+    error_message = "The batch 'size' and number of 'workers' need to be at least 1."
+  }
+
+  validation {
+    condition     = var.collection_batching == null || try(var.collection_batching.size <= var.collection_batching.workers * 10, false)
+    error_message = "The batch 'size' can be at most 10 times the number of 'workers' to be collected within the Lambda timeout."
+  }
+}
+
+variable "config_aggregator" {
+  description = "Collect usage from AWS Config through an organization aggregator instead of through every account. Every custom collection query then runs once for all accounts in a batch, so `collection_batching` is required. The aggregator is queried from the `account_id` it resides in, by assuming the role configured in `assume_role`; omit `account_id` if the aggregator resides in the account of the service quotas manager."
+  type = object({
+    name       = string
+    account_id = optional(string, null)
+  })
+  default = null
+}
+
 variable "execution_role" {
   description = "Configuration of the IAM role of the service quotas manager lambda"
   type = object({
@@ -44,6 +72,17 @@ variable "kms_key_arn" {
   type        = string
 }
 
+variable "max_pool_connections" {
+  description = "The maximum number of connections the service quotas manager lambda keeps per AWS API client. Increase when collecting many accounts or services concurrently."
+  type        = number
+  default     = 25
+
+  validation {
+    condition     = var.max_pool_connections >= 1
+    error_message = "The maximum number of pool connections needs to be at least 1."
+  }
+}
+
 variable "quotas_manager_configuration" {
   description = "The configuration for the service quotas manager"
   type = list(object({
@@ -51,8 +90,10 @@ variable "quotas_manager_configuration" {
     selected_services = optional(list(string), [])
 
     alerting_config = optional(object({
-      default_threshold_perc = number
-      notification_topic_arn = optional(string, "")
+      default_threshold_perc        = number
+      dry_run                       = optional(bool, false)
+      full_reconcile_interval_hours = optional(number, 0)
+      notification_topic_arn        = optional(string, "")
       rules = optional(
         map(
           map(
@@ -63,10 +104,14 @@ variable "quotas_manager_configuration" {
           )
         ), {}
       )
+      threshold_mode = optional(string, "absolute")
       }), {
-      default_threshold_perc = 75
-      notification_topic_arn = ""
-      rules                  = {}
+      default_threshold_perc        = 75
+      dry_run                       = false
+      full_reconcile_interval_hours = 0
+      notification_topic_arn        = ""
+      rules                         = {}
+      threshold_mode                = "absolute"
     })
     quota_increase_config = optional(map(map(object({
       step              = optional(number)
@@ -74,12 +119,45 @@ variable "quotas_manager_configuration" {
       motivation        = string
       cc_mail_addresses = list(string)
     }))), {})
+    collection_config = optional(object({
+      billing_refresh_interval_hours = optional(number, 24)
+      config_change_detection        = optional(bool, false)
+      config_query_workers           = optional(number, 2)
+      discovery_workers              = optional(number, 4)
+      incremental_refresh            = optional(bool, false)
+      metric_output                  = optional(string, "api")
+    }), {})
   }))
 
   validation {
     condition     = length(var.quotas_manager_configuration) == length(distinct(var.quotas_manager_configuration[*].account_id))
     error_message = "quotas manager configuration items needs to have a unique account_id defined"
   }
+
+  validation {
+    condition     = alltrue([for cfg in var.quotas_manager_configuration : cfg.collection_config.discovery_workers >= 1 && cfg.collection_config.config_query_workers >= 1])
+    error_message = "collection_config.discovery_workers and collection_config.config_query_workers need to be at least 1"
+  }
+
+  validation {
+    condition     = alltrue([for cfg in var.quotas_manager_configuration : cfg.collection_config.billing_refresh_interval_hours >= 0])
+    error_message = "collection_config.billing_refresh_interval_hours can not be negative"
+  }
+
+  validation {
+    condition     = alltrue([for cfg in var.quotas_manager_configuration : cfg.alerting_config.full_reconcile_interval_hours >= 0])
+    error_message = "alerting_config.full_reconcile_interval_hours can not be negative"
+  }
+
+  validation {
+    condition     = alltrue([for cfg in var.quotas_manager_configuration : contains(["absolute", "percentage"], cfg.alerting_config.threshold_mode)])
+    error_message = "alerting_config.threshold_mode needs to be either \"absolute\" or \"percentage\""
+  }
+
+  validation {
+    condition     = alltrue([for cfg in var.quotas_manager_configuration : contains(["api", "emf"], cfg.collection_config.metric_output)])
+    error_message = "collection_config.metric_output needs to be either \"api\" or \"emf\""
+  }
 }
 
 variable "region" {